@@ -12,6 +12,59 @@ class Config:
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     SECRET_KEY = environ.get("SECRET_KEY", "chave-secreta-padrao")
 
+    # OCR em segundo plano
+    # - OCR_MODO_PADRAO: "assincrono" devolve um id de tarefa na hora,
+    #   "sincrono" processa dentro da requisição (comportamento antigo)
+    # - OCR_MAX_WORKERS: processos dedicados ao Tesseract por worker do gunicorn
+    # - OCR_FILA_MAXIMA: tarefas aguardando antes de responder 503
+    # - OCR_TAREFA_EXPIRACAO: segundos até uma tarefa pendente ser dada como
+    #   perdida (ex: worker reiniciado) e marcada com erro
+    OCR_MODO_PADRAO = environ.get("OCR_MODO_PADRAO", "assincrono")
+    OCR_MAX_WORKERS = int(environ.get("OCR_MAX_WORKERS", "2"))
+    OCR_FILA_MAXIMA = int(environ.get("OCR_FILA_MAXIMA", "50"))
+    OCR_TAREFA_EXPIRACAO = int(environ.get("OCR_TAREFA_EXPIRACAO", "1800"))
+    # Máximo de arquivos por envio em POST /ocr/lote
+    OCR_LOTE_MAX_ARQUIVOS = int(environ.get("OCR_LOTE_MAX_ARQUIVOS", "30"))
+
+    # Análise com IA em segundo plano (POST /reembolsos/<n>/analisar-ia)
+    # - ANALISE_IA_MODO_PADRAO: "sincrono" espera a resposta do Gemini dentro
+    #   da requisição (contrato original); "assincrono" devolve um id de tarefa
+    #   na hora. Por requisição: ?modo=assincrono
+    # - ANALISE_IA_MAX_WORKERS: análises simultâneas por worker do gunicorn
+    # - ANALISE_IA_FILA_MAXIMA: análises aguardando antes de responder 503
+    # - ANALISE_IA_TAREFA_EXPIRACAO: segundos em que uma tarefa em andamento
+    #   é devolvida para um novo pedido do mesmo reembolso
+    ANALISE_IA_MODO_PADRAO = environ.get("ANALISE_IA_MODO_PADRAO", "sincrono")
+    ANALISE_IA_MAX_WORKERS = int(environ.get("ANALISE_IA_MAX_WORKERS", "4"))
+    ANALISE_IA_FILA_MAXIMA = int(environ.get("ANALISE_IA_FILA_MAXIMA", "20"))
+    ANALISE_IA_TAREFA_EXPIRACAO = int(environ.get("ANALISE_IA_TAREFA_EXPIRACAO", "600"))
+    # POST /reembolsos/analisar-lote
+    # - ANALISE_IA_LOTE_MAX_ITENS: reembolsos por lote
+    # - ANALISE_IA_LOTE_CONCORRENCIA: chamadas ao Gemini em paralelo por lote
+    # - ANALISE_IA_LOTE_COMMIT_A_CADA: análises gravadas por commit
+    ANALISE_IA_LOTE_MAX_ITENS = int(environ.get("ANALISE_IA_LOTE_MAX_ITENS", "50"))
+    ANALISE_IA_LOTE_CONCORRENCIA = int(environ.get("ANALISE_IA_LOTE_CONCORRENCIA", "4"))
+    ANALISE_IA_LOTE_COMMIT_A_CADA = int(environ.get("ANALISE_IA_LOTE_COMMIT_A_CADA", "5"))
+
+    # Uploads
+    # - UPLOAD_TAMANHO_MAXIMO: bytes por arquivo enviado (conferido depois que
+    #   o Werkzeug já leu o corpo da requisição)
+    # - MAX_CONTENT_LENGTH: bytes por requisição; o único limite que responde
+    #   413 antes de ler o corpo (quando o Content-Length passa disso)
+    UPLOAD_TAMANHO_MAXIMO = int(environ.get("UPLOAD_TAMANHO_MAXIMO_MB", "15")) * 1024 * 1024
+    MAX_CONTENT_LENGTH = int(environ.get("UPLOAD_REQUISICAO_MAXIMA_MB", "100")) * 1024 * 1024
+
+    # Envio dos arquivos de comprovantes
+    # - COMPROVANTE_CACHE_MAX_AGE: segundos de cache no navegador (revalida pelo ETag depois)
+    # - COMPROVANTE_X_ACCEL_PREFIXO: location "internal" do nginx que aponta para temp/
+    #   (ex: /_comprovantes/); vazio = o Flask envia o arquivo
+    # - USE_X_SENDFILE: Apache/lighttpd enviam o arquivo pelo cabeçalho X-Sendfile
+    COMPROVANTE_CACHE_MAX_AGE = int(environ.get("COMPROVANTE_CACHE_MAX_AGE", "300"))
+    COMPROVANTE_X_ACCEL_PREFIXO = environ.get("COMPROVANTE_X_ACCEL_PREFIXO", "")
+    USE_X_SENDFILE = environ.get("USE_X_SENDFILE", "false").lower() in ("1", "true", "sim", "yes")
+    # Miniaturas em /ocr/<id>/miniatura (URL presa ao arquivo: pode ficar em cache por 1 ano)
+    MINIATURA_CACHE_MAX_AGE = int(environ.get("MINIATURA_CACHE_MAX_AGE", "31536000"))
+
 
 class DevelopmentConfig(Config):
     """
@@ -43,6 +96,7 @@ class TestingConfig(Config):
     """
     TESTING = True
     SQLALCHEMY_DATABASE_URI = "sqlite:///:memory:"
+    OCR_MODO_PADRAO = "sincrono"
 
 
 # Dicionário para selecionar o ambiente facilmente
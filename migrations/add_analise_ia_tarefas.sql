@@ -0,0 +1,14 @@
+-- Análise com IA em segundo plano (POST /reembolsos/<n>/analisar-ia com modo=assincrono)
+-- A tarefa guarda a análise gravada, a resposta completa e os tempos de cada etapa
+-- Execute este comando no seu banco de dados MySQL
+
+ALTER TABLE tarefas
+ADD COLUMN analise_id INT NULL,
+ADD COLUMN resultado TEXT NULL,
+ADD COLUMN tempos_etapas TEXT NULL;
+
+ALTER TABLE tarefas
+ADD CONSTRAINT fk_tarefas_analise_ia FOREIGN KEY (analise_id) REFERENCES analises_ia (id);
+
+-- Busca da tarefa em andamento de um reembolso (evita enfileirar a mesma análise duas vezes)
+CREATE INDEX ix_tarefas_tipo_reembolso_status ON tarefas (tipo, reembolso_id, status);
@@ -0,0 +1,20 @@
+-- Cache das respostas do Gemini Vision (ver src/utils/cache_vision.py)
+-- chave: SHA-256 de (hash do comprovante, campos declarados no prompt, versão do prompt, modelo)
+-- O db.create_all() também cria a tabela; o script é para bancos gerenciados à mão
+-- Execute este comando no seu banco de dados MySQL
+
+CREATE TABLE IF NOT EXISTS cache_vision (
+    chave VARCHAR(64) NOT NULL PRIMARY KEY,
+    hash_arquivo VARCHAR(64) NOT NULL,
+    modelo VARCHAR(50) NOT NULL,
+    versao_prompt VARCHAR(20) NOT NULL,
+    resposta TEXT NOT NULL,
+    tamanho INT NOT NULL DEFAULT 0,
+    acertos INT NOT NULL DEFAULT 0,
+    data_criacao DATETIME NULL,
+    ultimo_acesso DATETIME NULL
+);
+
+CREATE INDEX ix_cache_vision_hash_arquivo ON cache_vision (hash_arquivo);
+CREATE INDEX ix_cache_vision_data_criacao ON cache_vision (data_criacao);
+CREATE INDEX ix_cache_vision_ultimo_acesso ON cache_vision (ultimo_acesso);
@@ -0,0 +1,10 @@
+-- Script SQL para os índices da listagem paginada de comprovantes (GET /ocr/)
+-- A paginação é por cursor em (data_criacao, id), do mais novo para o mais antigo:
+-- cada página lê só as linhas dela pelo índice, sem OFFSET
+
+CREATE INDEX ix_comprovantes_data_criacao_id
+ON comprovantes (data_criacao, id);
+
+-- Listagem filtrada por reembolso_id
+CREATE INDEX ix_comprovantes_reembolso_data_criacao_id
+ON comprovantes (reembolso_id, data_criacao, id);
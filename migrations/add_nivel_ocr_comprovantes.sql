@@ -0,0 +1,14 @@
+-- Script SQL para adicionar as colunas do OCR em níveis na tabela comprovantes
+-- nivel_ocr: nível que produziu o texto ('rapido' ou 'completo')
+-- tempos_ocr: tempo de cada nível executado, em ms (JSON, ex: {"rapido": 820.5, "completo": 2410.3})
+
+ALTER TABLE comprovantes
+ADD COLUMN nivel_ocr VARCHAR(20) NULL;
+
+ALTER TABLE comprovantes
+ADD COLUMN tempos_ocr TEXT NULL;
+
+-- (Opcional) Distribuição dos níveis para ajustar o nível rápido
+SELECT nivel_ocr, COUNT(*) AS total
+FROM comprovantes
+GROUP BY nivel_ocr;
@@ -0,0 +1,7 @@
+-- Script SQL para adicionar as palavras do OCR na tabela comprovantes
+-- palavras_ocr: JSON compacto com texto, caixa [x, y, largura, altura] e confiança
+-- de cada palavra reconhecida pelo Tesseract (ver src/utils/palavras_ocr.py)
+-- Comprovantes antigos ficam com NULL e a análise usa só o texto
+
+ALTER TABLE comprovantes
+ADD COLUMN palavras_ocr TEXT NULL;
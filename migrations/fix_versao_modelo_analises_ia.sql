@@ -0,0 +1,22 @@
+-- versao_modelo das análises de IA passa a registrar o modelo que respondeu
+-- (gemini-1.5-flash, gemini-1.5-pro ou ocr-tesseract; ver src/utils/roteamento_vision.py)
+-- Até aqui toda análise era gravada com o padrão 'grok-vision-beta'. O Vision sempre
+-- usou o gemini-1.5-pro, mas o fallback só com OCR gravava o mesmo valor
+--
+-- Só o Vision preenche razao_social, itens, forma_pagamento ou numero_nota em dados_ia
+-- (o fallback do OCR grava esses campos vazios): essas análises vieram do gemini-1.5-pro.
+-- As demais não têm como ser distinguidas e ficam como 'desconhecido'
+-- Execute este comando no seu banco de dados MySQL
+
+UPDATE analises_ia
+SET versao_modelo = 'gemini-1.5-pro'
+WHERE versao_modelo = 'grok-vision-beta'
+  AND JSON_VALID(dados_ia)
+  AND (
+      JSON_TYPE(JSON_EXTRACT(dados_ia, '$.razao_social')) NOT IN ('NULL')
+      OR JSON_LENGTH(JSON_EXTRACT(dados_ia, '$.itens')) > 0
+      OR JSON_TYPE(JSON_EXTRACT(dados_ia, '$.forma_pagamento')) NOT IN ('NULL')
+      OR JSON_TYPE(JSON_EXTRACT(dados_ia, '$.numero_nota')) NOT IN ('NULL')
+  );
+
+UPDATE analises_ia SET versao_modelo = 'desconhecido' WHERE versao_modelo = 'grok-vision-beta';
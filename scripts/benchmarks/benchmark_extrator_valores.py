@@ -0,0 +1,108 @@
+"""
+Micro-benchmark do extrator de valores monetários
+Compara a extração antiga (4 regexes sem compilar, chamada duas vezes por
+processar_arquivo) com analisar_valores_monetarios (uma passada) em
+dumps de OCR grandes
+
+Uso: python scripts/benchmarks/benchmark_extrator_valores.py [--linhas 200,2000,20000]
+"""
+
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import timeit
+from decimal import Decimal
+
+# Adiciona o diretório raiz ao path para importar os módulos
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from src.utils.ocr_reader import analisar_valores_monetarios
+
+
+def _extrair_valores_legado(texto):
+    """Implementação anterior de extrair_valores_monetarios (referência)"""
+    padroes = [
+        r'R\$\s*(\d{1,3}(?:\.\d{3})*(?:,\d{2}))',
+        r'R\$\s*(\d+,\d{2})',
+        r'(?:^|\s)(\d{1,3}(?:\.\d{3})*,\d{2})(?:\s|$)',
+        r'(?:total|valor|subtotal|importo)[\s:]+R?\$?\s*(\d{1,3}(?:\.\d{3})*,\d{2})',
+    ]
+    valores_encontrados = []
+    for padrao in padroes:
+        for match in re.finditer(padrao, texto, re.IGNORECASE):
+            valor_str = match.group(1).replace('.', '').replace(',', '.')
+            try:
+                valores_encontrados.append(Decimal(valor_str))
+            except Exception:
+                continue
+    return valores_encontrados
+
+
+def _processar_legado(texto):
+    """O que processar_arquivo fazia: maior valor + lista (duas extrações)"""
+    valores = _extrair_valores_legado(texto)
+    maior = max(valores) if valores else None
+    return maior, _extrair_valores_legado(texto)
+
+
+def _processar_novo(texto):
+    """O que processar_arquivo faz agora (uma extração, top 10 candidatos)"""
+    analise = analisar_valores_monetarios(texto, limite_candidatos=10)
+    return analise['valor_total'], analise['valores']
+
+
+def gerar_dump_ocr(linhas, semente=0):
+    """Texto parecido com a saída do Tesseract para cupons longos"""
+    rng = random.Random(semente)
+    modelos = [
+        "{item} {qtd} UN X {unit} R$ {valor}",
+        "{item}   {valor}",
+        "CNPJ 12.345.678/0001-90 IE 123.456.789.000",
+        "VALOR APROXIMADO DOS TRIBUTOS R$ {valor} (12,5%)",
+        "--------------------------------------------",
+        "SUBTOTAL {valor}",
+        "DESCONTO R$ {valor}",
+    ]
+    saida = []
+    for _ in range(linhas):
+        valor = f"{rng.randint(1, 9999):,}".replace(",", ".") + f",{rng.randint(0, 99):02d}"
+        saida.append(rng.choice(modelos).format(
+            item=rng.choice(["GASOLINA", "ALMOCO", "CAFE", "HOSPEDAGEM"]),
+            qtd=rng.randint(1, 9), unit=f"{rng.randint(1, 99)},{rng.randint(0, 99):02d}", valor=valor
+        ))
+    saida.append("TOTAL R$ 1.234,56")
+    return "\n".join(saida)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--linhas", default="200,2000,20000", help="Tamanhos de dump (linhas), separados por vírgula")
+    parser.add_argument("--repeticoes", type=int, default=5)
+    args = parser.parse_args()
+
+    resultados = []
+    for linhas in [int(n) for n in args.linhas.split(",")]:
+        texto = gerar_dump_ocr(linhas)
+        numero = max(1, 20000 // linhas)
+
+        legado = min(timeit.repeat(lambda: _processar_legado(texto), number=numero, repeat=args.repeticoes)) / numero
+        novo = min(timeit.repeat(lambda: _processar_novo(texto), number=numero, repeat=args.repeticoes)) / numero
+
+        resultados.append({
+            "linhas": linhas,
+            "bytes": len(texto.encode()),
+            "legado_ms": round(legado * 1000, 3),
+            "novo_ms": round(novo * 1000, 3),
+            "speedup": round(legado / novo, 2) if novo else None
+        })
+        print(f"{linhas:>6} linhas | legado {legado * 1000:9.3f} ms | novo {novo * 1000:9.3f} ms "
+              f"| speedup {legado / novo:5.2f}x", file=sys.stderr)
+
+    print(json.dumps(resultados, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""
+Benchmark da listagem de comprovantes (GET /ocr/)
+Cria um banco SQLite temporário com N comprovantes (texto de OCR de
+alguns KB cada) e compara a listagem antiga (todas as linhas com o texto
+completo) com a paginação por cursor: primeira página, página profunda
+(cursor x OFFSET), filtros e incluir_texto. Também percorre todas as
+páginas conferindo que nenhum id se repete ou falta
+
+Uso: python scripts/benchmarks/benchmark_listagem_ocr.py [--linhas 100000] [--limit 50]
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+# Adiciona o diretório raiz ao path para importar os módulos
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+STATUS = ['Pendente', 'Aprovado', 'Divergente']
+
+
+def _popular(db, Comprovante, Reembolso, linhas, tamanho_texto, semente=0):
+    """Insere reembolsos e comprovantes em lotes (insert executemany)"""
+    rng = random.Random(semente)
+    quantidade_reembolsos = max(1, linhas // 10)
+    db.session.execute(Reembolso.__table__.insert(), [
+        {'colaborador': f'Colaborador {i}', 'empresa': 'Sispar', 'tipo_reembolso': 'Alimentação',
+         'centro_custo': 'TI', 'moeda': 'BRL', 'valor_faturado': 100}
+        for i in range(quantidade_reembolsos)
+    ])
+
+    base = datetime(2024, 1, 1)
+    texto = ('CUPOM FISCAL ELETRONICO - SAT\nALMOCO 1 UN X 45,90 R$ 45,90\n' * (tamanho_texto // 60 + 1))[:tamanho_texto]
+    lote = []
+    for i in range(linhas):
+        lote.append({
+            'nome_arquivo': f'{i:064x}'[:2] + f'/{i:064x}'[2:4] + f'/{i:064x}.png',
+            'texto_extraido': texto,
+            # Vários comprovantes no mesmo segundo: o desempate pelo id precisa funcionar
+            'data_criacao': base + timedelta(seconds=i // 3),
+            'valor_extraido': rng.randint(100, 99999) / 100,
+            'status_validacao': rng.choice(STATUS),
+            'reembolso_id': rng.randint(1, quantidade_reembolsos)
+        })
+        if len(lote) == 5000:
+            db.session.execute(Comprovante.__table__.insert(), lote)
+            lote = []
+    if lote:
+        db.session.execute(Comprovante.__table__.insert(), lote)
+    db.session.commit()
+    return quantidade_reembolsos
+
+
+def _medir(funcao, repeticoes):
+    """Menor tempo (ms) entre as repetições e o último retorno"""
+    melhor = None
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        retorno = funcao()
+        decorrido = (time.perf_counter() - inicio) * 1000
+        melhor = decorrido if melhor is None else min(melhor, decorrido)
+    return round(melhor, 2), retorno
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--linhas', type=int, default=100000)
+    parser.add_argument('--tamanho-texto', type=int, default=3000, help='Bytes de texto_extraido por comprovante')
+    parser.add_argument('--limit', type=int, default=50)
+    parser.add_argument('--repeticoes', type=int, default=3)
+    args = parser.parse_args()
+
+    pasta = tempfile.mkdtemp(prefix='bench_listagem_')
+    os.environ['FLASK_ENV'] = 'development'
+    os.environ['URL_DATABASE_DEV'] = f"sqlite:///{os.path.join(pasta, 'bench.db')}"
+
+    from src.app import create_app
+    from src.model import db
+    from src.model.comprovante_model import Comprovante
+    from src.model.reembolso_model import Reembolso
+    from sqlalchemy.orm import load_only
+
+    app = create_app()
+    cliente = app.test_client()
+
+    with app.app_context():
+        inicio = time.perf_counter()
+        quantidade_reembolsos = _popular(db, Comprovante, Reembolso, args.linhas, args.tamanho_texto)
+        print(f"{args.linhas} comprovantes inseridos em {time.perf_counter() - inicio:.1f}s", file=sys.stderr)
+
+        def legado():
+            # O que GET /ocr/ fazia: todas as linhas, com o texto, num único JSON
+            comprovantes = Comprovante.query.order_by(Comprovante.data_criacao.desc()).all()
+            corpo = json.dumps([
+                {'id': c.id, 'nome_arquivo': c.nome_arquivo, 'texto_extraido': c.texto_extraido,
+                 'data_criacao': c.data_criacao.isoformat()}
+                for c in comprovantes
+            ])
+            db.session.expunge_all()
+            return len(corpo)
+
+        def offset_profundo():
+            # Mesma página profunda por OFFSET (o banco descarta todas as linhas anteriores)
+            return Comprovante.query.options(load_only(
+                Comprovante.id, Comprovante.nome_arquivo, Comprovante.data_criacao, Comprovante.reembolso_id,
+                Comprovante.valor_extraido, Comprovante.status_validacao
+            )).order_by(
+                Comprovante.data_criacao.desc(), Comprovante.id.desc()
+            ).offset(args.linhas - args.limit).limit(args.limit).all()
+
+        legado_ms, legado_bytes = _medir(legado, 1)
+        offset_ms, _ = _medir(offset_profundo, args.repeticoes)
+
+    def pagina(consulta):
+        resposta = cliente.get(f"/ocr/?{consulta}")
+        assert resposta.status_code == 200, resposta.get_data(as_text=True)
+        return resposta
+
+    resultados = {
+        'linhas': args.linhas,
+        'limit': args.limit,
+        'legado_todas_as_linhas': {'ms': legado_ms, 'bytes': legado_bytes}
+    }
+
+    for nome, consulta in [
+        ('primeira_pagina', f"limit={args.limit}"),
+        ('primeira_pagina_com_texto', f"limit={args.limit}&incluir_texto=true"),
+        ('filtro_reembolso_id', f"limit={args.limit}&reembolso_id={quantidade_reembolsos // 2}"),
+        ('filtro_status_validacao', f"limit={args.limit}&status_validacao=Divergente"),
+    ]:
+        ms, resposta = _medir(lambda: pagina(consulta), args.repeticoes)
+        resultados[nome] = {'ms': ms, 'bytes': len(resposta.data)}
+
+    # Percorre tudo com páginas grandes para chegar ao fim e conferir a cobertura
+    ids = set()
+    paginas = 0
+    cursor = ''
+    inicio = time.perf_counter()
+    while True:
+        resposta = pagina(f"limit=500{cursor}")
+        ids.update(c['id'] for c in resposta.get_json())
+        paginas += 1
+        proximo_cursor = resposta.headers.get('X-Proximo-Cursor')
+        if not proximo_cursor:
+            break
+        cursor = f"&cursor={proximo_cursor}"
+        penultimo_cursor = proximo_cursor
+    percorrer_ms = (time.perf_counter() - inicio) * 1000
+    assert len(ids) == args.linhas, f"{len(ids)} ids distintos, esperado {args.linhas}"
+
+    # Página profunda: a partir de um cursor perto do fim
+    ms, resposta = _medir(lambda: pagina(f"limit={args.limit}&cursor={penultimo_cursor}"), args.repeticoes)
+    resultados['pagina_profunda_cursor'] = {'ms': ms, 'bytes': len(resposta.data)}
+    resultados['pagina_profunda_offset_sql'] = {'ms': offset_ms}
+    resultados['percorrer_tudo_limit_500'] = {
+        'ms': round(percorrer_ms, 2), 'paginas': paginas, 'ids_distintos': len(ids)
+    }
+
+    for nome, valor in resultados.items():
+        if isinstance(valor, dict):
+            print(f"{nome:<28} {valor.get('ms', ''):>10} ms  {valor.get('bytes', '')}", file=sys.stderr)
+    print(json.dumps(resultados, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+"""
+Benchmark de regressão do OCR com um corpus sintético reprodutível
+Gera cupons brasileiros (PNG limpo, foto de celular e PDFs de 1 a 10
+páginas, com fontes, ruído, rotação e valores sorteados pela semente),
+roda processar_arquivo em cada um e grava um relatório JSON com:
+
+- latência total e por etapa (p50/p90/p95/p99 e máximo, em ms)
+- páginas por segundo
+- pico de memória (RSS) do processo e dos filhos
+- acerto do valor extraído contra o total desenhado
+
+Rodar antes do deploy com a mesma semente e comparar com o relatório
+anterior mostra regressões de desempenho do OCR
+
+Uso: python scripts/benchmarks/benchmark_ocr.py [--quantidade 30] [--semente 0] [--saida relatorio.json]
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+# Adiciona o diretório raiz ao path para importar os módulos
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from recibos_sinteticos import gerar_corpus
+from benchmark_ocr_paginas import pico_rss_mb
+from src.utils import ocr_reader
+
+
+def percentis(valores):
+    """p50/p90/p95/p99 pelo método do vizinho mais próximo, em ms"""
+    if not valores:
+        return None
+    ordenados = sorted(valores)
+
+    def p(q):
+        return round(ordenados[min(len(ordenados) - 1, int(q / 100 * len(ordenados)))], 2)
+
+    return {"p50": p(50), "p90": p(90), "p95": p(95), "p99": p(99),
+            "max": round(ordenados[-1], 2), "n": len(ordenados)}
+
+
+def etapas_planas(tempos_ms):
+    """{'ocr': 1.2, 'niveis': {'rapido': 3.4}} -> {'ocr': 1.2, 'nivel_rapido': 3.4}"""
+    planas = {}
+    for chave, valor in tempos_ms.items():
+        if isinstance(valor, dict):
+            for nivel, tempo in valor.items():
+                planas[f"nivel_{nivel}"] = tempo
+        else:
+            planas[chave] = valor
+    return planas
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--quantidade", type=int, default=30, help="Documentos gerados (1/3 de cada tipo)")
+    parser.add_argument("--semente", type=int, default=0, help="Semente do corpus (mesma semente = mesmo corpus)")
+    parser.add_argument("--max-paginas", type=int, default=10, help="Páginas máximas dos PDFs")
+    parser.add_argument("--backend", default=None, help="pytesseract ou tesserocr (padrão OCR_BACKEND)")
+    parser.add_argument("--sem-niveis", action="store_true", help="Desliga o OCR em níveis (só a passada completa)")
+    parser.add_argument("--saida", help="Arquivo do relatório JSON (padrão: stdout)")
+    args = parser.parse_args()
+
+    documentos = []
+    etapas = {}
+    with tempfile.TemporaryDirectory() as pasta:
+        corpus = gerar_corpus(pasta, args.quantidade, semente=args.semente, max_paginas=args.max_paginas)
+
+        inicio_total = time.perf_counter()
+        for item in corpus:
+            inicio = time.perf_counter()
+            resultado = ocr_reader.processar_arquivo(item["caminho"], backend=args.backend,
+                                                     escalonar=not args.sem_niveis)
+            total_ms = (time.perf_counter() - inicio) * 1000
+
+            planas = etapas_planas(resultado["tempos_ms"])
+            planas["total"] = total_ms
+            for etapa, tempo in planas.items():
+                etapas.setdefault(etapa, []).append(tempo)
+
+            extraido = resultado["valor_extraido"]
+            documentos.append({
+                "arquivo": os.path.basename(item["caminho"]),
+                "tipo": item["tipo"],
+                "paginas": item["paginas"],
+                "esperado": float(item["esperado"]),
+                "extraido": float(extraido) if extraido is not None else None,
+                "acertou": extraido == item["esperado"],
+                "nivel_ocr": resultado.get("nivel_ocr"),
+                "total_ms": round(total_ms, 2),
+                "erro": resultado["texto"].startswith("Erro ao processar"),
+            })
+            print(f"{documentos[-1]['arquivo']:>20} | {item['paginas']:>2} pág | {total_ms:9.1f} ms "
+                  f"| {'ok ' if documentos[-1]['acertou'] else 'ERR'} | RSS {pico_rss_mb():7.1f} MB", file=sys.stderr)
+        duracao = time.perf_counter() - inicio_total
+
+    paginas = sum(d["paginas"] for d in documentos)
+    por_tipo = {}
+    for tipo in ("png", "foto", "pdf"):
+        do_tipo = [d for d in documentos if d["tipo"] == tipo]
+        if do_tipo:
+            por_tipo[tipo] = {
+                "documentos": len(do_tipo),
+                "acerto_valor": round(sum(d["acertou"] for d in do_tipo) / len(do_tipo), 3),
+                "latencia_ms": percentis([d["total_ms"] for d in do_tipo]),
+            }
+
+    relatorio = {
+        "ambiente": {
+            "python": platform.python_version(),
+            "plataforma": platform.platform(),
+            "cpus": os.cpu_count(),
+            "backend_ocr": args.backend or ocr_reader.OCR_BACKEND,
+            "niveis": not args.sem_niveis,
+            "semente": args.semente,
+        },
+        "resumo": {
+            "documentos": len(documentos),
+            "paginas": paginas,
+            "duracao_s": round(duracao, 3),
+            "paginas_por_segundo": round(paginas / duracao, 3) if duracao else None,
+            "pico_rss_mb": pico_rss_mb(),
+            "acerto_valor": round(sum(d["acertou"] for d in documentos) / len(documentos), 3) if documentos else None,
+            "erros_ocr": sum(d["erro"] for d in documentos),
+        },
+        "etapas_ms": {etapa: percentis(tempos) for etapa, tempos in sorted(etapas.items())},
+        "por_tipo": por_tipo,
+        "documentos": documentos,
+    }
+
+    saida = json.dumps(relatorio, indent=2, ensure_ascii=False)
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as arquivo:
+            arquivo.write(saida)
+        print(f"Relatório salvo em {args.saida}", file=sys.stderr)
+    else:
+        print(saida)
+
+
+if __name__ == "__main__":
+    main()
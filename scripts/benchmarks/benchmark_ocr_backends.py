@@ -0,0 +1,72 @@
+"""
+Benchmark de throughput dos backends de OCR
+Compara o pytesseract (um processo tesseract por imagem) com o tesserocr
+(API do Tesseract persistente no processo) sobre cupons sintéticos,
+chamando processar_arquivo para garantir o mesmo formato de resultado
+
+Uso: python scripts/benchmarks/benchmark_ocr_backends.py [--quantidade 20] [--backends pytesseract,tesserocr]
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+# Adiciona o diretório raiz ao path para importar os módulos
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from recibos_sinteticos import gerar_recibo
+from src.utils import ocr_reader
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--quantidade", type=int, default=20, help="Imagens sintéticas")
+    parser.add_argument("--backends", default="pytesseract,tesserocr")
+    args = parser.parse_args()
+
+    resultados = []
+    with tempfile.TemporaryDirectory() as pasta:
+        caminhos = []
+        for i in range(args.quantidade):
+            imagem, _ = gerar_recibo(semente=i)
+            caminho = os.path.join(pasta, f"recibo_{i:03d}.png")
+            imagem.save(caminho)
+            caminhos.append(caminho)
+
+        for backend in args.backends.split(","):
+            if backend == "tesserocr" and ocr_reader.tesserocr is None:
+                print("tesserocr não instalado; pulando", file=sys.stderr)
+                continue
+
+            # Aquecimento: no tesserocr é aqui que o idioma é carregado
+            ocr_reader.processar_arquivo(caminhos[0], backend=backend, escalonar=False)
+
+            valores = []
+            inicio = time.perf_counter()
+            for caminho in caminhos:
+                resultado = ocr_reader.processar_arquivo(caminho, backend=backend, escalonar=False)
+                valores.append(float(resultado['valor_extraido']) if resultado['valor_extraido'] else None)
+            total = time.perf_counter() - inicio
+
+            resultados.append({
+                "backend": backend,
+                "imagens": len(caminhos),
+                "total_s": round(total, 3),
+                "ms_por_imagem": round(total / len(caminhos) * 1000, 1),
+                "imagens_por_s": round(len(caminhos) / total, 2),
+                "valores": valores
+            })
+            print(f"{backend:>12} | {len(caminhos) / total:6.2f} imagens/s | {total / len(caminhos) * 1000:7.1f} ms/imagem",
+                  file=sys.stderr)
+
+    if len(resultados) == 2:
+        print(f"concordância de valores: {resultados[0]['valores'] == resultados[1]['valores']}", file=sys.stderr)
+
+    print(json.dumps(resultados, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Benchmark do OCR paralelo por página em PDFs
+Compara o tempo de extrair_texto_pdf sequencial (1 processo) com o pool
+de processos para PDFs de 1 a N páginas, e mostra o pico de memória
+(RSS) dos processos de OCR - com a rasterização em streaming ele deve
+ficar estável mesmo aumentando o número de páginas
+
+Uso: python scripts/benchmarks/benchmark_ocr_paginas.py [--paginas 1,2,4,6,8] [--workers 8]
+"""
+
+import argparse
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+
+# Adiciona o diretório raiz ao path para importar os módulos
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from recibos_sinteticos import gerar_pdf
+from src.utils.ocr_reader import extrair_texto_pdf, OCR_PDF_WORKERS
+
+
+def pico_rss_mb():
+    """Maior RSS (MB) entre este processo e os filhos (poppler, tesseract, pool)"""
+    proprio = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    filhos = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return round(max(proprio, filhos) / 1024, 1)
+
+
+def medir(caminho_pdf, workers, repeticoes, janela=None):
+    """Melhor tempo (s) entre as repetições"""
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        texto = extrair_texto_pdf(caminho_pdf, workers=workers, janela=janela)
+        tempos.append(time.perf_counter() - inicio)
+        if texto.startswith("Erro ao processar PDF"):
+            raise RuntimeError(texto)
+    return min(tempos)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--paginas", default="1,2,4,6,8", help="Quantidades de páginas, separadas por vírgula")
+    parser.add_argument("--workers", type=int, default=OCR_PDF_WORKERS, help="Processos do modo paralelo")
+    parser.add_argument("--repeticoes", type=int, default=3)
+    parser.add_argument("--janela", type=int, default=None, help="Páginas por renderização")
+    args = parser.parse_args()
+
+    resultados = []
+    with tempfile.TemporaryDirectory() as pasta:
+        for paginas in [int(p) for p in args.paginas.split(",")]:
+            caminho = os.path.join(pasta, f"recibo_{paginas}p.pdf")
+            gerar_pdf(caminho, paginas=paginas)
+
+            sequencial = medir(caminho, 1, args.repeticoes, args.janela)
+            paralelo = medir(caminho, args.workers, args.repeticoes, args.janela)
+
+            resultados.append({
+                "paginas": paginas,
+                "workers": min(args.workers, paginas),
+                "sequencial_s": round(sequencial, 3),
+                "paralelo_s": round(paralelo, 3),
+                "speedup": round(sequencial / paralelo, 2) if paralelo else None,
+                "pico_rss_mb": pico_rss_mb()
+            })
+            print(f"{paginas:>3} páginas | sequencial {sequencial:7.2f}s | paralelo {paralelo:7.2f}s "
+                  f"| speedup {sequencial / paralelo:5.2f}x | pico RSS {pico_rss_mb():7.1f} MB", file=sys.stderr)
+
+    print(json.dumps(resultados, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Benchmark do envio do comprovante ao Gemini Vision
+Compara o arquivo original (o que genai.upload_file enviava) com a imagem
+reduzida e recomprimida de preparar_imagem_vision (enviada na própria
+requisição): bytes, tempo de preparo e tempo estimado de envio numa
+conexão de --mbps. Sem arquivos, gera comprovantes sintéticos (foto de
+celular, digitalização em PNG e um cupom pequeno)
+
+Com --rede e GEMINI_API_KEY definida, mede também a latência real das
+duas formas (upload_file + generate_content x generate_content inline)
+
+Uso: python scripts/benchmarks/benchmark_payload_vision.py [arquivos...] [--mbps 10] [--rede]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+# Adiciona o diretório raiz ao path para importar os módulos
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from PIL import Image, ImageDraw
+
+
+def _comprovantes_sinteticos(pasta):
+    """Foto de celular (JPEG 12 MP), digitalização A4 a 300 DPI (PNG) e cupom pequeno"""
+    arquivos = []
+
+    foto = Image.effect_noise((4032, 3024), 40).convert('RGB')
+    desenho = ImageDraw.Draw(foto)
+    for linha in range(40):
+        desenho.text((800, 300 + linha * 60), f'ITEM {linha:02d} ........ R$ {linha * 3.7:,.2f}', fill='black')
+    caminho = os.path.join(pasta, 'foto_celular.jpg')
+    foto.save(caminho, quality=92)
+    arquivos.append(caminho)
+
+    # Fundo com ruído leve, como o de um scanner (uma página lisa comprime irrealmente bem)
+    digitalizado = Image.effect_noise((2480, 3508), 6).point(lambda v: min(255, v + 120))
+    desenho = ImageDraw.Draw(digitalizado)
+    for linha in range(120):
+        desenho.text((200, 200 + linha * 26), f'NOTA FISCAL DE SERVICO {linha:03d}   VALOR R$ {linha * 12.5:,.2f}', fill=0)
+    caminho = os.path.join(pasta, 'digitalizado_a4.png')
+    digitalizado.save(caminho)
+    arquivos.append(caminho)
+
+    cupom = Image.new('RGB', (600, 1400), 'white')
+    desenho = ImageDraw.Draw(cupom)
+    for linha in range(50):
+        desenho.text((20, 20 + linha * 26), f'CUPOM {linha:02d}  R$ {linha * 1.9:.2f}', fill='black')
+    caminho = os.path.join(pasta, 'cupom_pequeno.png')
+    cupom.save(caminho)
+    arquivos.append(caminho)
+
+    return arquivos
+
+
+def _latencias_rede(caminho, payload, repeticoes):
+    """Latência real (ms) de upload_file + generate_content e de generate_content inline"""
+    import google.generativeai as genai
+    genai.configure(api_key=os.environ['GEMINI_API_KEY'])
+    modelo = genai.GenerativeModel(os.environ.get('VISION_MODELO_BENCHMARK', 'gemini-1.5-flash'))
+    prompt = 'Qual o valor total deste comprovante? Responda só o número.'
+
+    upload, inline = [], []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        modelo.generate_content([prompt, genai.upload_file(caminho)])
+        upload.append((time.perf_counter() - inicio) * 1000)
+
+        inicio = time.perf_counter()
+        modelo.generate_content([prompt, {'mime_type': payload['mime_type'], 'data': payload['dados']}])
+        inline.append((time.perf_counter() - inicio) * 1000)
+
+    return round(statistics.median(upload), 1), round(statistics.median(inline), 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('arquivos', nargs='*')
+    parser.add_argument('--mbps', type=float, default=10.0, help='Banda de upload para o tempo estimado de envio')
+    parser.add_argument('--repeticoes', type=int, default=3)
+    parser.add_argument('--rede', action='store_true', help='Mede a latência real no Gemini (requer GEMINI_API_KEY)')
+    args = parser.parse_args()
+
+    from src.utils.ia_utils import preparar_imagem_vision, VISION_LADO_MAXIMO, VISION_QUALIDADE_JPEG
+
+    arquivos = args.arquivos or _comprovantes_sinteticos(tempfile.mkdtemp(prefix='bench_vision_'))
+    bytes_por_ms = args.mbps * 1_000_000 / 8 / 1000
+
+    resultados = {'lado_maximo': VISION_LADO_MAXIMO, 'qualidade_jpeg': VISION_QUALIDADE_JPEG, 'mbps': args.mbps, 'arquivos': []}
+    for caminho in arquivos:
+        tempos = []
+        for _ in range(args.repeticoes):
+            inicio = time.perf_counter()
+            payload = preparar_imagem_vision(caminho)
+            tempos.append((time.perf_counter() - inicio) * 1000)
+
+        original = os.path.getsize(caminho)
+        item = {'arquivo': os.path.basename(caminho), 'bytes_original': original}
+        if payload is None:
+            item['modo'] = 'upload'
+        else:
+            item.update({
+                'modo': 'inline',
+                'dimensoes': f"{payload['largura']}x{payload['altura']}",
+                'bytes_enviados': payload['bytes_enviados'],
+                'reducao_percentual': round((1 - payload['bytes_enviados'] / original) * 100, 1),
+                'preparo_ms': round(min(tempos), 1),
+                'envio_estimado_original_ms': round(original / bytes_por_ms, 1),
+                'envio_estimado_reduzido_ms': round(payload['bytes_enviados'] / bytes_por_ms, 1)
+            })
+            if args.rede:
+                item['latencia_upload_ms'], item['latencia_inline_ms'] = _latencias_rede(caminho, payload, args.repeticoes)
+        resultados['arquivos'].append(item)
+
+        print(f"{item['arquivo']:<24} {original:>10} -> {item.get('bytes_enviados', '-'):>9} bytes "
+              f"({item.get('reducao_percentual', '-')}%)  preparo {item.get('preparo_ms', '-')} ms", file=sys.stderr)
+
+    print(json.dumps(resultados, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""
+Benchmark do pré-processamento de imagens antes do Tesseract
+Roda processar_arquivo em cada imagem do corpus com e sem
+pré-processamento e compara latência e o valor extraído
+
+Sem --corpus, gera fotos sintéticas de cupons (12 MP, coloridas,
+giradas e com ruído) cujo valor total é conhecido
+
+Uso: python scripts/benchmarks/benchmark_preprocessamento.py [--corpus pasta] [--quantidade 10]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+# Adiciona o diretório raiz ao path para importar os módulos
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from recibos_sinteticos import gerar_recibo, simular_foto
+from src.utils.ocr_reader import processar_arquivo
+
+EXTENSOES_IMAGEM = ('.jpg', '.jpeg', '.png', '.webp', '.bmp', '.tif', '.tiff')
+
+
+def gerar_corpus(pasta, quantidade):
+    """Salva fotos sintéticas e devolve [(caminho, valor_total esperado)]"""
+    corpus = []
+    for i in range(quantidade):
+        recibo, total = gerar_recibo(semente=i)
+        foto = simular_foto(recibo, semente=i)
+        caminho = os.path.join(pasta, f"foto_{i:03d}.jpg")
+        foto.save(caminho, "JPEG", quality=90)
+        corpus.append((caminho, total))
+    return corpus
+
+
+def carregar_corpus(pasta):
+    """Imagens reais: o valor esperado é desconhecido (só compara os modos)"""
+    return [
+        (os.path.join(pasta, nome), None)
+        for nome in sorted(os.listdir(pasta))
+        if nome.lower().endswith(EXTENSOES_IMAGEM)
+    ]
+
+
+def medir(caminho, opcoes):
+    inicio = time.perf_counter()
+    resultado = processar_arquivo(caminho, opcoes_preprocessamento=opcoes, escalonar=False)
+    return time.perf_counter() - inicio, resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", help="Pasta com imagens de comprovantes reais")
+    parser.add_argument("--quantidade", type=int, default=10, help="Fotos sintéticas geradas sem --corpus")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as pasta:
+        corpus = carregar_corpus(args.corpus) if args.corpus else gerar_corpus(pasta, args.quantidade)
+
+        itens = []
+        for caminho, esperado in corpus:
+            tempo_bruto, bruto = medir(caminho, {'ativo': False})
+            tempo_pre, pre = medir(caminho, None)
+
+            itens.append({
+                "arquivo": os.path.basename(caminho),
+                "esperado": float(esperado) if esperado is not None else None,
+                "sem_pre_s": round(tempo_bruto, 3),
+                "com_pre_s": round(tempo_pre, 3),
+                "valor_sem_pre": float(bruto['valor_extraido']) if bruto['valor_extraido'] else None,
+                "valor_com_pre": float(pre['valor_extraido']) if pre['valor_extraido'] else None,
+                "etapas_com_pre_ms": pre['tempos_ms'],
+            })
+            print(f"{os.path.basename(caminho):>20} | sem {tempo_bruto:6.2f}s | com {tempo_pre:6.2f}s", file=sys.stderr)
+
+    def acertos(chave):
+        com_gabarito = [i for i in itens if i["esperado"] is not None]
+        if not com_gabarito:
+            return None
+        return sum(1 for i in com_gabarito if i[chave] == i["esperado"]) / len(com_gabarito)
+
+    resumo = {
+        "imagens": len(itens),
+        "mediana_sem_pre_s": round(statistics.median(i["sem_pre_s"] for i in itens), 3) if itens else None,
+        "mediana_com_pre_s": round(statistics.median(i["com_pre_s"] for i in itens), 3) if itens else None,
+        "concordancia_valor": round(sum(1 for i in itens if i["valor_sem_pre"] == i["valor_com_pre"]) / len(itens), 3) if itens else None,
+        "acerto_sem_pre": acertos("valor_sem_pre"),
+        "acerto_com_pre": acertos("valor_com_pre"),
+    }
+    print(json.dumps({"resumo": resumo, "itens": itens}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""
+Gerador de comprovantes sintéticos para os benchmarks de OCR
+Desenha cupons fiscais simples com PIL (sem depender de arquivos reais)
+"""
+
+import os
+import random
+from decimal import Decimal
+from PIL import Image, ImageDraw, ImageFont, ImageChops
+
+FONTES_CANDIDATAS = [
+    "/usr/share/fonts/truetype/dejavu/DejaVuSansMono.ttf",
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+    "DejaVuSansMono.ttf",
+    "arial.ttf",
+]
+
+# Fontes sorteadas no corpus variado (as ausentes são ignoradas)
+FONTES_VARIADAS = [
+    "/usr/share/fonts/truetype/dejavu/DejaVuSansMono.ttf",
+    "/usr/share/fonts/truetype/dejavu/DejaVuSansMono-Bold.ttf",
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf",
+    "/usr/share/fonts/truetype/dejavu/DejaVuSerif.ttf",
+    "/usr/share/fonts/truetype/liberation/LiberationMono-Regular.ttf",
+    "/usr/share/fonts/truetype/liberation/LiberationSans-Regular.ttf",
+    "arial.ttf",
+    "cour.ttf",
+]
+
+
+def carregar_fonte(tamanho=32, candidatas=None):
+    """Primeira fonte TrueType disponível, ou a fonte bitmap padrão do PIL"""
+    for caminho in candidatas or FONTES_CANDIDATAS:
+        try:
+            return ImageFont.truetype(caminho, tamanho)
+        except OSError:
+            continue
+    return ImageFont.load_default()
+
+
+def fonte_aleatoria(rng, tamanho_minimo=26, tamanho_maximo=38):
+    """Sorteia família e tamanho entre as FONTES_VARIADAS instaladas"""
+    candidatas = FONTES_VARIADAS[:]
+    rng.shuffle(candidatas)
+    return carregar_fonte(rng.randint(tamanho_minimo, tamanho_maximo), candidatas)
+
+
+def gerar_itens(rng, quantidade):
+    """Lista de (descrição, valor) para o corpo do cupom"""
+    produtos = ["GASOLINA COMUM", "ALMOCO EXECUTIVO", "AGUA MINERAL", "ESTACIONAMENTO",
+                "DIARIA HOTEL", "CAFE EXPRESSO", "PEDAGIO", "TAXI CORRIDA"]
+    return [(rng.choice(produtos), Decimal(rng.randint(100, 30000)) / 100) for _ in range(quantidade)]
+
+
+def formatar_brl(valor):
+    """Decimal -> '1.234,56'"""
+    inteiro, centavos = f"{valor:.2f}".split(".")
+    inteiro = f"{int(inteiro):,}".replace(",", ".")
+    return f"{inteiro},{centavos}"
+
+
+def gerar_recibo(semente=0, largura=1240, altura=1754, itens=8, fonte=None):
+    """
+    Desenha um cupom fiscal sintético
+
+    Returns:
+        Tuple (imagem PIL, valor_total Decimal)
+    """
+    rng = random.Random(semente)
+    fonte = fonte or carregar_fonte(32)
+    imagem = Image.new("L", (largura, altura), 255)
+    desenho = ImageDraw.Draw(imagem)
+
+    linhas = [
+        "POSTO E RESTAURANTE EXEMPLO LTDA",
+        f"CNPJ: {rng.randint(10, 99)}.{rng.randint(100, 999)}.{rng.randint(100, 999)}/0001-{rng.randint(10, 99)}",
+        "CUPOM FISCAL ELETRONICO - SAT",
+        "-" * 40,
+    ]
+    lista_itens = gerar_itens(rng, itens)
+    for descricao, valor in lista_itens:
+        linhas.append(f"{descricao:<24} R$ {formatar_brl(valor):>10}")
+
+    total = sum(valor for _, valor in lista_itens)
+    linhas += ["-" * 40, f"TOTAL R$ {formatar_brl(total)}", "FORMA PAGAMENTO: CARTAO DEBITO"]
+
+    y = 80
+    for linha in linhas:
+        desenho.text((80, y), linha, fill=0, font=fonte)
+        y += 48
+
+    return imagem, total
+
+
+def simular_foto(imagem, semente=0, largura=3000, altura=4000, angulo_maximo=2.0, ruido=12):
+    """
+    Transforma o cupom numa "foto de celular": colorida, grande
+    (12 MP por padrão), levemente girada e com ruído
+
+    Returns:
+        Imagem PIL em RGB
+    """
+    rng = random.Random(semente)
+    foto = imagem.convert("RGB").resize((largura, altura), Image.BICUBIC)
+    foto = foto.rotate(rng.uniform(-angulo_maximo, angulo_maximo), resample=Image.BICUBIC,
+                       expand=False, fillcolor=(205, 200, 190))
+
+    # Papel amarelado + ruído do sensor
+    tom = Image.new("RGB", foto.size, (235, 225, 205))
+    foto = ImageChops.multiply(foto, tom)
+    if ruido:
+        granulado = Image.effect_noise(foto.size, ruido).convert("RGB")
+        # effect_noise é centrado em 128: soma o desvio em torno disso
+        foto = ImageChops.add(foto, granulado, scale=1.0, offset=-128)
+    return foto
+
+
+def gerar_pdf(caminho, paginas=1, semente=0, dpi=150, variar_fonte=False):
+    """
+    Salva um PDF com `paginas` cupons (um por página)
+
+    Returns:
+        Lista com o valor total de cada página
+    """
+    imagens = []
+    totais = []
+    for i in range(paginas):
+        fonte = fonte_aleatoria(random.Random(semente + i)) if variar_fonte else None
+        imagem, total = gerar_recibo(semente=semente + i, fonte=fonte)
+        imagens.append(imagem.convert("RGB"))
+        totais.append(total)
+
+    imagens[0].save(caminho, "PDF", resolution=dpi, save_all=True, append_images=imagens[1:])
+    for imagem in imagens:
+        imagem.close()
+    return totais
+
+
+def gerar_corpus(pasta, quantidade, semente=0, max_paginas=10):
+    """
+    Corpus variado e reprodutível: cupons limpos (PNG), fotos de celular
+    (JPEG girado e com ruído) e PDFs de 1 a `max_paginas` páginas, com
+    fonte, tamanho de letra, quantidade de itens e valores sorteados
+
+    O valor esperado de um PDF é o maior total entre as páginas (é o que
+    o ranking do extrator escolhe quando todas têm "TOTAL")
+
+    Returns:
+        Lista de dicts {caminho, tipo, paginas, esperado}
+    """
+    rng = random.Random(semente)
+    corpus = []
+    for i in range(quantidade):
+        tipo = ("png", "foto", "pdf")[i % 3]
+        semente_doc = rng.randint(0, 10 ** 6)
+        caminho = os.path.join(pasta, f"doc_{i:03d}_{tipo}")
+
+        if tipo == "pdf":
+            caminho += ".pdf"
+            paginas = rng.randint(1, max_paginas)
+            esperado = max(gerar_pdf(caminho, paginas=paginas, semente=semente_doc, variar_fonte=True))
+        else:
+            paginas = 1
+            recibo, esperado = gerar_recibo(semente=semente_doc, itens=rng.randint(3, 14),
+                                            fonte=fonte_aleatoria(rng))
+            if tipo == "foto":
+                caminho += ".jpg"
+                foto = simular_foto(recibo, semente=semente_doc, angulo_maximo=rng.uniform(0.5, 4.0),
+                                    ruido=rng.randint(4, 24))
+                foto.save(caminho, "JPEG", quality=rng.randint(70, 95))
+                foto.close()
+            else:
+                caminho += ".png"
+                recibo.save(caminho, "PNG")
+            recibo.close()
+
+        corpus.append({"caminho": caminho, "tipo": tipo, "paginas": paginas, "esperado": esperado})
+    return corpus
@@ -0,0 +1,54 @@
+"""
+Script para revalidar comprovantes em lote (status_validacao e discrepância)
+depois de correções no valor_faturado dos reembolsos ou de mudar a tolerância
+
+Uso:
+  python scripts/revalidar_comprovantes.py                          - Revalida todos
+  python scripts/revalidar_comprovantes.py --reembolso 12 --reembolso 15
+  python scripts/revalidar_comprovantes.py --status Divergente --tolerancia 3
+  python scripts/revalidar_comprovantes.py --desde 2025-01-01 --simular
+"""
+
+import argparse
+import json
+import sys
+import os
+
+# Adiciona o diretório raiz ao path para importar os módulos
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.app import create_app
+from src.utils.revalidacao_ocr import revalidar_comprovantes, interpretar_data, TAMANHO_LOTE_PADRAO
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--reembolso", type=int, action="append", help="num_prestacao (pode repetir)")
+    parser.add_argument("--status", action="append", help="Só comprovantes com este status atual (pode repetir)")
+    parser.add_argument("--desde", type=interpretar_data, help="data_criacao a partir de (AAAA-MM-DD)")
+    parser.add_argument("--ate", type=interpretar_data, help="data_criacao antes de (AAAA-MM-DD)")
+    parser.add_argument("--tolerancia", type=float, help="Percentual aceito (padrão OCR_TOLERANCIA_PERCENTUAL)")
+    parser.add_argument("--tamanho-lote", type=int, default=TAMANHO_LOTE_PADRAO)
+    parser.add_argument("--simular", action="store_true", help="Só mostra o que mudaria")
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        resultado = revalidar_comprovantes(
+            reembolso_ids=args.reembolso,
+            status_validacao=args.status,
+            data_inicio=args.desde,
+            data_fim=args.ate,
+            tolerancia=args.tolerancia,
+            tamanho_lote=args.tamanho_lote,
+            simular=args.simular
+        )
+
+    print(f"{'🔎 Simulação' if args.simular else '✅ Revalidação concluída'}: "
+          f"{resultado['processados']} comprovantes, {resultado['alterados']} alterados "
+          f"({resultado['linhas_por_segundo']} linhas/s)")
+    print(json.dumps(resultado, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,4 @@
-from flask import Flask, redirect
+from flask import Flask, redirect, jsonify
 from src.controler.colaborador_controller import bp_colaborador
 from src.controler.reembolso_controler import bp_reembolso
 from src.controler.ocr_controller import ocr_bp
@@ -68,7 +68,7 @@ def create_app():
             ],
             "methods": ["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"],
             "allow_headers": ["Content-Type", "Authorization"],
-            "expose_headers": ["Content-Type"],
+            "expose_headers": ["Content-Type", "X-Proximo-Cursor", "Link"],
             "supports_credentials": True
         }
     })
@@ -89,7 +89,13 @@ def create_app():
     def redirect_to_docs():
         return redirect('/apidocs/')
 
-    # 6) Cria as tabelas no banco
+    # 6) Upload acima de MAX_CONTENT_LENGTH: responde 413 sem ler o corpo
+    @app.errorhandler(413)
+    def arquivo_muito_grande(erro):
+        limite = app.config.get("MAX_CONTENT_LENGTH") or 0
+        return jsonify({"erro": f"Requisição maior que o limite de {limite // (1024 * 1024)} MB"}), 413
+
+    # 7) Cria as tabelas no banco
     with app.app_context():
         db.create_all()
 
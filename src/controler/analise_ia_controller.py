@@ -1,11 +1,25 @@
-from flask import Blueprint, request, jsonify, send_file, g
+from flask import Blueprint, request, jsonify, g, current_app, url_for, Response, stream_with_context
 from src.model import db
 from src.model.reembolso_model import Reembolso
 from src.model.comprovante_model import Comprovante
 from src.model.analise_ia_model import AnaliseIA
+from src.model.tarefa_model import Tarefa
+from src.utils import armazenamento
+from src.utils.envio_arquivos import enviar_arquivo, enviar_miniatura
+from src.utils import palavras_ocr, cache_vision
+from src.utils.cache_vision import estatisticas_cache_vision
+from src.utils.validacao_ocr import validar_valores
+from src.utils.fila_analise_ia import (
+    enfileirar_analise, estado_fila, executar_em_paralelo, tarefas_pendentes as tarefas_pendentes_analise
+)
+from src.utils.roteamento_vision import (
+    analisar_com_roteamento, motivo_escalonamento, estatisticas_latencia, MODELO_VISION_RAPIDO, MODELO_VISION_COMPLETO, VISION_ROTEAMENTO
+)
 from src.utils.ia_utils import (
     calcular_hash_imagem,
     converter_para_base64,
+    preparar_imagem_vision,
+    VISION_INLINE,
     detectar_duplicatas,
     analisar_historico_colaborador,
     analisar_padroes_comportamentais,
@@ -14,9 +28,12 @@ from src.utils.ia_utils import (
 )
 import google.generativeai as genai
 import os
+import re
 import json
-from datetime import datetime
+import time
+from datetime import datetime, timedelta
 from decimal import Decimal
+from types import SimpleNamespace
 
 bp_analise_ia = Blueprint('analise_ia', __name__, url_prefix='/reembolsos')
 
@@ -24,38 +41,65 @@ bp_analise_ia = Blueprint('analise_ia', __name__, url_prefix='/reembolsos')
 GEMINI_API_KEY = os.getenv('GEMINI_API_KEY', 'SUA_API_KEY_AQUI')  # Você vai definir no .env
 genai.configure(api_key=GEMINI_API_KEY)
 
+# Versão do prompt de analisar_comprovante_gemini_vision (os modelos ficam em roteamento_vision)
+# Incremente VERSAO_PROMPT_VISION ao mudar o texto do prompt: as respostas
+# em cache do prompt antigo deixam de ser usadas
+VERSAO_PROMPT_VISION = 1
+
+# versao_modelo gravada quando a análise sai só do OCR
+MODELO_OCR = 'ocr-tesseract'
+
 
 def analisar_sem_vision_api(comprovante, reembolso):
     """
     Análise de fallback sem Vision API - usa apenas dados do OCR
+    Com as palavras do OCR gravadas (palavras_ocr), a legibilidade vem da
+    confiança do Tesseract e o valor é localizado no comprovante
     """
     valor_extraido = float(comprovante.valor_extraido) if comprovante.valor_extraido else 0.0
-    valor_declarado = float(reembolso.despesa) if reembolso.despesa else 0.0
-    
-    # Validação de valor - considera correspondente se diferença for <= 5%
-    diferenca_percentual = abs(valor_declarado - valor_extraido) / valor_declarado * 100 if valor_declarado > 0 else 100
-    valor_corresponde = diferenca_percentual <= 5 if valor_extraido > 0 else False
+
+    # Mesma regra (e OCR_TOLERANCIA_PERCENTUAL) da validação no upload e da revalidação
+    validacao = validar_valores(reembolso.despesa, comprovante.valor_extraido)
+    valor_corresponde = validacao['aprovado']
+    divergencia_percentual = float(validacao['discrepancia']) if validacao['discrepancia'] is not None else 100.0
+
+    # Campos que aparecem no texto do OCR
+    texto = comprovante.texto_extraido or ''
+    cnpj = re.search(r'\b\d{2}\.\d{3}\.\d{3}/\d{4}-\d{2}\b', texto)
+    data = re.search(r'\b(\d{2})/(\d{2})/(\d{4})\b', texto)
+    data_emissao = f"{data.group(3)}-{data.group(2)}-{data.group(1)}" if data else None
+
+    estrutura = palavras_ocr.carregar(comprovante.palavras_ocr)
+    legibilidade = palavras_ocr.resumo_legibilidade(estrutura)
+    if legibilidade and legibilidade['confianca_media'] is not None:
+        comprovante_legivel = legibilidade['legivel']
+        qualidade_imagem = round(legibilidade['confianca_media'] / 100, 2)
+    else:
+        comprovante_legivel = valor_extraido > 0
+        qualidade_imagem = 0.5 if valor_extraido > 0 else 0.0
     
     return {
         'dados_extraidos': {
             'valor_total': valor_extraido,
-            'data_emissao': None,
-            'cnpj': None,
+            'data_emissao': data_emissao,
+            'cnpj': cnpj.group(0) if cnpj else None,
             'razao_social': None,
             'itens': [],
             'forma_pagamento': None,
-            'numero_nota': None
+            'numero_nota': None,
+            'localizacao_valor': palavras_ocr.localizar_valor(estrutura, comprovante.valor_extraido)
         },
         'validacoes': {
             'valor_corresponde': valor_corresponde,
-            'divergencia_percentual': round(diferenca_percentual, 2) if valor_declarado > 0 else 100.0,
+            'divergencia_percentual': divergencia_percentual,
             'data_valida': True,
-            'data_comprovante': None,
+            'data_comprovante': data_emissao,
             'estabelecimento_valido': False,
             'tipo_despesa_correto': False,
             'tipo_detectado': None,
-            'comprovante_legivel': valor_extraido > 0,
-            'qualidade_imagem': 0.5 if valor_extraido > 0 else 0.0
+            'comprovante_legivel': comprovante_legivel,
+            'qualidade_imagem': qualidade_imagem,
+            'legibilidade_ocr': legibilidade
         },
         'sinais_fraude': {
             'editado': False,
@@ -69,7 +113,17 @@ def analisar_sem_vision_api(comprovante, reembolso):
     }
 
 
-def analisar_comprovante_gemini_vision(caminho_arquivo, reembolso):
+def campos_declarados_vision(reembolso):
+    """Dados declarados que entram no prompt (também fazem parte da chave do cache)"""
+    return {
+        'despesa': str(reembolso.despesa),
+        'data': reembolso.data.strftime('%d/%m/%Y') if reembolso.data else None,
+        'tipo_reembolso': reembolso.tipo_reembolso,
+        'descricao': reembolso.descricao
+    }
+
+
+def analisar_comprovante_gemini_vision(caminho_arquivo, reembolso, hash_arquivo=None, modelo=None):
     """
     Analisa comprovante usando Google Gemini Vision API
     FALLBACK: Se Vision API falhar, retorna análise baseada em OCR
@@ -77,10 +131,30 @@ def analisar_comprovante_gemini_vision(caminho_arquivo, reembolso):
     Args:
         caminho_arquivo: Path completo do arquivo de imagem
         reembolso: Objeto Reembolso com dados declarados
+        hash_arquivo: SHA-256 do comprovante; com ele, a resposta é buscada
+                      e gravada no cache (precisa de app context)
+        modelo: Modelo do Gemini (padrão: MODELO_VISION_COMPLETO)
         
     Returns:
-        Dict com dados extraídos e validações
+        Dict com dados extraídos e validações ('cache_vision': True se veio do cache)
     """
+    modelo = modelo or MODELO_VISION_COMPLETO
+    chave = None
+    if hash_arquivo:
+        try:
+            chave = cache_vision.chave_cache(
+                hash_arquivo, campos_declarados_vision(reembolso), modelo, VERSAO_PROMPT_VISION
+            )
+            em_cache = cache_vision.buscar_resposta(chave)
+            if em_cache is not None:
+                print(f"DEBUG - Resposta do Vision ({modelo}) reaproveitada do cache ({hash_arquivo[:12]})")
+                em_cache['cache_vision'] = True
+                return em_cache
+        except Exception as e:
+            print(f"AVISO - Cache do Vision indisponível: {type(e).__name__}: {e}")
+            db.session.rollback()
+            chave = None
+
     try:
         # Montar prompt detalhado
         prompt = f"""Analise este comprovante fiscal brasileiro com extrema atenção aos detalhes para detectar possíveis fraudes.
@@ -147,14 +221,36 @@ RESPONDA APENAS EM JSON no seguinte formato (sem markdown, sem backticks):
   "observacoes": "Lista de observações importantes encontradas"
 }}"""
         
-        # Upload do arquivo para Gemini
-        uploaded_file = genai.upload_file(caminho_arquivo)
+        # Imagem reduzida enviada junto com o prompt (uma chamada só);
+        # PDF com várias páginas ou imagem que não pôde ser preparada vai por upload
+        inicio = time.perf_counter()
+        payload = None
+        if VISION_INLINE:
+            try:
+                payload = preparar_imagem_vision(caminho_arquivo)
+            except Exception as e:
+                print(f"AVISO - Não foi possível preparar a imagem para envio direto: {type(e).__name__}: {e}")
+        envio = {'modo': 'inline' if payload else 'upload', 'bytes_original': os.path.getsize(caminho_arquivo)}
+
+        if payload:
+            conteudo = {'mime_type': payload['mime_type'], 'data': payload['dados']}
+            envio['bytes_enviados'] = payload['bytes_enviados']
+            envio['preparo_ms'] = round((time.perf_counter() - inicio) * 1000, 1)
+        else:
+            # Upload do arquivo para Gemini
+            conteudo = genai.upload_file(caminho_arquivo)
+            envio['bytes_enviados'] = envio['bytes_original']
+            envio['upload_ms'] = round((time.perf_counter() - inicio) * 1000, 1)
         
         # Criar modelo Gemini (usando modelo disponível)
-        model = genai.GenerativeModel('gemini-1.5-pro')
+        model = genai.GenerativeModel(modelo)
         
         # Gerar resposta
-        response = model.generate_content([prompt, uploaded_file])
+        inicio = time.perf_counter()
+        response = model.generate_content([prompt, conteudo])
+        envio['modelo_ms'] = round((time.perf_counter() - inicio) * 1000, 1)
+        print(f"DEBUG - Vision {modelo} ({envio['modo']}): {envio['bytes_original']} -> {envio['bytes_enviados']} bytes, "
+              f"modelo {envio['modelo_ms']} ms")
         
         # Extrair e parsear resposta
         resposta_texto = response.text.strip()
@@ -167,6 +263,11 @@ RESPONDA APENAS EM JSON no seguinte formato (sem markdown, sem backticks):
         
         dados_ia = json.loads(resposta_texto)
         
+        if chave and isinstance(dados_ia, dict) and 'erro' not in dados_ia:
+            cache_vision.gravar_resposta(chave, hash_arquivo, modelo, VERSAO_PROMPT_VISION, dados_ia)
+        
+        if isinstance(dados_ia, dict):
+            dados_ia['envio_vision'] = envio
         return dados_ia
     
     except json.JSONDecodeError as e:
@@ -192,6 +293,15 @@ RESPONDA APENAS EM JSON no seguinte formato (sem markdown, sem backticks):
         }
 
 
+def score_para_roteamento(duplicatas, padroes):
+    """Função dados_ia -> score que a análise teria, para o roteamento decidir se escalona"""
+    def calcular(dados_ia):
+        return calcular_score_confiabilidade(
+            dados_ia.get('validacoes', {}), duplicatas, padroes, dados_ia.get('sinais_fraude', {})
+        )[0]
+    return calcular
+
+
 # ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
 # ENDPOINTS
 # ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
@@ -218,29 +328,11 @@ def obter_comprovante(num_prestacao):
         if not comprovante:
             return jsonify({'erro': 'Comprovante não disponível'}), 400
         
-        # Caminho absoluto do arquivo
-        # Em produção Docker: /app/temp/arquivo.png
-        base_dir = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))  # /app
-        caminho_arquivo = os.path.join(base_dir, 'temp', comprovante.nome_arquivo)
-        
-        print(f"DEBUG - Tentando abrir arquivo: {caminho_arquivo}")
-        print(f"DEBUG - Arquivo existe: {os.path.exists(caminho_arquivo)}")
-        
-        if not os.path.exists(caminho_arquivo):
-            return jsonify({
-                'erro': 'Arquivo do comprovante não encontrado no servidor',
-                'caminho_procurado': caminho_arquivo
-            }), 404
-        
-        # Determinar tipo de arquivo
+        # ETag pelo hash, Cache-Control, Range e envio pelo proxy (se configurado)
         extensao = os.path.splitext(comprovante.nome_arquivo)[1].lower()
-        mime_type = 'application/pdf' if extensao == '.pdf' else 'image/jpeg'
-        
-        # Retornar arquivo
-        return send_file(
-            caminho_arquivo,
-            mimetype=mime_type,
-            as_attachment=False,  # Mudado para False para permitir visualização no navegador
+        return enviar_arquivo(
+            comprovante.nome_arquivo,
+            hash_arquivo=comprovante.hash_arquivo,
             download_name=f"comprovante_{num_prestacao}{extensao}"
         )
     
@@ -251,169 +343,347 @@ def obter_comprovante(num_prestacao):
         return jsonify({'erro': str(e)}), 500
 
 
-@bp_analise_ia.route('/<string:num_prestacao>/analisar-ia', methods=['POST', 'OPTIONS'])
-def analisar_reembolso_ia(num_prestacao):
+@bp_analise_ia.route('/<string:num_prestacao>/comprovante/miniatura', methods=['GET', 'OPTIONS'])
+def obter_miniatura_comprovante(num_prestacao):
     """
-    POST /reembolsos/{num_prestacao}/analisar-ia
-    Executa análise completa com IA do reembolso e comprovante
+    GET /reembolsos/{num_prestacao}/comprovante/miniatura?tamanho=p|m|g
+    Miniatura WebP do comprovante (1ª página para PDFs), para listagens
     """
     if request.method == 'OPTIONS':
         return '', 200
     
+    comprovante = Comprovante.query.filter_by(reembolso_id=num_prestacao).first()
+    if not comprovante:
+        return jsonify({'erro': 'Comprovante não disponível'}), 400
+    
+    # URL por reembolso: o comprovante pode ser trocado, então revalida pelo ETag
+    return enviar_miniatura(comprovante.nome_arquivo, comprovante.hash_arquivo, request.args.get('tamanho', 'm'))
+
+
+def _executar_analise_ia(num_prestacao, tempos):
+    """
+    Análise completa do reembolso: duplicatas, histórico, padrões, Vision
+    (roteado entre os modelos, com fallback para OCR) e score; grava a AnaliseIA
+    Usada na requisição (modo sincrono) e pela fila em segundo plano
+
+    Args:
+        tempos: Dict preenchido com os ms de cada etapa
+
+    Returns:
+        Tuple (corpo da resposta, status HTTP, AnaliseIA gravada ou None)
+    """
+    inicio = marca = time.perf_counter()
+
+    def etapa(nome):
+        nonlocal marca
+        agora = time.perf_counter()
+        tempos[nome] = round((agora - marca) * 1000, 1)
+        marca = agora
+
+    print(f"DEBUG - Iniciando análise IA do reembolso {num_prestacao}")
+    
+    # 1. BUSCAR DADOS
+    reembolso = Reembolso.query.filter_by(num_prestacao=num_prestacao).first()
+    
+    if not reembolso:
+        print(f"DEBUG - Reembolso {num_prestacao} não encontrado")
+        return {'erro': 'Reembolso não encontrado'}, 404, None
+    
+    print(f"DEBUG - Reembolso encontrado: {reembolso.num_prestacao}")
+    
+    comprovante = Comprovante.query.filter_by(reembolso_id=reembolso.num_prestacao).first()
+    
+    if not comprovante:
+        print(f"DEBUG - Comprovante não encontrado para reembolso {reembolso.num_prestacao}")
+        return {
+            'erro': 'Comprovante não disponível para análise',
+            'mensagem': 'Você precisa fazer o upload do comprovante primeiro na tela de criação/edição do reembolso.'
+        }, 404, None
+    
+    print(f"DEBUG - Comprovante encontrado: {comprovante.nome_arquivo}")
+    
+    # Caminho do arquivo em disco (no backend S3, cópia local baixada sob demanda)
+    caminho_arquivo = armazenamento.caminho_local(comprovante.nome_arquivo)
+    
+    print(f"DEBUG - Caminho do arquivo: {caminho_arquivo}")
+    
+    if not os.path.exists(caminho_arquivo):
+        print(f"DEBUG - Arquivo não encontrado em: {caminho_arquivo}")
+        return {
+            'erro': 'Arquivo do comprovante não encontrado no servidor',
+            'mensagem': 'O arquivo foi removido ou perdido. Por favor, faça o upload do comprovante novamente.',
+            'arquivo_esperado': comprovante.nome_arquivo,
+            'caminho_procurado': caminho_arquivo
+        }, 404, None
+    
+    print(f"DEBUG - Arquivo encontrado: {caminho_arquivo}")
+    etapa('preparacao')
+    
+    # 2. DETECÇÃO DE DUPLICATAS
+    # Duplicatas, histórico e padrões vêm antes do Vision: o roteamento
+    # precisa do score para decidir se escalona para o modelo completo
+    if not comprovante.hash_arquivo:
+        # Calcular hash agora se não existir
+        hash_novo = calcular_hash_imagem(caminho_arquivo)
+        if hash_novo:
+            comprovante.hash_arquivo = hash_novo
+            db.session.commit()
+    duplicatas = detectar_duplicatas(comprovante.hash_arquivo, num_prestacao) if comprovante.hash_arquivo else []
+    
+    print(f"DEBUG - Duplicatas encontradas: {len(duplicatas)}")
+    etapa('duplicatas')
+    
+    # 3. ANÁLISE DE HISTÓRICO DO COLABORADOR
+    historico = analisar_historico_colaborador(reembolso.id_colaborador)
+    print(f"DEBUG - Histórico do colaborador analisado")
+    etapa('historico')
+    
+    # 4. ANÁLISE DE PADRÕES COMPORTAMENTAIS
+    reembolsos_anteriores = Reembolso.query.filter_by(
+        id_colaborador=reembolso.id_colaborador
+    ).filter(
+        Reembolso.num_prestacao != num_prestacao
+    ).all()
+    
+    padroes = analisar_padroes_comportamentais(reembolso, reembolsos_anteriores)
+    print(f"DEBUG - Padrões comportamentais analisados")
+    etapa('padroes')
+    
+    # 5. ANÁLISE COM GEMINI VISION API (modelo rápido, completo se necessário; fallback para OCR)
     try:
-        print(f"DEBUG - Iniciando análise IA do reembolso {num_prestacao}")
-        
-        # 1. BUSCAR DADOS
-        reembolso = Reembolso.query.filter_by(num_prestacao=num_prestacao).first()
-        
-        if not reembolso:
-            print(f"DEBUG - Reembolso {num_prestacao} não encontrado")
-            return jsonify({'erro': 'Reembolso não encontrado'}), 404
-        
-        print(f"DEBUG - Reembolso encontrado: {reembolso.num_prestacao}")
-        
-        comprovante = Comprovante.query.filter_by(reembolso_id=reembolso.num_prestacao).first()
-        
-        if not comprovante:
-            print(f"DEBUG - Comprovante não encontrado para reembolso {reembolso.num_prestacao}")
-            return jsonify({
-                'erro': 'Comprovante não disponível para análise',
-                'mensagem': 'Você precisa fazer o upload do comprovante primeiro na tela de criação/edição do reembolso.'
-            }), 404
-        
-        print(f"DEBUG - Comprovante encontrado: {comprovante.nome_arquivo}")
-        
-        # Caminho absoluto do arquivo
-        base_dir = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))  # /app
-        caminho_arquivo = os.path.join(base_dir, 'temp', comprovante.nome_arquivo)
-        
-        print(f"DEBUG - Caminho do arquivo: {caminho_arquivo}")
-        
-        if not os.path.exists(caminho_arquivo):
-            print(f"DEBUG - Arquivo não encontrado em: {caminho_arquivo}")
-            return jsonify({
-                'erro': 'Arquivo do comprovante não encontrado no servidor',
-                'mensagem': 'O arquivo foi removido ou perdido. Por favor, faça o upload do comprovante novamente.',
-                'arquivo_esperado': comprovante.nome_arquivo,
-                'caminho_procurado': caminho_arquivo
-            }), 404
-        
-        print(f"DEBUG - Arquivo encontrado: {caminho_arquivo}")
+        dados_ia, roteamento = analisar_com_roteamento(
+            lambda modelo: analisar_comprovante_gemini_vision(
+                caminho_arquivo, reembolso, comprovante.hash_arquivo, modelo=modelo
+            ),
+            score_para_roteamento(duplicatas, padroes)
+        )
         
-        # 2. ANÁLISE COM GEMINI VISION API (com fallback para OCR)
+        # Se Vision API falhou, usar fallback
+        if 'erro' in dados_ia:
+            print(f"AVISO - Vision API indisponível, usando análise baseada em OCR")
+            dados_ia = analisar_sem_vision_api(comprovante, reembolso)
+            roteamento['modelo'] = MODELO_OCR
+    except Exception as e:
+        print(f"ERRO - Falha na análise Vision, usando fallback OCR: {e}")
+        dados_ia = analisar_sem_vision_api(comprovante, reembolso)
+        roteamento = {'rota': None, 'modelo': MODELO_OCR, 'motivo_escalonamento': None, 'latencia_ms': None}
+    etapa('vision')
+    
+    if 'erro' in dados_ia and 'decommissioned' not in str(dados_ia.get('erro', '')).lower():
+        # Análise falhou por outro motivo
+        print(f"AVISO - Análise IA falhou: {dados_ia['erro']}")
+        return {
+            'num_prestacao': num_prestacao,
+            'score_confiabilidade': 50,
+            'nivel_risco': 'medio',
+            'aprovacao_sugerida': False,
+            'motivo_sugestao': f"Análise IA falhou: {dados_ia['erro']}. Revisão manual necessária.",
+            'erro_ia': dados_ia['erro'],
+            'alertas': [{
+                'tipo': 'erro_analise',
+                'gravidade': 'alta',
+                'mensagem': 'Não foi possível completar análise automática',
+                'confianca': 1.0
+            }]
+        }, 500, None
+    
+    print(f"DEBUG - Dados IA extraídos com sucesso ({roteamento['modelo']})")
+    
+    # 6. CALCULAR SCORE FINAL
+    validacoes = dados_ia.get('validacoes', {})
+    sinais_fraude = dados_ia.get('sinais_fraude', {})
+    
+    score, nivel_risco, alertas = calcular_score_confiabilidade(
+        validacoes,
+        duplicatas,
+        padroes,
+        sinais_fraude
+    )
+    
+    print(f"DEBUG - Score calculado: {score}")
+    
+    # 7. GERAR RECOMENDAÇÃO
+    aprovacao_sugerida, motivo_sugestao = gerar_recomendacao(score, nivel_risco, alertas)
+    etapa('score')
+    
+    # 8. SALVAR ANÁLISE NO BANCO
+    analise = AnaliseIA(
+        num_prestacao=num_prestacao,
+        score_confiabilidade=score,
+        nivel_risco=nivel_risco,
+        aprovacao_sugerida=aprovacao_sugerida,
+        motivo_sugestao=motivo_sugestao,
+        dados_ia=dados_ia.get('dados_extraidos', {}),
+        alertas=alertas,
+        validacoes=validacoes,
+        historico_colaborador=historico,
+        versao_modelo=roteamento['modelo']
+    )
+    
+    db.session.add(analise)
+    db.session.commit()
+    
+    print(f"DEBUG - Análise salva no banco com ID {analise.id}")
+    etapa('gravacao')
+    tempos['total'] = round((time.perf_counter() - inicio) * 1000, 1)
+    
+    # 9. MONTAR RESPOSTA COMPLETA
+    response = {
+        'num_prestacao': num_prestacao,
+        'score_confiabilidade': score,
+        'nivel_risco': nivel_risco,
+        'aprovacao_sugerida': aprovacao_sugerida,
+        'motivo_sugestao': motivo_sugestao,
+        'alertas': alertas,
+        'validacoes': validacoes,
+        'dados_extraidos_ocr': dados_ia.get('dados_extraidos', {}),
+        'historico_colaborador': historico,
+        'analise_padrao': padroes,
+        'comprovantes_similares': [{'num_prestacao': d['reembolso_id'], 'nome_arquivo': d['nome_arquivo']} for d in duplicatas],
+        'recomendacao_ia': motivo_sugestao,
+        'timestamp_analise': datetime.now().isoformat(),
+        'versao_modelo': roteamento['modelo'],
+        'roteamento_vision': roteamento,
+        'cache_vision': dados_ia.get('cache_vision', False),
+        'envio_vision': dados_ia.get('envio_vision'),
+        'tempos_etapas': tempos
+    }
+    
+    return response, 200, analise
+
+
+def _enfileirar_analise_ia(num_prestacao):
+    """
+    Registra a tarefa e agenda a análise no pool de threads
+    Responde 202 com o id da tarefa; um segundo clique enquanto a análise
+    do mesmo reembolso está em andamento devolve a tarefa existente
+    """
+    reembolso = Reembolso.query.filter_by(num_prestacao=num_prestacao).first()
+    if not reembolso:
+        return jsonify({'erro': 'Reembolso não encontrado'}), 404
+
+    if not Comprovante.query.filter_by(reembolso_id=reembolso.num_prestacao).first():
+        return jsonify({
+            'erro': 'Comprovante não disponível para análise',
+            'mensagem': 'Você precisa fazer o upload do comprovante primeiro na tela de criação/edição do reembolso.'
+        }), 404
+
+    app = current_app._get_current_object()
+
+    # Tarefas mais antigas que a expiração (ex: worker reiniciado no meio) não bloqueiam uma nova
+    limite = datetime.utcnow() - timedelta(seconds=app.config.get('ANALISE_IA_TAREFA_EXPIRACAO', 600))
+    tarefa = Tarefa.query.filter(
+        Tarefa.tipo == 'analise_ia',
+        Tarefa.reembolso_id == reembolso.num_prestacao,
+        Tarefa.status.in_(['Na fila', 'Processando']),
+        Tarefa.data_criacao >= limite
+    ).order_by(Tarefa.data_criacao.desc()).first()
+
+    if tarefa:
+        mensagem = 'Análise deste reembolso já está em andamento.'
+    else:
+        tarefa = Tarefa(reembolso_id=reembolso.num_prestacao, tipo='analise_ia')
+        db.session.add(tarefa)
+        db.session.commit()
+
         try:
-            dados_ia = analisar_comprovante_gemini_vision(caminho_arquivo, reembolso)
-            
-            # Se Vision API falhou, usar fallback
-            if 'erro' in dados_ia:
-                print(f"AVISO - Vision API indisponível, usando análise baseada em OCR")
-                dados_ia = analisar_sem_vision_api(comprovante, reembolso)
+            aceita = enfileirar_analise(
+                _processar_tarefa_analise_ia, app, tarefa.id, num_prestacao,
+                max_workers=app.config.get('ANALISE_IA_MAX_WORKERS', 4),
+                fila_maxima=app.config.get('ANALISE_IA_FILA_MAXIMA', 20)
+            )
         except Exception as e:
-            print(f"ERRO - Falha na análise Vision, usando fallback OCR: {e}")
-            dados_ia = analisar_sem_vision_api(comprovante, reembolso)
-        
-        if 'erro' in dados_ia and 'decommissioned' not in str(dados_ia.get('erro', '')).lower():
-            # Análise falhou por outro motivo
-            print(f"AVISO - Análise IA falhou: {dados_ia['erro']}")
-            return jsonify({
-                'num_prestacao': num_prestacao,
-                'score_confiabilidade': 50,
-                'nivel_risco': 'medio',
-                'aprovacao_sugerida': False,
-                'motivo_sugestao': f"Análise IA falhou: {dados_ia['erro']}. Revisão manual necessária.",
-                'erro_ia': dados_ia['erro'],
-                'alertas': [{
-                    'tipo': 'erro_analise',
-                    'gravidade': 'alta',
-                    'mensagem': 'Não foi possível completar análise automática',
-                    'confianca': 1.0
-                }]
-            }), 500
-        
-        print(f"DEBUG - Dados IA extraídos com sucesso")
-        
-        # 3. DETECÇÃO DE DUPLICATAS
-        if comprovante.hash_arquivo:
-            duplicatas = detectar_duplicatas(comprovante.hash_arquivo, num_prestacao)
-        else:
-            # Calcular hash agora se não existir
-            hash_novo = calcular_hash_imagem(caminho_arquivo)
-            if hash_novo:
-                comprovante.hash_arquivo = hash_novo
-                db.session.commit()
-                duplicatas = detectar_duplicatas(hash_novo, num_prestacao)
-            else:
-                duplicatas = []
-        
-        print(f"DEBUG - Duplicatas encontradas: {len(duplicatas)}")
-        
-        # 4. ANÁLISE DE HISTÓRICO DO COLABORADOR
-        historico = analisar_historico_colaborador(reembolso.id_colaborador)
-        print(f"DEBUG - Histórico do colaborador analisado")
-        
-        # 5. ANÁLISE DE PADRÕES COMPORTAMENTAIS
-        reembolsos_anteriores = Reembolso.query.filter_by(
-            id_colaborador=reembolso.id_colaborador
-        ).filter(
-            Reembolso.num_prestacao != num_prestacao
-        ).all()
-        
-        padroes = analisar_padroes_comportamentais(reembolso, reembolsos_anteriores)
-        print(f"DEBUG - Padrões comportamentais analisados")
-        
-        # 6. CALCULAR SCORE FINAL
-        validacoes = dados_ia.get('validacoes', {})
-        sinais_fraude = dados_ia.get('sinais_fraude', {})
-        
-        score, nivel_risco, alertas = calcular_score_confiabilidade(
-            validacoes,
-            duplicatas,
-            padroes,
-            sinais_fraude
-        )
-        
-        print(f"DEBUG - Score calculado: {score}")
-        
-        # 7. GERAR RECOMENDAÇÃO
-        aprovacao_sugerida, motivo_sugestao = gerar_recomendacao(score, nivel_risco, alertas)
-        
-        # 8. SALVAR ANÁLISE NO BANCO
-        analise = AnaliseIA(
-            num_prestacao=num_prestacao,
-            score_confiabilidade=score,
-            nivel_risco=nivel_risco,
-            aprovacao_sugerida=aprovacao_sugerida,
-            motivo_sugestao=motivo_sugestao,
-            dados_ia=dados_ia.get('dados_extraidos', {}),
-            alertas=alertas,
-            validacoes=validacoes,
-            historico_colaborador=historico
-        )
-        
-        db.session.add(analise)
+            print(f"ERROR ANALISE IA - Falha ao enfileirar tarefa {tarefa.id}: {type(e).__name__}: {e}")
+            aceita = False
+
+        if not aceita:
+            db.session.delete(tarefa)
+            db.session.commit()
+            return jsonify({'erro': 'Fila de análises cheia. Tente novamente em instantes.'}), 503
+
+        mensagem = 'Análise com IA em processamento.'
+        print(f"DEBUG ANALISE IA - Tarefa {tarefa.id} enfileirada ({tarefas_pendentes_analise()} pendentes)")
+
+    return jsonify({
+        'mensagem': mensagem,
+        'tarefa': tarefa.to_dict(),
+        'status_url': url_for('analise_ia.status_tarefa_analise_ia', tarefa_id=tarefa.id)
+    }), 202
+
+
+def _processar_tarefa_analise_ia(app, tarefa_id, num_prestacao):
+    """
+    Roda numa thread do pool: executa a análise e fecha a tarefa
+    com a resposta completa e os tempos de cada etapa
+    """
+    with app.app_context():
+        tarefa = db.session.get(Tarefa, tarefa_id)
+        if not tarefa:
+            return
+
+        tarefa.status = 'Processando'
+        tarefa.data_inicio = datetime.utcnow()
         db.session.commit()
-        
-        print(f"DEBUG - Análise salva no banco com ID {analise.id}")
-        
-        # 9. MONTAR RESPOSTA COMPLETA
-        response = {
-            'num_prestacao': num_prestacao,
-            'score_confiabilidade': score,
-            'nivel_risco': nivel_risco,
-            'aprovacao_sugerida': aprovacao_sugerida,
-            'motivo_sugestao': motivo_sugestao,
-            'alertas': alertas,
-            'validacoes': validacoes,
-            'dados_extraidos_ocr': dados_ia.get('dados_extraidos', {}),
-            'historico_colaborador': historico,
-            'analise_padrao': padroes,
-            'comprovantes_similares': [{'num_prestacao': d['reembolso_id'], 'nome_arquivo': d['nome_arquivo']} for d in duplicatas],
-            'recomendacao_ia': motivo_sugestao,
-            'timestamp_analise': datetime.now().isoformat(),
-            'versao_modelo': 'gemini-1.5-pro'
-        }
-        
-        return jsonify(response), 200
+
+        tempos = {'fila': round((tarefa.data_inicio - tarefa.data_criacao).total_seconds() * 1000, 1)}
+
+        try:
+            corpo, status_http, analise = _executar_analise_ia(num_prestacao, tempos)
+
+            tarefa = db.session.get(Tarefa, tarefa_id)
+            tarefa.status = 'Concluída' if status_http < 400 else 'Erro'
+            tarefa.erro = (corpo.get('erro_ia') or corpo.get('erro')) if status_http >= 400 else None
+            tarefa.analise_id = analise.id if analise else None
+            tarefa.resultado = json.dumps(corpo, default=_serializar_valor)
+
+        except Exception as e:
+            print(f"ERROR ANALISE IA - Tarefa {tarefa_id} falhou: {type(e).__name__}: {e}")
+            db.session.rollback()
+
+            tarefa = db.session.get(Tarefa, tarefa_id)
+            if not tarefa:
+                return
+            tarefa.status = 'Erro'
+            tarefa.erro = str(e) or type(e).__name__
+
+        tarefa.tempos_etapas = json.dumps(tempos)
+        tarefa.data_conclusao = datetime.utcnow()
+        db.session.commit()
+
+        print(f"DEBUG ANALISE IA - Tarefa {tarefa_id} {tarefa.status} em {tempos.get('total', '?')} ms "
+              f"(fila {tempos['fila']} ms)")
+
+
+def _serializar_valor(valor):
+    """Decimal/datetime no JSON da tarefa (como o jsonify faz na resposta síncrona)"""
+    if isinstance(valor, Decimal):
+        return float(valor)
+    if isinstance(valor, datetime):
+        return valor.isoformat()
+    return str(valor)
+
+
+@bp_analise_ia.route('/<string:num_prestacao>/analisar-ia', methods=['POST', 'OPTIONS'])
+def analisar_reembolso_ia(num_prestacao):
+    """
+    POST /reembolsos/{num_prestacao}/analisar-ia?modo=assincrono
+    Executa análise completa com IA do reembolso e comprovante
+
+    modo=sincrono (padrão em ANALISE_IA_MODO_PADRAO) responde com a análise;
+    modo=assincrono responde 202 com o id da tarefa e a análise roda na fila
+    """
+    if request.method == 'OPTIONS':
+        return '', 200
+    
+    dados = request.get_json(silent=True) or {}
+    modo = request.args.get('modo') or dados.get('modo') or current_app.config.get('ANALISE_IA_MODO_PADRAO', 'sincrono')
+
+    try:
+        if modo == 'assincrono':
+            return _enfileirar_analise_ia(num_prestacao)
+
+        corpo, status_http, _ = _executar_analise_ia(num_prestacao, {})
+        return jsonify(corpo), status_http
     
     except Exception as e:
         print(f"Erro na análise IA: {e}")
@@ -424,6 +694,64 @@ def analisar_reembolso_ia(num_prestacao):
         return jsonify({'erro': str(e)}), 500
 
 
+@bp_analise_ia.route('/analises-ia/cache', methods=['GET', 'OPTIONS'])
+def estatisticas_cache_analise_ia():
+    """
+    GET /reembolsos/analises-ia/cache
+    Acertos/falhas do cache de respostas do Vision (contadores por processo)
+    e entradas/bytes gravados no banco
+    """
+    if request.method == 'OPTIONS':
+        return '', 200
+
+    estatisticas = estatisticas_cache_vision()
+    estatisticas['pid'] = os.getpid()
+    estatisticas['modelos'] = {'rapido': MODELO_VISION_RAPIDO, 'completo': MODELO_VISION_COMPLETO}
+    estatisticas['versao_prompt'] = VERSAO_PROMPT_VISION
+    return jsonify(estatisticas), 200
+
+
+@bp_analise_ia.route('/analises-ia/latencias', methods=['GET', 'OPTIONS'])
+def latencias_analise_ia():
+    """
+    GET /reembolsos/analises-ia/latencias
+    p50/p95 do Vision por rota (rapido, escalonado, completo, cache) nas
+    análises recentes deste processo, e a parcela de cada rota
+    """
+    if request.method == 'OPTIONS':
+        return '', 200
+
+    return jsonify({
+        'pid': os.getpid(),
+        'roteamento': VISION_ROTEAMENTO,
+        'modelos': {'rapido': MODELO_VISION_RAPIDO, 'completo': MODELO_VISION_COMPLETO},
+        'rotas': estatisticas_latencia()
+    }), 200
+
+
+@bp_analise_ia.route('/analises-ia/tarefas/<string:tarefa_id>', methods=['GET', 'OPTIONS'])
+def status_tarefa_analise_ia(tarefa_id):
+    """
+    GET /reembolsos/analises-ia/tarefas/{tarefa_id}
+    Status da análise em segundo plano: tempos por etapa (ms), profundidade
+    da fila e, ao concluir, a mesma resposta do modo síncrono em "resultado"
+    """
+    if request.method == 'OPTIONS':
+        return '', 200
+
+    tarefa = db.session.get(Tarefa, tarefa_id)
+    if not tarefa or tarefa.tipo != 'analise_ia':
+        return jsonify({'erro': 'Tarefa não encontrada'}), 404
+
+    resposta = tarefa.to_dict()
+    resposta['resultado'] = json.loads(tarefa.resultado) if tarefa.resultado else None
+    resposta['fila'] = estado_fila()
+    resposta['fila']['max_workers'] = current_app.config.get('ANALISE_IA_MAX_WORKERS', 4)
+    # Aguardando em todos os workers da API (o estado acima é só deste processo)
+    resposta['fila']['na_fila_total'] = Tarefa.query.filter_by(tipo='analise_ia', status='Na fila').count()
+    return jsonify(resposta), 200
+
+
 # Implementação continua no próximo arquivo...
 
 
@@ -565,17 +893,291 @@ def aprovar_com_ia(num_prestacao):
         return jsonify({'erro': str(e)}), 500
 
 
+def _vision_item_lote(item):
+    """
+    Roda numa thread do lote: só arquivo e Gemini, sem tocar na sessão do banco
+    (o reembolso chega como cópia dos campos usados no prompt e as respostas
+    em cache já vêm buscadas em item['em_cache'])
+    """
+    inicio = time.perf_counter()
+    caminho_arquivo = None
+    novas = {}
+
+    def analisar(modelo):
+        nonlocal caminho_arquivo
+        if modelo in item['em_cache']:
+            return item['em_cache'][modelo]
+        if caminho_arquivo is None:
+            caminho_arquivo = armazenamento.caminho_local(item['nome_arquivo'])
+            if not os.path.exists(caminho_arquivo):
+                raise FileNotFoundError('Arquivo não encontrado')
+        dados_ia = analisar_comprovante_gemini_vision(caminho_arquivo, item['declarado'], modelo=modelo)
+        if isinstance(dados_ia, dict) and 'erro' not in dados_ia:
+            novas[modelo] = {k: v for k, v in dados_ia.items() if k != 'envio_vision'}
+        return dados_ia
+
+    dados_ia, roteamento = analisar_com_roteamento(
+        analisar, score_para_roteamento(item['duplicatas'] or [], item['padroes'])
+    )
+    return {
+        'dados_ia': dados_ia,
+        'roteamento': roteamento,
+        'respostas_novas': novas,
+        'caminho_arquivo': caminho_arquivo,
+        'vision_ms': round((time.perf_counter() - inicio) * 1000, 1)
+    }
+
+
+def _concluir_item_lote(item, resultado):
+    """Score e recomendação na thread da requisição; devolve a AnaliseIA (ainda fora da sessão)"""
+    num = item['num_prestacao']
+    dados_ia = resultado['dados_ia']
+
+    duplicatas = item['duplicatas']
+    if duplicatas is None:
+        # Comprovante sem hash gravado: calculado com o arquivo baixado pela thread
+        hash_arquivo = calcular_hash_imagem(resultado['caminho_arquivo']) if resultado['caminho_arquivo'] else None
+        duplicatas = detectar_duplicatas(hash_arquivo, num) if hash_arquivo else []
+
+    score, nivel_risco, alertas = calcular_score_confiabilidade(
+        dados_ia.get('validacoes', {}),
+        duplicatas,
+        item['padroes'],
+        dados_ia.get('sinais_fraude', {})
+    )
+
+    aprovacao_sugerida, motivo = gerar_recomendacao(score, nivel_risco, alertas)
+
+    return AnaliseIA(
+        num_prestacao=num,
+        score_confiabilidade=score,
+        nivel_risco=nivel_risco,
+        aprovacao_sugerida=aprovacao_sugerida,
+        motivo_sugestao=motivo,
+        dados_ia=dados_ia.get('dados_extraidos', {}),
+        alertas=alertas,
+        validacoes=dados_ia.get('validacoes', {}),
+        historico_colaborador=item['historico'],
+        versao_modelo=resultado['roteamento']['modelo']
+    )
+
+
+def _chave_cache_lote(item, modelo):
+    return cache_vision.chave_cache(
+        item['hash_arquivo'], campos_declarados_vision(item['declarado']), modelo, VERSAO_PROMPT_VISION
+    )
+
+
+def _buscar_cache_lote(item, modelo):
+    """Resposta em cache do modelo para o item, buscada na thread da requisição"""
+    if not item['hash_arquivo']:
+        return None
+    try:
+        em_cache = cache_vision.buscar_resposta(_chave_cache_lote(item, modelo))
+    except Exception as e:
+        print(f"AVISO - Cache do Vision indisponível: {type(e).__name__}: {e}")
+        db.session.rollback()
+        return None
+
+    if em_cache is not None:
+        em_cache['cache_vision'] = True
+        item['em_cache'][modelo] = em_cache
+    return em_cache
+
+
+def _eventos_lote(nums_prestacao, concorrencia, commit_a_cada):
+    """
+    Processa o lote e gera um evento por reembolso, na ordem em que terminam:
+    {'tipo': 'resultado', ...} ou {'tipo': 'erro', ...}, e por fim {'tipo': 'resumo', ...}
+
+    As chamadas ao Gemini rodam em paralelo; o restante usa a sessão do banco
+    e fica nesta thread. As análises são gravadas com commit a cada
+    `commit_a_cada` sucessos: uma falha no fim não desfaz o que já foi gravado.
+    Se um commit falhar, os itens do bloco voltam como erro (gravado: False).
+    Uma falha inesperada encerra o lote com um erro (interrompido: True) e o resumo
+    """
+    inicio = time.perf_counter()
+    contagem = {'sucesso': 0, 'erro': 0, 'aprovacao_automatica': 0, 'revisao_manual': 0}
+    itens = []
+
+    nao_gravados = []
+    cache_pendente = []
+
+    def gravar_cache():
+        # Depois do commit/rollback do bloco: gravar_resposta faz o próprio commit
+        for item, modelo, dados_ia in cache_pendente:
+            cache_vision.gravar_resposta(_chave_cache_lote(item, modelo), item['hash_arquivo'], modelo, VERSAO_PROMPT_VISION, dados_ia)
+        cache_pendente.clear()
+
+    def descartar_bloco(motivo):
+        # Rollback leva junto as análises do bloco que ainda não tiveram commit
+        db.session.rollback()
+        for evento in nao_gravados:
+            contagem['sucesso'] -= 1
+            contagem['aprovacao_automatica' if evento['aprovacao_sugerida'] else 'revisao_manual'] -= 1
+            contagem['erro'] += 1
+            yield {'tipo': 'erro', 'num_prestacao': evento['num_prestacao'], 'erro': motivo, 'gravado': False}
+        nao_gravados.clear()
+        gravar_cache()
+
+    def gravar_bloco():
+        try:
+            db.session.commit()
+            nao_gravados.clear()
+            gravar_cache()
+        except Exception as e:
+            print(f"ERRO - Falha ao gravar bloco do lote: {e}")
+            yield from descartar_bloco(f'Falha ao gravar análise: {e}')
+
+    interrompido = False
+    try:
+        for num in nums_prestacao:
+            reembolso = Reembolso.query.filter_by(num_prestacao=num).first()
+            if not reembolso:
+                contagem['erro'] += 1
+                yield {'tipo': 'erro', 'num_prestacao': num, 'erro': 'Reembolso não encontrado'}
+                continue
+
+            comprovante = Comprovante.query.filter_by(reembolso_id=reembolso.num_prestacao).first()
+            if not comprovante:
+                contagem['erro'] += 1
+                yield {'tipo': 'erro', 'num_prestacao': num, 'erro': 'Comprovante não disponível'}
+                continue
+
+            # Histórico, padrões e duplicatas usam a sessão do banco: calculados aqui;
+            # as threads recebem só os dados (o roteamento precisa deles para o score)
+            reembolsos_anteriores = Reembolso.query.filter_by(
+                id_colaborador=reembolso.id_colaborador
+            ).filter(Reembolso.num_prestacao != num).all()
+
+            item = {
+                'num_prestacao': reembolso.num_prestacao,
+                'nome_arquivo': comprovante.nome_arquivo,
+                'hash_arquivo': comprovante.hash_arquivo,
+                # Campos do prompt copiados: objetos do ORM não vão para outras threads
+                'declarado': SimpleNamespace(
+                    despesa=reembolso.despesa,
+                    data=reembolso.data,
+                    tipo_reembolso=reembolso.tipo_reembolso,
+                    descricao=reembolso.descricao
+                ),
+                'historico': analisar_historico_colaborador(reembolso.id_colaborador),
+                'padroes': analisar_padroes_comportamentais(reembolso, reembolsos_anteriores),
+                'duplicatas': detectar_duplicatas(comprovante.hash_arquivo, num) if comprovante.hash_arquivo else None,
+                'em_cache': {}
+            }
+
+            # O cache também usa a sessão: consultado aqui, antes de distribuir as chamadas.
+            # O modelo completo só é buscado se a resposta rápida em cache pedir escalonamento
+            if VISION_ROTEAMENTO:
+                rapido = _buscar_cache_lote(item, MODELO_VISION_RAPIDO)
+                if rapido is not None and motivo_escalonamento(rapido, score_para_roteamento(item['duplicatas'] or [], item['padroes'])):
+                    _buscar_cache_lote(item, MODELO_VISION_COMPLETO)
+            else:
+                _buscar_cache_lote(item, MODELO_VISION_COMPLETO)
+            itens.append(item)
+
+        for item, resultado, excecao in executar_em_paralelo(_vision_item_lote, itens, concorrencia):
+            num = item['num_prestacao']
+            try:
+                if excecao is not None:
+                    raise excecao
+
+                if 'erro' in resultado['dados_ia']:
+                    raise ValueError(resultado['dados_ia']['erro'])
+
+                if item['hash_arquivo']:
+                    cache_pendente.extend((item, modelo, dados_ia) for modelo, dados_ia in resultado['respostas_novas'].items())
+
+                analise = _concluir_item_lote(item, resultado)
+            except Exception as e:
+                contagem['erro'] += 1
+                yield {'tipo': 'erro', 'num_prestacao': num, 'erro': str(e) or type(e).__name__}
+                continue
+
+            try:
+                # flush para ter o id; o commit é por bloco
+                db.session.add(analise)
+                db.session.flush()
+            except Exception as e:
+                print(f"ERRO - Falha ao gravar análise do reembolso {num}: {e}")
+                yield from descartar_bloco(f'Falha ao gravar análise: {e}')
+                contagem['erro'] += 1
+                yield {'tipo': 'erro', 'num_prestacao': num, 'erro': f'Falha ao gravar análise: {e}', 'gravado': False}
+                continue
+
+            evento = {
+                'tipo': 'resultado',
+                'num_prestacao': num,
+                'analise_id': analise.id,
+                'score': analise.score_confiabilidade,
+                'nivel_risco': analise.nivel_risco,
+                'aprovacao_sugerida': analise.aprovacao_sugerida,
+                'vision_ms': resultado['vision_ms'],
+                'versao_modelo': analise.versao_modelo,
+                'rota_vision': resultado['roteamento']['rota'],
+                'cache_vision': resultado['dados_ia'].get('cache_vision', False)
+            }
+            contagem['sucesso'] += 1
+            contagem['aprovacao_automatica' if analise.aprovacao_sugerida else 'revisao_manual'] += 1
+            nao_gravados.append(evento)
+            yield evento
+
+            if len(nao_gravados) >= commit_a_cada:
+                yield from gravar_bloco()
+
+        if nao_gravados:
+            yield from gravar_bloco()
+        gravar_cache()
+    except Exception as e:
+        # Falha fora do tratamento por item (banco, pool de threads...): desfaz o bloco
+        # sem commit, avisa quem está lendo o stream e ainda envia o resumo
+        print(f"ERRO - Lote interrompido: {type(e).__name__}: {e}")
+        interrompido = True
+        db.session.rollback()
+        cache_pendente.clear()
+        for evento in nao_gravados:
+            contagem['sucesso'] -= 1
+            contagem['aprovacao_automatica' if evento['aprovacao_sugerida'] else 'revisao_manual'] -= 1
+            contagem['erro'] += 1
+            yield {'tipo': 'erro', 'num_prestacao': evento['num_prestacao'], 'erro': 'Lote interrompido antes da gravação', 'gravado': False}
+        nao_gravados.clear()
+        yield {'tipo': 'erro', 'num_prestacao': None, 'erro': f'Lote interrompido: {e}', 'interrompido': True}
+    finally:
+        # Cliente desconectou no meio do stream: nada do bloco sem commit fica na sessão
+        if nao_gravados:
+            db.session.rollback()
+
+    yield {
+        'tipo': 'resumo',
+        'total_solicitados': len(nums_prestacao),
+        'analisados_com_sucesso': contagem['sucesso'],
+        'total_erros': contagem['erro'],
+        'tempo_processamento_segundos': round(time.perf_counter() - inicio, 2),
+        'interrompido': interrompido,
+        'resumo': {
+            'aprovacao_automatica_sugerida': contagem['aprovacao_automatica'],
+            'revisao_manual_necessaria': contagem['revisao_manual']
+        }
+    }
+
+
 @bp_analise_ia.route('/analisar-lote', methods=['POST', 'OPTIONS'])
 def analisar_lote():
     """
-    POST /reembolsos/analisar-lote
+    POST /reembolsos/analisar-lote?formato=ndjson|sse
     Analisa múltiplos reembolsos de uma vez
+
+    Até ANALISE_IA_LOTE_CONCORRENCIA chamadas ao Gemini em paralelo.
+    formato=ndjson (ou Accept citando application/x-ndjson) e formato=sse
+    (ou Accept citando text/event-stream) enviam cada resultado assim que
+    fica pronto; sem formato, responde o JSON consolidado no fim
     """
     if request.method == 'OPTIONS':
         return '', 200
     
     try:
-        data = request.get_json()
+        data = request.get_json(silent=True)
         
         if not data or 'nums_prestacao' not in data:
             return jsonify({'erro': 'Lista de nums_prestacao não fornecida'}), 400
@@ -585,110 +1187,63 @@ def analisar_lote():
         if not isinstance(nums_prestacao, list) or len(nums_prestacao) == 0:
             return jsonify({'erro': 'nums_prestacao deve ser um array não-vazio'}), 400
         
-        if len(nums_prestacao) > 10:
-            return jsonify({'erro': 'Máximo de 10 reembolsos por lote'}), 400
-        
-        inicio = datetime.now()
-        
-        resultados = []
+        # Mesmo reembolso repetido no lote é analisado uma vez
+        nums_prestacao = list(dict.fromkeys(nums_prestacao))
+
+        maximo = current_app.config.get('ANALISE_IA_LOTE_MAX_ITENS', 50)
+        if len(nums_prestacao) > maximo:
+            return jsonify({'erro': f'Máximo de {maximo} reembolsos por lote'}), 400
+        
+        eventos = _eventos_lote(
+            nums_prestacao,
+            concorrencia=current_app.config.get('ANALISE_IA_LOTE_CONCORRENCIA', 4),
+            commit_a_cada=current_app.config.get('ANALISE_IA_LOTE_COMMIT_A_CADA', 5)
+        )
+
+        formato = request.args.get('formato') or data.get('formato')
+        if not formato:
+            # Só tipos citados no Accept: */* (padrão de fetch, curl, requests) fica no JSON
+            aceitos = {tipo: qualidade for tipo, qualidade in request.accept_mimetypes}
+            if aceitos.get('application/x-ndjson', 0) > 0:
+                formato = 'ndjson'
+            elif aceitos.get('text/event-stream', 0) > 0:
+                formato = 'sse'
+
+        if formato == 'ndjson':
+            return Response(
+                stream_with_context(json.dumps(evento, ensure_ascii=False) + '\n' for evento in eventos),
+                mimetype='application/x-ndjson',
+                headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+            )
+
+        if formato == 'sse':
+            return Response(
+                stream_with_context(
+                    f"event: {evento['tipo']}\ndata: {json.dumps(evento, ensure_ascii=False)}\n\n" for evento in eventos
+                ),
+                mimetype='text/event-stream',
+                headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+            )
+
+        # JSON consolidado (formato antigo); erro de gravação substitui o resultado do item
+        resultados = {}
         erros = []
-        aprovacao_automatica = 0
-        revisao_manual = 0
-        
-        for num in nums_prestacao:
-            try:
-                # Buscar reembolso
-                reembolso = Reembolso.query.filter_by(num_prestacao=num).first()
-                
-                if not reembolso:
-                    erros.append({'num_prestacao': num, 'erro': 'Reembolso não encontrado'})
-                    continue
-                
-                comprovante = Comprovante.query.filter_by(reembolso_id=reembolso.num_prestacao).first()
-                
-                if not comprovante:
-                    erros.append({'num_prestacao': num, 'erro': 'Comprovante não disponível'})
-                    continue
-                
-                base_dir = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))  # /app
-                caminho_arquivo = os.path.join(base_dir, 'temp', comprovante.nome_arquivo)
-                
-                if not os.path.exists(caminho_arquivo):
-                    erros.append({'num_prestacao': num, 'erro': 'Arquivo não encontrado'})
-                    continue
-                
-                # Executar análise (código simplificado, reaproveita lógica do endpoint principal)
-                dados_ia = analisar_comprovante_gemini_vision(caminho_arquivo, reembolso)
-                
-                if 'erro' in dados_ia:
-                    erros.append({'num_prestacao': num, 'erro': dados_ia['erro']})
-                    continue
-                
-                # Cálculos básicos
-                historico = analisar_historico_colaborador(reembolso.id_colaborador)
-                reembolsos_anteriores = Reembolso.query.filter_by(id_colaborador=reembolso.id_colaborador).filter(Reembolso.num_prestacao != num).all()
-                padroes = analisar_padroes_comportamentais(reembolso, reembolsos_anteriores)
-                
-                hash_arquivo = comprovante.hash_arquivo or calcular_hash_imagem(caminho_arquivo)
-                duplicatas = detectar_duplicatas(hash_arquivo, num) if hash_arquivo else []
-                
-                score, nivel_risco, alertas = calcular_score_confiabilidade(
-                    dados_ia.get('validacoes', {}),
-                    duplicatas,
-                    padroes,
-                    dados_ia.get('sinais_fraude', {})
-                )
-                
-                aprovacao_sugerida, motivo = gerar_recomendacao(score, nivel_risco, alertas)
-                
-                # Salvar análise
-                analise = AnaliseIA(
-                    num_prestacao=num,
-                    score_confiabilidade=score,
-                    nivel_risco=nivel_risco,
-                    aprovacao_sugerida=aprovacao_sugerida,
-                    motivo_sugestao=motivo,
-                    dados_ia=dados_ia.get('dados_extraidos', {}),
-                    alertas=alertas,
-                    validacoes=dados_ia.get('validacoes', {}),
-                    historico_colaborador=historico
-                )
-                
-                db.session.add(analise)
-                
-                resultados.append({
-                    'num_prestacao': num,
-                    'score': score,
-                    'aprovacao_sugerida': aprovacao_sugerida
-                })
-                
-                if aprovacao_sugerida:
-                    aprovacao_automatica += 1
-                else:
-                    revisao_manual += 1
-            
-            except Exception as e:
-                erros.append({'num_prestacao': num, 'erro': str(e)})
-        
-        db.session.commit()
-        
-        fim = datetime.now()
-        tempo_processamento = (fim - inicio).total_seconds()
-        
-        return jsonify({
-            'total_solicitados': len(nums_prestacao),
-            'analisados_com_sucesso': len(resultados),
-            'erros': erros,
-            'tempo_processamento_segundos': round(tempo_processamento, 2),
-            'resumo': {
-                'aprovacao_automatica_sugerida': aprovacao_automatica,
-                'revisao_manual_necessaria': revisao_manual
-            },
-            'resultados': resultados
-        }), 200
+        for evento in eventos:
+            tipo = evento.pop('tipo')
+            if tipo == 'resultado':
+                resultados[evento['num_prestacao']] = evento
+            elif tipo == 'erro':
+                resultados.pop(evento['num_prestacao'], None)
+                erros.append(evento)
+            else:
+                resumo = evento
+
+        resumo.pop('total_erros')
+        resumo['erros'] = erros
+        resumo['resultados'] = list(resultados.values())
+        return jsonify(resumo), 200
     
     except Exception as e:
         db.session.rollback()
         print(f"Erro ao analisar lote: {e}")
         return jsonify({'erro': str(e)}), 500
-
@@ -1,14 +1,29 @@
-from flask import Blueprint, request, jsonify
-from src.utils.ocr_reader import processar_arquivo
+from flask import Blueprint, request, jsonify, current_app, url_for
+from src.utils.ocr_reader import processar_arquivo, verificar_imagem, ImagemMuitoGrande
+from src.utils.fila_ocr import enfileirar_ocr, tarefas_pendentes, processar_lote_ocr
+from src.utils.cache_ocr import buscar_ocr_em_cache, estatisticas_cache_ocr
+from src.utils.upload import salvar_upload, ArquivoMuitoGrande
+from src.utils.armazenamento import caminho_upload, armazenar_arquivo, caminho_local, remover_se_orfao
+from src.utils.envio_arquivos import enviar_miniatura
+from src.utils import palavras_ocr
 from src.model.comprovante_model import Comprovante
 from src.model.reembolso_model import Reembolso
+from src.model.tarefa_model import Tarefa
 from src.utils.validacao_ocr import validar_valores
+from src.utils.revalidacao_ocr import revalidar_comprovantes, interpretar_data, TAMANHO_LOTE_PADRAO
 from src.model import db
-import os, uuid
+from sqlalchemy import or_
+from sqlalchemy.orm import load_only
+from datetime import datetime, timedelta
+import base64, binascii, os, time
 
 # Blueprint com prefixo padrão
 ocr_bp = Blueprint("ocr_bp", __name__, url_prefix='/ocr')
 
+# Itens por página em GET /ocr/
+LISTAGEM_LIMITE_PADRAO = 50
+LISTAGEM_LIMITE_MAXIMO = 500
+
 
 # -------------------------------
 # CREATE - Upload e extração OCR
@@ -42,72 +57,65 @@ def ocr():
     
     print(f"DEBUG OCR - Reembolso encontrado: {reembolso.num_prestacao}")
 
-    # Caminho absoluto para o diretório temp
-    base_dir = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))  # /app
-    temp_dir = os.path.join(base_dir, 'temp')
-    os.makedirs(temp_dir, exist_ok=True)
-    
     extensao = os.path.splitext(file.filename)[1]
-    nome_arquivo = f"{uuid.uuid4().hex}{extensao}"
-    caminho_temporario = os.path.join(temp_dir, nome_arquivo)
+    caminho_temporario = caminho_upload(extensao)
+    nome_arquivo = None
 
     try:
-        # Salva o arquivo temporariamente
-        file.save(caminho_temporario)
-        print(f"DEBUG OCR - Arquivo salvo em: {caminho_temporario}")
-
-        # Processa arquivo (PDF ou imagem) e extrai texto e valores
-        print("DEBUG OCR - Iniciando processamento OCR...")
-        resultado_ocr = processar_arquivo(caminho_temporario)
-        print(f"DEBUG OCR - Resultado OCR: {resultado_ocr}")
-        
-        texto = resultado_ocr['texto']
-        valor_extraido = resultado_ocr['valor_extraido']
-        print(f"DEBUG OCR - Valor extraído: {valor_extraido}")
-
-        # Valida o valor extraído contra o valor do reembolso
-        if valor_extraido:
-            validacao = validar_valores(
-                valor_solicitado=reembolso.valor_faturado,
-                valor_extraido=valor_extraido,
-                tolerancia=5.0
-            )
-            status_validacao = validacao['status']
-            discrepancia = validacao['discrepancia']
+        # Salva o arquivo calculando o hash na mesma passada
+        upload = salvar_upload(file, caminho_temporario, current_app.config.get("UPLOAD_TAMANHO_MAXIMO"))
+        hash_arquivo = upload['hash_arquivo']
+        # Dimensões pelo cabeçalho: recusa imagens gigantes antes de decodificar
+        if extensao.lower() != '.pdf':
+            verificar_imagem(caminho_temporario)
+
+        # Guarda pelo conteúdo: arquivo idêntico já armazenado não é duplicado
+        nome_arquivo = armazenar_arquivo(caminho_temporario, hash_arquivo, extensao)
+        caminho_temporario = caminho_local(nome_arquivo)
+        print(f"DEBUG OCR - Arquivo salvo em: {caminho_temporario} ({upload['tamanho']} bytes)")
+
+        # Mesmo arquivo já processado antes? Reaproveita o OCR (responde na hora)
+        resultado_ocr = buscar_ocr_em_cache(hash_arquivo)
+        cache_ocr = resultado_ocr is not None
+
+        if not cache_ocr:
+            modo = request.form.get("modo", current_app.config.get("OCR_MODO_PADRAO", "sincrono"))
+            if modo == "assincrono":
+                return _enfileirar_tarefa_ocr(reembolso, nome_arquivo, caminho_temporario, hash_arquivo)
+
+            # Processa arquivo (PDF ou imagem) e extrai texto e valores
+            print("DEBUG OCR - Iniciando processamento OCR...")
+            resultado_ocr = processar_arquivo(caminho_temporario, conteudo=upload['conteudo'])
+            print(f"DEBUG OCR - Resultado OCR: {resultado_ocr}")
         else:
-            status_validacao = 'Pendente'
-            discrepancia = None
-
-        # Salva no banco de dados
-        comprovante = Comprovante(
-            nome_arquivo=nome_arquivo,
-            texto_extraido=texto,
-            reembolso_id=reembolso_id,
-            valor_extraido=valor_extraido,
-            status_validacao=status_validacao,
-            discrepancia_percentual=discrepancia
-        )
-        db.session.add(comprovante)
-        
-        # Atualiza o reembolso com o comprovante
-        reembolso.comprovante_id = comprovante.id
-        
+            print(f"DEBUG OCR - OCR reaproveitado do comprovante {resultado_ocr['comprovante_origem']}")
+
+        comprovante, validacao = _registrar_comprovante(reembolso, nome_arquivo, resultado_ocr, hash_arquivo)
         db.session.commit()
 
         return jsonify({
             "mensagem": "Comprovante processado com sucesso.",
             "comprovante": comprovante.to_dict(),
             "valores_encontrados": [float(v) for v in resultado_ocr['valores_encontrados']],
-            "validacao": validacao if valor_extraido else {"mensagem": "Valor não encontrado no comprovante"}
+            "validacao": validacao if validacao else {"mensagem": "Valor não encontrado no comprovante"},
+            "paginas": resultado_ocr.get('paginas', []),
+            "cache_ocr": cache_ocr
         }), 201
 
+    except (ArquivoMuitoGrande, ImagemMuitoGrande) as e:
+        if not nome_arquivo and os.path.exists(caminho_temporario):
+            os.remove(caminho_temporario)
+        return jsonify({"erro": str(e)}), 413
+
     except Exception as e:
         print(f"DEBUG - EXCEPTION CAPTURADA: {type(e).__name__}: {str(e)}")
         import traceback
         print(f"DEBUG - TRACEBACK:\n{traceback.format_exc()}")
         db.session.rollback()
-        # Remove o arquivo se houver erro
-        if os.path.exists(caminho_temporario):
+        # Remove o arquivo se houver erro (e nenhum outro comprovante usar o mesmo conteúdo)
+        if nome_arquivo:
+            remover_se_orfao(nome_arquivo)
+        elif os.path.exists(caminho_temporario):
             os.remove(caminho_temporario)
         return jsonify({"erro": f"Erro ao processar comprovante: {str(e)}"}), 500
 
@@ -115,22 +123,408 @@ def ocr():
     # NÃO deletar: a IA precisa acessar o arquivo original
 
 
+# -------------------------------
+# CREATE - Upload em lote
+# -------------------------------
+@ocr_bp.route("/lote", methods=["POST"])
+def ocr_lote():
+    """
+    Vários comprovantes num envio só (ex: todos os cupons de uma viagem)
+
+    Form:
+        files: arquivos (campo repetido)
+        reembolso_id: um id para todos os arquivos, ou um id por arquivo
+                      (campo repetido, na mesma ordem de files)
+
+    O OCR roda em paralelo no pool da fila e todos os comprovantes são
+    gravados numa única transação. Responde o resultado de cada arquivo
+    """
+    inicio_lote = time.perf_counter()
+    arquivos = [f for f in request.files.getlist("files") if f.filename.strip()]
+    reembolso_ids = request.form.getlist("reembolso_id")
+
+    if not arquivos:
+        return jsonify({"erro": "Nenhum arquivo enviado"}), 400
+
+    max_arquivos = current_app.config.get("OCR_LOTE_MAX_ARQUIVOS", 30)
+    if len(arquivos) > max_arquivos:
+        return jsonify({"erro": f"Máximo de {max_arquivos} arquivos por lote"}), 400
+
+    if len(reembolso_ids) == 1:
+        reembolso_ids = reembolso_ids * len(arquivos)
+    if not reembolso_ids or len(reembolso_ids) != len(arquivos):
+        return jsonify({"erro": "Informe um reembolso_id para o lote ou um por arquivo"}), 400
+
+    try:
+        reembolso_ids = [int(r) for r in reembolso_ids]
+    except ValueError:
+        return jsonify({"erro": "reembolso_id inválido"}), 400
+
+    # Uma consulta para todos os reembolsos do lote
+    reembolsos = {
+        r.num_prestacao: r
+        for r in Reembolso.query.filter(Reembolso.num_prestacao.in_(set(reembolso_ids))).all()
+    }
+
+    itens = []
+    for arquivo, reembolso_id in zip(arquivos, reembolso_ids):
+        item = {"arquivo": arquivo.filename, "reembolso_id": reembolso_id, "reembolso": reembolsos.get(reembolso_id)}
+        itens.append(item)
+        if not item["reembolso"]:
+            item["erro"] = "Reembolso não encontrado"
+            continue
+
+        extensao = os.path.splitext(arquivo.filename)[1]
+        caminho = caminho_upload(extensao)
+        try:
+            item["hash_arquivo"] = salvar_upload(
+                arquivo, caminho, current_app.config.get("UPLOAD_TAMANHO_MAXIMO"), limite_memoria=0
+            )["hash_arquivo"]
+            if extensao.lower() != '.pdf':
+                verificar_imagem(caminho)
+        except (ArquivoMuitoGrande, ImagemMuitoGrande) as e:
+            if os.path.exists(caminho):
+                os.remove(caminho)
+            item["erro"] = str(e)
+            continue
+        item["nome_arquivo"] = armazenar_arquivo(caminho, item["hash_arquivo"], extensao)
+        item["caminho"] = caminho_local(item["nome_arquivo"])
+
+        # Mesmo arquivo já processado antes? Reaproveita o OCR
+        item["resultado_ocr"] = buscar_ocr_em_cache(item["hash_arquivo"])
+        item["cache_ocr"] = item["resultado_ocr"] is not None
+        item["tempo_ms"] = 0.0
+
+    pendentes = [i for i in itens if "caminho" in i and not i["cache_ocr"]]
+    if pendentes:
+        resultados = processar_lote_ocr(
+            [i["caminho"] for i in pendentes],
+            max_workers=current_app.config.get("OCR_MAX_WORKERS", 2),
+            fila_maxima=current_app.config.get("OCR_FILA_MAXIMA", 50)
+        )
+        if resultados is None:
+            _remover_arquivos(itens)
+            return jsonify({"erro": "Fila de OCR cheia. Tente novamente em instantes."}), 503
+
+        for item, resultado in zip(pendentes, resultados):
+            if isinstance(resultado, Exception):
+                print(f"ERROR OCR - Lote: {item['arquivo']} falhou: {type(resultado).__name__}: {resultado}")
+                item["erro"] = f"Erro ao processar comprovante: {resultado}"
+                continue
+            item["resultado_ocr"], inicio, fim = resultado
+            item["tempo_ms"] = round((fim - inicio).total_seconds() * 1000, 2)
+
+    try:
+        for item in itens:
+            if "erro" in item:
+                continue
+            item["comprovante"], item["validacao"] = _registrar_comprovante(
+                item["reembolso"], item["nome_arquivo"], item["resultado_ocr"], item["hash_arquivo"]
+            )
+        db.session.commit()
+    except Exception as e:
+        print(f"DEBUG - EXCEPTION CAPTURADA: {type(e).__name__}: {str(e)}")
+        db.session.rollback()
+        _remover_arquivos(itens)
+        return jsonify({"erro": f"Erro ao gravar comprovantes do lote: {str(e)}"}), 500
+
+    # Depois do commit: um arquivo repetido no lote pode ter falhado num item e gravado em outro
+    _remover_arquivos([i for i in itens if "erro" in i])
+
+    resposta = []
+    for item in itens:
+        if "erro" in item:
+            resposta.append({"arquivo": item["arquivo"], "reembolso_id": item["reembolso_id"], "erro": item["erro"]})
+            continue
+        resposta.append({
+            "arquivo": item["arquivo"],
+            "reembolso_id": item["reembolso_id"],
+            "comprovante": item["comprovante"].to_dict(),
+            "validacao": item["validacao"] if item["validacao"] else {"mensagem": "Valor não encontrado no comprovante"},
+            "cache_ocr": item["cache_ocr"],
+            "tempo_ms": item["tempo_ms"]
+        })
+
+    processados = sum(1 for r in resposta if "comprovante" in r)
+    return jsonify({
+        "mensagem": f"{processados} de {len(resposta)} comprovantes processados.",
+        "resultados": resposta,
+        "tempo_total_ms": round((time.perf_counter() - inicio_lote) * 1000, 2)
+    }), 201 if processados else 422
+
+
+def _remover_arquivos(itens):
+    """Apaga os arquivos já salvos de itens do lote que ficaram sem referência"""
+    for item in itens:
+        remover_se_orfao(item.get("nome_arquivo"))
+
+
+def _registrar_comprovante(reembolso, nome_arquivo, resultado_ocr, hash_arquivo=None):
+    """
+    Cria o Comprovante a partir do resultado do OCR e valida o valor
+    extraído contra o valor do reembolso (não faz commit)
+
+    Returns:
+        Tuple (comprovante, validacao) - validacao é None se não houver valor
+    """
+    texto = resultado_ocr['texto']
+    valor_extraido = resultado_ocr['valor_extraido']
+    print(f"DEBUG OCR - Valor extraído: {valor_extraido}")
+
+    # Valida o valor extraído contra o valor do reembolso
+    validacao = None
+    if valor_extraido:
+        validacao = validar_valores(
+            valor_solicitado=reembolso.valor_faturado,
+            valor_extraido=valor_extraido
+        )
+        status_validacao = validacao['status']
+        discrepancia = validacao['discrepancia']
+    else:
+        status_validacao = 'Pendente'
+        discrepancia = None
+
+    # Salva no banco de dados
+    comprovante = Comprovante(
+        nome_arquivo=nome_arquivo,
+        texto_extraido=texto,
+        reembolso_id=reembolso.num_prestacao,
+        valor_extraido=valor_extraido,
+        status_validacao=status_validacao,
+        discrepancia_percentual=discrepancia,
+        hash_arquivo=hash_arquivo,
+        nivel_ocr=resultado_ocr.get('nivel_ocr'),
+        tempos_ocr=resultado_ocr.get('tempos_ms', {}).get('niveis'),
+        palavras_ocr=palavras_ocr.serializar(resultado_ocr.get('palavras'))
+    )
+    db.session.add(comprovante)
+    db.session.flush()
+
+    # Atualiza o reembolso com o comprovante
+    reembolso.comprovante_id = comprovante.id
+
+    return comprovante, validacao
+
+
+def _enfileirar_tarefa_ocr(reembolso, nome_arquivo, caminho_arquivo, hash_arquivo=None):
+    """
+    Registra a tarefa e agenda o OCR no pool de processos
+    Responde 202 com o id da tarefa para consulta posterior
+    """
+    tarefa = Tarefa(reembolso_id=reembolso.num_prestacao, tipo='ocr', nome_arquivo=nome_arquivo)
+    db.session.add(tarefa)
+    db.session.commit()
+    tarefa_id = tarefa.id
+
+    app = current_app._get_current_object()
+    try:
+        aceita = enfileirar_ocr(
+            caminho_arquivo,
+            lambda future: _concluir_tarefa_ocr(app, tarefa_id, future, hash_arquivo),
+            max_workers=app.config.get("OCR_MAX_WORKERS", 2),
+            fila_maxima=app.config.get("OCR_FILA_MAXIMA", 50),
+            ao_iniciar=lambda inicio: _iniciar_tarefa_ocr(app, tarefa_id, inicio)
+        )
+    except Exception as e:
+        print(f"ERROR OCR - Falha ao enfileirar tarefa {tarefa_id}: {type(e).__name__}: {e}")
+        aceita = False
+
+    if not aceita:
+        db.session.delete(tarefa)
+        db.session.commit()
+        remover_se_orfao(nome_arquivo)
+        return jsonify({"erro": "Fila de OCR cheia. Tente novamente em instantes."}), 503
+
+    print(f"DEBUG OCR - Tarefa {tarefa_id} enfileirada ({tarefas_pendentes()} pendentes)")
+
+    return jsonify({
+        "mensagem": "Comprovante recebido. OCR em processamento.",
+        "tarefa": tarefa.to_dict(),
+        "status_url": url_for("ocr_bp.status_tarefa", tarefa_id=tarefa_id),
+        "comprovante_url": url_for("ocr_bp.comprovante_da_tarefa", tarefa_id=tarefa_id)
+    }), 202
+
+
+def _iniciar_tarefa_ocr(app, tarefa_id, inicio):
+    """Um processo do pool começou o OCR: tarefa passa a 'Processando'"""
+    with app.app_context():
+        tarefa = db.session.get(Tarefa, tarefa_id)
+        # O aviso de início pode chegar depois da conclusão: não volta o status
+        if tarefa and tarefa.status == 'Na fila':
+            tarefa.status = 'Processando'
+            tarefa.data_inicio = inicio
+            db.session.commit()
+
+
+def _concluir_tarefa_ocr(app, tarefa_id, future, hash_arquivo=None):
+    """
+    Fim do OCR: grava o comprovante e fecha a tarefa
+    Roda na thread de eventos da fila, por isso abre o próprio app context;
+    qualquer falha (inclusive do banco) deixa a tarefa em 'Erro'
+    """
+    with app.app_context():
+        try:
+            tarefa = db.session.get(Tarefa, tarefa_id)
+            if not tarefa:
+                return
+
+            # Expirada enquanto o pool ainda trabalhava: o arquivo pode já ter sido apagado
+            if tarefa.status == 'Erro':
+                print(f"AVISO OCR - Tarefa {tarefa_id} concluiu depois de expirar; resultado descartado")
+                return
+
+            resultado_ocr, inicio, fim = future.result()
+
+            reembolso = db.session.get(Reembolso, tarefa.reembolso_id)
+            if not reembolso:
+                raise ValueError("Reembolso removido durante o processamento")
+
+            comprovante, _ = _registrar_comprovante(reembolso, tarefa.nome_arquivo, resultado_ocr, hash_arquivo)
+
+            tarefa.status = 'Concluída'
+            tarefa.comprovante_id = comprovante.id
+            tarefa.data_inicio = inicio
+            tarefa.data_conclusao = fim
+            db.session.commit()
+
+        except Exception as e:
+            print(f"ERROR OCR - Tarefa {tarefa_id} falhou: {type(e).__name__}: {e}")
+            db.session.rollback()
+
+            try:
+                tarefa = db.session.get(Tarefa, tarefa_id)
+                if not tarefa:
+                    return
+                tarefa.status = 'Erro'
+                tarefa.erro = str(e) or type(e).__name__
+                tarefa.data_conclusao = datetime.utcnow()
+                db.session.commit()
+                remover_se_orfao(tarefa.nome_arquivo)
+            except Exception as erro_gravacao:
+                db.session.rollback()
+                print(f"ERROR OCR - Não foi possível marcar a tarefa {tarefa_id} com erro: {erro_gravacao}")
+
+
+def _expirar_tarefas_ocr():
+    """
+    Marca como 'Erro' as tarefas de OCR pendentes há mais que OCR_TAREFA_EXPIRACAO
+
+    O pool de processos vive na memória de cada worker do gunicorn: se o worker
+    reinicia, as tarefas dele ficariam 'Na fila'/'Processando' para sempre
+    (e o arquivo nunca seria liberado). Chamado ao consultar tarefas e comprovantes
+    """
+    limite = datetime.utcnow() - timedelta(seconds=current_app.config.get("OCR_TAREFA_EXPIRACAO", 1800))
+    expiradas = Tarefa.query.filter(
+        Tarefa.tipo == 'ocr',
+        Tarefa.status.in_(['Na fila', 'Processando']),
+        Tarefa.data_criacao < limite
+    ).all()
+    if not expiradas:
+        return 0
+
+    agora = datetime.utcnow()
+    for tarefa in expiradas:
+        tarefa.status = 'Erro'
+        tarefa.erro = 'Tarefa expirada: o OCR não terminou no tempo limite (worker reiniciado?)'
+        tarefa.data_conclusao = agora
+    db.session.commit()
+    print(f"AVISO OCR - {len(expiradas)} tarefas expiradas marcadas com erro")
+
+    for nome_arquivo in {t.nome_arquivo for t in expiradas}:
+        remover_se_orfao(nome_arquivo)
+    return len(expiradas)
+
+
 # -------------------------------
 # READ - Listar comprovantes
 # -------------------------------
 @ocr_bp.route("/", methods=["GET"])
 def listar_ocr():
-    comprovantes = Comprovante.query.order_by(Comprovante.data_criacao.desc()).all()
-    resultados = [
-        {
+    """
+    GET /ocr/?limit=50&cursor=...&reembolso_id=1&status_validacao=Divergente&incluir_texto=true
+
+    Paginação por cursor (data_criacao, id), do mais novo para o mais antigo:
+    a próxima página é um "WHERE (data_criacao, id) < cursor" pelo índice,
+    sem OFFSET, então a página 2000 custa o mesmo que a primeira.
+    O corpo continua sendo o array de comprovantes; o cursor da próxima
+    página vai no cabeçalho X-Proximo-Cursor (e em Link rel="next"),
+    ausente na última página.
+    O texto_extraido (KBs por linha) só é lido do banco com incluir_texto=true
+    """
+    _expirar_tarefas_ocr()
+    limit = min(max(request.args.get("limit", LISTAGEM_LIMITE_PADRAO, type=int), 1), LISTAGEM_LIMITE_MAXIMO)
+    reembolso_id = request.args.get("reembolso_id", type=int)
+    status_validacao = request.args.get("status_validacao")
+    incluir_texto = request.args.get("incluir_texto", "false").lower() in ("1", "true", "sim")
+
+    colunas = [
+        Comprovante.id, Comprovante.nome_arquivo, Comprovante.data_criacao, Comprovante.reembolso_id,
+        Comprovante.valor_extraido, Comprovante.status_validacao
+    ]
+    if incluir_texto:
+        colunas.append(Comprovante.texto_extraido)
+
+    query = Comprovante.query.options(load_only(*colunas))
+    if reembolso_id:
+        query = query.filter(Comprovante.reembolso_id == reembolso_id)
+    if status_validacao:
+        query = query.filter(Comprovante.status_validacao == status_validacao)
+
+    cursor = request.args.get("cursor")
+    if cursor:
+        try:
+            data_cursor, id_cursor = _decodificar_cursor(cursor)
+        except ValueError:
+            return jsonify({"erro": "Cursor inválido"}), 400
+        # O "<=" isolado deixa o banco começar a leitura do índice direto no cursor;
+        # o OR só desempata comprovantes criados no mesmo instante
+        query = query.filter(
+            Comprovante.data_criacao <= data_cursor,
+            or_(Comprovante.data_criacao < data_cursor, Comprovante.id < id_cursor)
+        )
+
+    # Uma linha a mais só para saber se existe próxima página
+    comprovantes = query.order_by(Comprovante.data_criacao.desc(), Comprovante.id.desc()).limit(limit + 1).all()
+    tem_mais = len(comprovantes) > limit
+    comprovantes = comprovantes[:limit]
+
+    resultados = []
+    for c in comprovantes:
+        item = {
             "id": c.id,
             "nome_arquivo": c.nome_arquivo,
-            "texto_extraido": c.texto_extraido,
-            "data_criacao": c.data_criacao.isoformat()
+            "data_criacao": c.data_criacao.isoformat(),
+            "reembolso_id": c.reembolso_id,
+            "valor_extraido": float(c.valor_extraido) if c.valor_extraido is not None else None,
+            "status_validacao": c.status_validacao
         }
-        for c in comprovantes
-    ]
-    return jsonify(resultados), 200
+        if incluir_texto:
+            item["texto_extraido"] = c.texto_extraido
+        resultados.append(item)
+
+    resposta = jsonify(resultados)
+    if tem_mais:
+        proximo_cursor = _codificar_cursor(comprovantes[-1])
+        argumentos = {**request.args.to_dict(), "cursor": proximo_cursor}
+        resposta.headers["X-Proximo-Cursor"] = proximo_cursor
+        resposta.headers["Link"] = f'<{url_for("ocr_bp.listar_ocr", **argumentos)}>; rel="next"'
+    return resposta, 200
+
+
+def _codificar_cursor(comprovante):
+    """Posição do último item da página -> token opaco para ?cursor="""
+    valor = f"{comprovante.data_criacao.isoformat()}|{comprovante.id}"
+    return base64.urlsafe_b64encode(valor.encode()).decode().rstrip("=")
+
+
+def _decodificar_cursor(cursor):
+    """Token de ?cursor= -> (data_criacao, id); ValueError se inválido"""
+    try:
+        valor = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        data_criacao, id_comprovante = valor.split("|")
+        return datetime.fromisoformat(data_criacao), int(id_comprovante)
+    except (binascii.Error, UnicodeDecodeError, ValueError) as e:
+        raise ValueError("Cursor inválido") from e
 
 
 # -------------------------------
@@ -145,6 +539,94 @@ def obter_ocr(id):
     return jsonify(comprovante.to_dict()), 200
 
 
+# -------------------------------
+# READ - Palavras do OCR (texto, caixa e confiança)
+# -------------------------------
+@ocr_bp.route("/<int:id>/palavras", methods=["GET"])
+def palavras_comprovante(id):
+    comprovante = db.session.get(Comprovante, id)
+    if not comprovante:
+        return jsonify({"erro": "Comprovante não encontrado"}), 404
+
+    estrutura = palavras_ocr.carregar(comprovante.palavras_ocr)
+    if not estrutura:
+        return jsonify({"erro": "Comprovante sem palavras do OCR (processado antes ou com OCR_PALAVRAS=false)"}), 404
+
+    return jsonify({
+        "comprovante_id": comprovante.id,
+        "legibilidade": palavras_ocr.resumo_legibilidade(estrutura),
+        "localizacao_valor": palavras_ocr.localizar_valor(estrutura, comprovante.valor_extraido),
+        "palavras": estrutura
+    }), 200
+
+
+# -------------------------------
+# READ - Miniatura de um comprovante
+# -------------------------------
+@ocr_bp.route("/<int:id>/miniatura", methods=["GET"])
+def miniatura_ocr(id):
+    """
+    Miniatura WebP (?tamanho=p|m|g); PDFs mostram a 1ª página
+    O arquivo de um comprovante não muda, então o cache é longo (immutable)
+    """
+    comprovante = db.session.get(Comprovante, id)
+    if not comprovante:
+        return jsonify({"erro": "Comprovante não encontrado"}), 404
+
+    return enviar_miniatura(
+        comprovante.nome_arquivo, comprovante.hash_arquivo, request.args.get("tamanho", "m"), imutavel=True
+    )
+
+
+# -------------------------------
+# READ - Status de tarefa assíncrona
+# -------------------------------
+@ocr_bp.route("/tarefas/<string:tarefa_id>", methods=["GET"])
+def status_tarefa(tarefa_id):
+    _expirar_tarefas_ocr()
+    tarefa = db.session.get(Tarefa, tarefa_id)
+    if not tarefa:
+        return jsonify({"erro": "Tarefa não encontrada"}), 404
+
+    resposta = tarefa.to_dict()
+    resposta["fila_pendentes"] = tarefas_pendentes()
+    return jsonify(resposta), 200
+
+
+@ocr_bp.route("/tarefas/<string:tarefa_id>/comprovante", methods=["GET"])
+def comprovante_da_tarefa(tarefa_id):
+    _expirar_tarefas_ocr()
+    tarefa = db.session.get(Tarefa, tarefa_id)
+    if not tarefa:
+        return jsonify({"erro": "Tarefa não encontrada"}), 404
+
+    if tarefa.status == 'Erro':
+        return jsonify({"erro": f"Erro ao processar comprovante: {tarefa.erro}", "tarefa": tarefa.to_dict()}), 500
+
+    if tarefa.status != 'Concluída':
+        return jsonify({"mensagem": "OCR ainda em processamento", "tarefa": tarefa.to_dict()}), 202
+
+    comprovante = db.session.get(Comprovante, tarefa.comprovante_id)
+    if not comprovante:
+        return jsonify({"erro": "Comprovante não encontrado"}), 404
+
+    return jsonify(comprovante.to_dict()), 200
+
+
+# -------------------------------
+# READ - Estatísticas do cache de OCR
+# -------------------------------
+@ocr_bp.route("/cache", methods=["GET"])
+def estatisticas_cache():
+    """
+    Acertos/falhas do cache por hash de conteúdo
+    Os contadores são por processo (cada worker do gunicorn tem os seus)
+    """
+    estatisticas = estatisticas_cache_ocr()
+    estatisticas["pid"] = os.getpid()
+    return jsonify(estatisticas), 200
+
+
 # -------------------------------
 # VALIDAÇÃO - Revalidar comprovante
 # -------------------------------
@@ -169,8 +651,7 @@ def revalidar_comprovante(id):
         # Revalida
         validacao = validar_valores(
             valor_solicitado=reembolso.valor_faturado,
-            valor_extraido=comprovante.valor_extraido,
-            tolerancia=5.0
+            valor_extraido=comprovante.valor_extraido
         )
         
         # Atualiza status
@@ -188,3 +669,46 @@ def revalidar_comprovante(id):
     except Exception as e:
         db.session.rollback()
         return jsonify({"erro": str(e)}), 500
+
+
+# -------------------------------
+# UPDATE - Revalidar comprovantes em lote
+# -------------------------------
+@ocr_bp.route("/revalidar", methods=["POST"])
+def revalidar_comprovantes_lote():
+    """
+    POST /ocr/revalidar
+    {"reembolso_ids": [1, 2], "status_validacao": ["Divergente"], "data_inicio": "2025-01-01",
+     "data_fim": "2025-02-01", "tolerancia": 3.0, "tamanho_lote": 1000, "simular": true}
+
+    Todos os campos são opcionais; sem filtros revalida todos os comprovantes
+    """
+    dados = request.get_json(silent=True) or {}
+
+    try:
+        reembolso_ids = [int(i) for i in dados.get("reembolso_ids") or []]
+        status_validacao = dados.get("status_validacao") or []
+        if isinstance(status_validacao, str):
+            status_validacao = [status_validacao]
+        tolerancia = float(dados["tolerancia"]) if dados.get("tolerancia") is not None else None
+        tamanho_lote = max(1, int(dados.get("tamanho_lote", TAMANHO_LOTE_PADRAO)))
+        data_inicio = interpretar_data(dados.get("data_inicio"))
+        data_fim = interpretar_data(dados.get("data_fim"))
+    except (TypeError, ValueError) as e:
+        return jsonify({"erro": f"Parâmetros inválidos: {str(e)}"}), 400
+
+    try:
+        resultado = revalidar_comprovantes(
+            reembolso_ids=reembolso_ids,
+            status_validacao=status_validacao,
+            data_inicio=data_inicio,
+            data_fim=data_fim,
+            tolerancia=tolerancia,
+            tamanho_lote=tamanho_lote,
+            simular=bool(dados.get("simular", False))
+        )
+        return jsonify(resultado), 200
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"erro": str(e)}), 500
@@ -152,19 +152,14 @@ def remover_reembolso(num_prestacao):
         if not r:
             return jsonify({'erro': 'Reembolso não encontrado.'}), 404
         
+        # TAREFAS DE OCR EM SEGUNDO PLANO (referenciam reembolso e comprovante)
+        from src.model.tarefa_model import Tarefa
+        Tarefa.query.filter_by(reembolso_id=num_prestacao).delete()
+
         # COMPROVANTES ASSOCIADOS PRIMEIRO
         comprovantes = Comprovante.query.filter_by(reembolso_id=num_prestacao).all()
-        base_dir = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))  # /app
+        arquivos = {comp.nome_arquivo for comp in comprovantes}
         for comp in comprovantes:
-            # Remover arquivo físico se existir
-            caminho_arquivo = os.path.join(base_dir, 'temp', comp.nome_arquivo)
-            if os.path.exists(caminho_arquivo):
-                try:
-                    os.remove(caminho_arquivo)
-                    print(f"DEBUG - Arquivo {comp.nome_arquivo} removido")
-                except Exception as e:
-                    print(f"AVISO - Erro ao remover arquivo {comp.nome_arquivo}: {e}")
-            
             db.session.delete(comp)
         
         # DELETAR ANÁLISES IA ASSOCIADAS (se existir)
@@ -176,6 +171,11 @@ def remover_reembolso(num_prestacao):
         # AGORA PODE DELETAR O REEMBOLSO
         db.session.delete(r)
         db.session.commit()
+
+        # Arquivos físicos: só apaga os que nenhum outro comprovante usa
+        from src.utils.armazenamento import remover_se_orfao
+        for nome_arquivo in arquivos:
+            remover_se_orfao(nome_arquivo)
         
         return jsonify({
             'mensagem': 'Reembolso removido com sucesso!',
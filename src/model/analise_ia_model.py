@@ -17,14 +17,14 @@ class AnaliseIA(db.Model):
     validacoes = db.Column(db.Text)  # JSON string
     historico_colaborador = db.Column(db.Text)  # JSON string
     timestamp_analise = db.Column(db.DateTime, default=datetime.now)
-    versao_modelo = db.Column(db.String(50), default='grok-vision-beta')
+    versao_modelo = db.Column(db.String(50), default='gemini-1.5-pro')  # modelo que respondeu (ver roteamento_vision)
     
     # Relacionamento
     reembolso = db.relationship('Reembolso', backref='analises_ia', foreign_keys=[num_prestacao])
     
     def __init__(self, num_prestacao, score_confiabilidade, nivel_risco, aprovacao_sugerida, 
                  motivo_sugestao=None, dados_ia=None, alertas=None, validacoes=None, 
-                 historico_colaborador=None, versao_modelo='grok-vision-beta'):
+                 historico_colaborador=None, versao_modelo='gemini-1.5-pro'):
         self.num_prestacao = num_prestacao
         self.score_confiabilidade = score_confiabilidade
         self.nivel_risco = nivel_risco
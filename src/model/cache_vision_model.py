@@ -0,0 +1,31 @@
+from src.model import db
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, Text, DateTime
+
+
+class CacheVision(db.Model):
+    """
+    Resposta do Gemini Vision já analisada, reaproveitada quando o mesmo
+    comprovante é analisado de novo com os mesmos dados declarados, a
+    mesma versão do prompt e o mesmo modelo (ver src/utils/cache_vision.py)
+    """
+    __tablename__ = "cache_vision"
+
+    chave = Column(String(64), primary_key=True)  # SHA-256 de (hash do arquivo, campos declarados, versão do prompt, modelo)
+    hash_arquivo = Column(String(64), nullable=False, index=True)
+    modelo = Column(String(50), nullable=False)
+    versao_prompt = Column(String(20), nullable=False)
+    resposta = Column(Text, nullable=False)  # JSON devolvido pelo modelo
+    tamanho = Column(Integer, nullable=False, default=0)
+    acertos = Column(Integer, nullable=False, default=0)
+    data_criacao = Column(DateTime, default=datetime.utcnow, index=True)
+    ultimo_acesso = Column(DateTime, default=datetime.utcnow, index=True)
+
+    def __init__(self, chave, hash_arquivo, modelo, versao_prompt, resposta):
+        self.chave = chave
+        self.hash_arquivo = hash_arquivo
+        self.modelo = modelo
+        self.versao_prompt = str(versao_prompt)
+        self.resposta = resposta
+        self.tamanho = len(resposta.encode('utf-8'))
+        self.acertos = 0
@@ -1,9 +1,16 @@
 from src.model import db
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, DECIMAL
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, DECIMAL, Index
+from sqlalchemy.orm import deferred
+import json
 
 class Comprovante(db.Model):
     __tablename__ = "comprovantes"
+    __table_args__ = (
+        # Paginação por cursor de GET /ocr/ (geral e por reembolso)
+        Index("ix_comprovantes_data_criacao_id", "data_criacao", "id"),
+        Index("ix_comprovantes_reembolso_data_criacao_id", "reembolso_id", "data_criacao", "id"),
+    )
 
     id = Column(Integer, primary_key=True)
     nome_arquivo = Column(String(120), nullable=False)
@@ -17,11 +24,19 @@ class Comprovante(db.Model):
     
     # Campo para detecção de duplicatas (hash SHA-256 da imagem)
     hash_arquivo = Column(String(64), nullable=True, index=True)
+
+    # Nível do OCR que produziu o texto (rapido, completo, cache) e tempo de cada nível (JSON, ms)
+    nivel_ocr = Column(String(20), nullable=True)
+    tempos_ocr = Column(Text, nullable=True)
+
+    # Palavras do OCR com caixa e confiança (JSON compacto, ver src/utils/palavras_ocr.py)
+    # Dezenas de KB por comprovante: só é lido do banco quando acessado
+    palavras_ocr = deferred(Column(Text, nullable=True))
     
     # Relacionamento com reembolso
     reembolso_id = Column(Integer, ForeignKey('reembolso.num_prestacao'), nullable=False)
 
-    def __init__(self, nome_arquivo, texto_extraido, reembolso_id, valor_extraido=None, status_validacao='Pendente', discrepancia_percentual=None, hash_arquivo=None):
+    def __init__(self, nome_arquivo, texto_extraido, reembolso_id, valor_extraido=None, status_validacao='Pendente', discrepancia_percentual=None, hash_arquivo=None, nivel_ocr=None, tempos_ocr=None, palavras_ocr=None):
         self.nome_arquivo = nome_arquivo
         self.texto_extraido = texto_extraido
         self.reembolso_id = reembolso_id
@@ -29,6 +44,9 @@ class Comprovante(db.Model):
         self.status_validacao = status_validacao
         self.discrepancia_percentual = discrepancia_percentual
         self.hash_arquivo = hash_arquivo
+        self.nivel_ocr = nivel_ocr
+        self.tempos_ocr = json.dumps(tempos_ocr) if tempos_ocr is not None else None
+        self.palavras_ocr = palavras_ocr
 
     def to_dict(self):
         return {
@@ -40,5 +58,7 @@ class Comprovante(db.Model):
             "valor_extraido": float(self.valor_extraido) if self.valor_extraido else None,
             "status_validacao": self.status_validacao,
             "discrepancia_percentual": float(self.discrepancia_percentual) if self.discrepancia_percentual else None,
-            "hash_arquivo": self.hash_arquivo
+            "hash_arquivo": self.hash_arquivo,
+            "nivel_ocr": self.nivel_ocr,
+            "tempos_ocr": json.loads(self.tempos_ocr) if self.tempos_ocr else None
         }
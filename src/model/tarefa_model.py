@@ -0,0 +1,54 @@
+from src.model import db
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Index
+import json
+import uuid
+
+
+class Tarefa(db.Model):
+    """
+    Tarefa processada em segundo plano (OCR de um comprovante ou análise com IA)
+    O cliente recebe o id na hora e consulta o status depois
+    """
+    __tablename__ = "tarefas"
+    __table_args__ = (
+        # Tarefa em andamento de um reembolso (análise com IA não é enfileirada duas vezes)
+        Index('ix_tarefas_tipo_reembolso_status', 'tipo', 'reembolso_id', 'status'),
+    )
+
+    id = Column(String(32), primary_key=True)
+    tipo = Column(String(30), nullable=False, default='ocr')
+    status = Column(String(20), nullable=False, default='Na fila', index=True)  # Na fila, Processando, Concluída, Erro
+    reembolso_id = Column(Integer, ForeignKey('reembolso.num_prestacao'), nullable=False)
+    nome_arquivo = Column(String(120), nullable=True)
+    comprovante_id = Column(Integer, ForeignKey('comprovantes.id'), nullable=True)
+    analise_id = Column(Integer, ForeignKey('analises_ia.id'), nullable=True)
+    resultado = Column(Text, nullable=True)  # JSON: resposta da análise com IA
+    tempos_etapas = Column(Text, nullable=True)  # JSON: ms por etapa
+    erro = Column(Text, nullable=True)
+    data_criacao = Column(DateTime, default=datetime.utcnow)
+    data_inicio = Column(DateTime, nullable=True)
+    data_conclusao = Column(DateTime, nullable=True)
+
+    def __init__(self, reembolso_id, tipo='ocr', nome_arquivo=None):
+        self.id = uuid.uuid4().hex
+        self.tipo = tipo
+        self.status = 'Na fila'
+        self.reembolso_id = reembolso_id
+        self.nome_arquivo = nome_arquivo
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "tipo": self.tipo,
+            "status": self.status,
+            "reembolso_id": self.reembolso_id,
+            "nome_arquivo": self.nome_arquivo,
+            "comprovante_id": self.comprovante_id,
+            "analise_id": self.analise_id,
+            "tempos_etapas": json.loads(self.tempos_etapas) if self.tempos_etapas else None,
+            "erro": self.erro,
+            "data_criacao": self.data_criacao.strftime("%Y-%m-%d %H:%M:%S") if self.data_criacao else None,
+            "data_inicio": self.data_inicio.strftime("%Y-%m-%d %H:%M:%S") if self.data_inicio else None,
+            "data_conclusao": self.data_conclusao.strftime("%Y-%m-%d %H:%M:%S") if self.data_conclusao else None
+        }
@@ -0,0 +1,30 @@
+import pytest
+from src.app import create_app
+from src.model import db
+from src.model.reembolso_model import Reembolso
+from src.utils import armazenamento, fila_ocr
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    """App de teste (SQLite em memória) com o armazenamento local em tmp_path"""
+    monkeypatch.setenv("FLASK_ENV", "testing")
+    armazenamento.definir_backend(armazenamento.ArmazenamentoLocal(str(tmp_path)))
+    app = create_app()
+    with app.app_context():
+        yield app
+        db.session.remove()
+    # Pool novo a cada teste: os processos herdam o OCR substituído no fork
+    if fila_ocr._executor is not None:
+        fila_ocr._executor.shutdown(wait=True)
+        fila_ocr._executor = None
+    armazenamento.definir_backend(None)
+
+
+@pytest.fixture
+def reembolso(app):
+    reembolso = Reembolso(colaborador="Ana", empresa="Sispar", tipo_reembolso="Alimentação",
+                          centro_custo="TI", valor_faturado=10, despesa=10)
+    db.session.add(reembolso)
+    db.session.commit()
+    return reembolso
@@ -0,0 +1,104 @@
+import json
+import time
+import pytest
+from src.controler import analise_ia_controller
+from src.model import db
+from src.model.analise_ia_model import AnaliseIA
+from src.model.comprovante_model import Comprovante
+from src.model.reembolso_model import Reembolso
+
+
+@pytest.fixture(autouse=True)
+def lote_configurado(app):
+    app.config["ANALISE_IA_LOTE_CONCORRENCIA"] = 4
+    app.config["ANALISE_IA_LOTE_COMMIT_A_CADA"] = 2
+
+
+def _vision_lenta(caminho_arquivo, reembolso, hash_arquivo=None, modelo=None):
+    time.sleep(0.3)
+    if reembolso.descricao == "falha":
+        return {"erro": "Vision indisponível"}
+    return {
+        "dados_extraidos": {"valor_total": float(reembolso.despesa)},
+        "validacoes": {"valor_corresponde": True, "comprovante_legivel": True, "qualidade_imagem": 0.9},
+        "sinais_fraude": {}
+    }
+
+
+def _criar(tmp_path, indice, descricao=None):
+    reembolso = Reembolso(colaborador="Ana", empresa="Sispar", tipo_reembolso="Alimentação",
+                          centro_custo="TI", valor_faturado=50, despesa=50, descricao=descricao)
+    db.session.add(reembolso)
+    db.session.flush()
+    (tmp_path / f"{indice}.png").write_bytes(b"imagem")
+    db.session.add(Comprovante(nome_arquivo=f"{indice}.png", texto_extraido="",
+                               reembolso_id=reembolso.num_prestacao, hash_arquivo=f"{indice:064x}"))
+    db.session.commit()
+    return reembolso.num_prestacao
+
+
+def test_lote_em_paralelo_envia_cada_resultado_em_ndjson(app, tmp_path, monkeypatch):
+    monkeypatch.setattr(analise_ia_controller, "analisar_comprovante_gemini_vision", _vision_lenta)
+    nums = [_criar(tmp_path, i) for i in range(3)] + [_criar(tmp_path, 3, descricao="falha"), 9999]
+
+    inicio = time.perf_counter()
+    resposta = app.test_client().post("/reembolsos/analisar-lote?formato=ndjson", json={"nums_prestacao": nums})
+    eventos = [json.loads(linha) for linha in resposta.get_data(as_text=True).splitlines()]
+    decorrido = time.perf_counter() - inicio
+
+    assert resposta.mimetype == "application/x-ndjson"
+    # 4 chamadas de 0,3s em paralelo, não 1,2s em sequência
+    assert decorrido < 0.9
+    assert eventos[0] == {"tipo": "erro", "num_prestacao": 9999, "erro": "Reembolso não encontrado"}
+    assert sorted(e["num_prestacao"] for e in eventos if e["tipo"] == "resultado") == nums[:3]
+    assert eventos[-1]["tipo"] == "resumo"
+    assert eventos[-1]["analisados_com_sucesso"] == 3 and eventos[-1]["total_erros"] == 2
+    assert AnaliseIA.query.count() == 3
+
+
+def test_lote_sem_formato_responde_json_consolidado(app, tmp_path, monkeypatch):
+    monkeypatch.setattr(analise_ia_controller, "analisar_comprovante_gemini_vision", _vision_lenta)
+    nums = [_criar(tmp_path, 0), _criar(tmp_path, 1, descricao="falha")]
+
+    corpo = app.test_client().post("/reembolsos/analisar-lote", json={"nums_prestacao": nums + nums}).get_json()
+
+    assert corpo["total_solicitados"] == 2
+    assert [r["num_prestacao"] for r in corpo["resultados"]] == [nums[0]]
+    assert corpo["erros"] == [{"num_prestacao": nums[1], "erro": "Vision indisponível"}]
+
+
+def test_accept_generico_mantem_json_e_ndjson_so_quando_pedido(app, tmp_path, monkeypatch):
+    monkeypatch.setattr(analise_ia_controller, "analisar_comprovante_gemini_vision", _vision_lenta)
+    nums = [_criar(tmp_path, 0)]
+    cliente = app.test_client()
+
+    generico = cliente.post("/reembolsos/analisar-lote", json={"nums_prestacao": nums}, headers={"Accept": "*/*"})
+    ndjson = cliente.post("/reembolsos/analisar-lote", json={"nums_prestacao": nums},
+                          headers={"Accept": "application/x-ndjson, */*;q=0.1"})
+
+    assert generico.mimetype == "application/json" and generico.get_json()["total_solicitados"] == 1
+    assert ndjson.mimetype == "application/x-ndjson"
+
+
+def test_falha_no_meio_do_stream_envia_erro_e_resumo(app, tmp_path, monkeypatch):
+    monkeypatch.setattr(analise_ia_controller, "analisar_comprovante_gemini_vision", _vision_lenta)
+    original = analise_ia_controller.executar_em_paralelo
+
+    def interrompe_no_terceiro(funcao, itens, concorrencia):
+        for indice, saida in enumerate(original(funcao, itens, 1)):
+            if indice == 2:
+                raise RuntimeError("conexão com o banco perdida")
+            yield saida
+
+    monkeypatch.setattr(analise_ia_controller, "executar_em_paralelo", interrompe_no_terceiro)
+    nums = [_criar(tmp_path, i) for i in range(4)]
+
+    resposta = app.test_client().post("/reembolsos/analisar-lote?formato=ndjson", json={"nums_prestacao": nums})
+    eventos = [json.loads(linha) for linha in resposta.get_data(as_text=True).splitlines()]
+
+    # Bloco de 2 com commit antes da falha; o restante não fica na sessão
+    assert [e["tipo"] for e in eventos] == ["resultado", "resultado", "erro", "resumo"]
+    assert eventos[2]["interrompido"] is True and "banco" in eventos[2]["erro"]
+    assert eventos[-1]["interrompido"] is True and eventos[-1]["analisados_com_sucesso"] == 2
+    db.session.rollback()
+    assert AnaliseIA.query.count() == 2
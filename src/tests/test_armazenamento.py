@@ -0,0 +1,54 @@
+import pytest
+from src.model import db
+from src.model.tarefa_model import Tarefa
+from src.utils import armazenamento
+
+
+@pytest.fixture
+def backend_local(tmp_path):
+    backend = armazenamento.ArmazenamentoLocal(str(tmp_path))
+    armazenamento.definir_backend(backend)
+    yield backend
+    armazenamento.definir_backend(None)
+
+
+def test_chave_em_duas_pastas_pelo_hash():
+    hash_arquivo = "abcdef" + "0" * 58
+    assert armazenamento.chave_arquivo(hash_arquivo, ".JPG") == f"ab/cd/{hash_arquivo}.jpg"
+
+
+def test_nomes_antigos_e_chaves_resolvem_na_mesma_raiz(backend_local, tmp_path):
+    assert armazenamento.caminho_local("3f2a.png") == str(tmp_path / "3f2a.png")
+    assert armazenamento.caminho_local("ab/cd/abcd.png") == str(tmp_path / "ab" / "cd" / "abcd.png")
+    with pytest.raises(ValueError):
+        armazenamento.caminho_local("../config.py")
+
+
+def test_conteudo_repetido_e_gravado_uma_vez(backend_local, tmp_path):
+    hash_arquivo = "ff" * 32
+    chaves = []
+    for nome in ("upload1.png", "upload2.png"):
+        (tmp_path / nome).write_bytes(b"cupom")
+        chaves.append(armazenamento.armazenar_arquivo(str(tmp_path / nome), hash_arquivo, ".png"))
+
+    assert chaves[0] == chaves[1]
+    with armazenamento.abrir_arquivo(chaves[0]) as arquivo:
+        assert arquivo.read() == b"cupom"
+    assert not (tmp_path / "upload1.png").exists() and not (tmp_path / "upload2.png").exists()
+
+
+def test_arquivo_de_tarefa_em_processamento_nao_e_orfao(app, reembolso, tmp_path):
+    (tmp_path / "ab" / "cd").mkdir(parents=True)
+    (tmp_path / "ab" / "cd" / "abcd.png").write_bytes(b"cupom")
+    tarefa = Tarefa(reembolso_id=reembolso.num_prestacao, nome_arquivo="ab/cd/abcd.png")
+    tarefa.status = 'Processando'
+    db.session.add(tarefa)
+    db.session.commit()
+
+    assert armazenamento.contar_referencias("ab/cd/abcd.png") == 1
+    assert not armazenamento.remover_se_orfao("ab/cd/abcd.png")
+    assert (tmp_path / "ab" / "cd" / "abcd.png").exists()
+
+    tarefa.status = 'Concluída'
+    db.session.commit()
+    assert armazenamento.remover_se_orfao("ab/cd/abcd.png")
@@ -0,0 +1,69 @@
+"""
+Backend S3 contra um servidor compatível local
+
+Usa o MinIO do docker-compose quando S3_ENDPOINT_URL_TESTE está definido
+(ex: http://localhost:9000, com AWS_ACCESS_KEY_ID/AWS_SECRET_ACCESS_KEY);
+sem ele, sobe o servidor S3 do moto em uma thread
+"""
+import hashlib
+import os
+import uuid
+import pytest
+
+boto3 = pytest.importorskip("boto3")
+
+from src.utils import armazenamento
+
+
+@pytest.fixture(scope="module")
+def endpoint_s3():
+    endpoint = os.environ.get("S3_ENDPOINT_URL_TESTE")
+    if endpoint:
+        yield endpoint
+        return
+
+    servidor_moto = pytest.importorskip("moto.server")
+    os.environ.setdefault("AWS_ACCESS_KEY_ID", "teste")
+    os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "teste")
+    servidor = servidor_moto.ThreadedMotoServer(port=0)
+    servidor.start()
+    host, porta = servidor.get_host_and_port()
+    yield f"http://{host}:{porta}"
+    servidor.stop()
+
+
+@pytest.fixture
+def backend_s3(endpoint_s3, tmp_path):
+    bucket = f"sispar-teste-{uuid.uuid4().hex[:8]}"
+    cliente = boto3.client("s3", endpoint_url=endpoint_s3, region_name="us-east-1")
+    cliente.create_bucket(Bucket=bucket)
+    backend = armazenamento.ArmazenamentoS3(bucket, cliente=cliente, diretorio_cache=str(tmp_path / "cache"))
+    yield backend
+    for objeto in cliente.list_objects_v2(Bucket=bucket).get("Contents", []):
+        cliente.delete_object(Bucket=bucket, Key=objeto["Key"])
+    cliente.delete_bucket(Bucket=bucket)
+
+
+def test_envio_leitura_e_remocao(backend_s3, tmp_path):
+    dados = os.urandom(6 * 1024 * 1024)
+    origem = tmp_path / "upload.pdf"
+    origem.write_bytes(dados)
+    chave = armazenamento.chave_arquivo(hashlib.sha256(dados).hexdigest(), ".pdf")
+
+    backend_s3.salvar(str(origem), chave)
+    assert backend_s3.existe(chave)
+
+    corpo = backend_s3.abrir(chave)
+    lidos = b"".join(iter(lambda: corpo.read(1024 * 1024), b""))
+    assert lidos == dados
+
+    # Outra réplica: sem cópia local, baixa do bucket
+    os.remove(backend_s3.caminho_local(chave))
+    with open(backend_s3.caminho_local(chave), "rb") as arquivo:
+        assert arquivo.read() == dados
+
+    backend_s3.remover(chave)
+    assert not backend_s3.existe(chave)
+    assert not os.path.exists(backend_s3.caminho_local(chave))
+    with pytest.raises(FileNotFoundError):
+        backend_s3.abrir(chave)
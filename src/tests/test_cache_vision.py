@@ -0,0 +1,58 @@
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from PIL import Image
+from src.controler import analise_ia_controller
+from src.model import db
+from src.model.cache_vision_model import CacheVision
+from src.utils import cache_vision
+
+RESPOSTA = '{"dados_extraidos": {"valor_total": 45.9}, "validacoes": {"comprovante_legivel": true}, "sinais_fraude": {}}'
+
+
+def _declarado(despesa="45.90"):
+    return SimpleNamespace(despesa=despesa, data=None, tipo_reembolso="Alimentação", descricao=None)
+
+
+def test_segunda_analise_do_mesmo_arquivo_nao_chama_o_gemini(app, tmp_path, monkeypatch):
+    chamadas = []
+    caminho = str(tmp_path / "a.png")
+    Image.new("RGB", (300, 400), "white").save(caminho)
+
+    class Modelo:
+        def __init__(self, nome):
+            pass
+
+        def generate_content(self, partes):
+            chamadas.append(partes)
+            return SimpleNamespace(text=RESPOSTA)
+
+    monkeypatch.setattr(analise_ia_controller.genai, "upload_file", lambda caminho: "arquivo")
+    monkeypatch.setattr(analise_ia_controller.genai, "GenerativeModel", Modelo)
+
+    primeira = analise_ia_controller.analisar_comprovante_gemini_vision(caminho, _declarado(), "ab" * 32)
+    segunda = analise_ia_controller.analisar_comprovante_gemini_vision(caminho, _declarado(), "ab" * 32)
+    outro_valor = analise_ia_controller.analisar_comprovante_gemini_vision(caminho, _declarado("50.00"), "ab" * 32)
+
+    assert len(chamadas) == 2
+    assert "cache_vision" not in primeira
+    assert segunda["cache_vision"] is True
+    assert segunda["dados_extraidos"] == primeira["dados_extraidos"] == outro_valor["dados_extraidos"]
+    assert db.session.get(CacheVision, cache_vision.chave_cache(
+        "ab" * 32, analise_ia_controller.campos_declarados_vision(_declarado()),
+        analise_ia_controller.MODELO_VISION_COMPLETO, analise_ia_controller.VERSAO_PROMPT_VISION
+    )).acertos == 1
+
+
+def test_expiracao_e_limite_de_entradas(app, monkeypatch):
+    monkeypatch.setattr(cache_vision, "VISION_CACHE_MAX_ENTRADAS", 2)
+    for i in range(3):
+        cache_vision.gravar_resposta(f"chave{i}", "ab" * 32, "modelo", 1, {"i": i})
+
+    # Acima do limite sai a acessada há mais tempo
+    assert db.session.get(CacheVision, "chave0") is None
+    assert cache_vision.buscar_resposta("chave2") == {"i": 2}
+
+    db.session.get(CacheVision, "chave1").data_criacao = datetime.utcnow() - timedelta(hours=cache_vision.VISION_CACHE_TTL_HORAS + 1)
+    db.session.commit()
+    assert cache_vision.buscar_resposta("chave1") is None
+    assert db.session.get(CacheVision, "chave1") is None
@@ -0,0 +1,54 @@
+import hashlib
+import pytest
+from src.model import db
+from src.model.comprovante_model import Comprovante
+from src.utils import armazenamento
+
+CONTEUDO = b"%PDF-1.4 " + bytes(range(256)) * 4
+HASH = hashlib.sha256(CONTEUDO).hexdigest()
+
+
+@pytest.fixture
+def comprovante(app, tmp_path, monkeypatch, reembolso):
+    monkeypatch.setattr(armazenamento, "DIRETORIO_ARQUIVOS", str(tmp_path))
+    chave = armazenamento.chave_arquivo(HASH, ".pdf")
+    destino = tmp_path / chave
+    destino.parent.mkdir(parents=True)
+    destino.write_bytes(CONTEUDO)
+    comprovante = Comprovante(nome_arquivo=chave, texto_extraido="", reembolso_id=reembolso.num_prestacao,
+                              hash_arquivo=HASH)
+    db.session.add(comprovante)
+    db.session.commit()
+    comprovante.url = f"/reembolsos/{reembolso.num_prestacao}/comprovante"
+    return comprovante
+
+
+def test_if_none_match_com_o_hash_responde_304(app, comprovante):
+    resposta = app.test_client().get(comprovante.url, headers={"If-None-Match": f'"{HASH}"'})
+
+    assert resposta.status_code == 304
+    assert resposta.data == b""
+    assert resposta.headers["ETag"] == f'"{HASH}"'
+    assert "private" in resposta.headers["Cache-Control"]
+
+
+def test_range_responde_206_com_o_trecho(app, comprovante):
+    resposta = app.test_client().get(comprovante.url, headers={"Range": "bytes=0-9"})
+
+    assert resposta.status_code == 206
+    assert resposta.data == CONTEUDO[:10]
+    assert resposta.headers["Content-Range"] == f"bytes 0-9/{len(CONTEUDO)}"
+
+
+def test_x_accel_redirect_deixa_o_envio_com_o_nginx(app, comprovante):
+    app.config["COMPROVANTE_X_ACCEL_PREFIXO"] = "/protegido/"
+    cliente = app.test_client()
+
+    resposta = cliente.get(comprovante.url)
+    revalidacao = cliente.get(comprovante.url, headers={"If-None-Match": f'"{HASH}"'})
+
+    assert resposta.status_code == 200 and resposta.data == b""
+    assert resposta.headers["X-Accel-Redirect"] == f"/protegido/{comprovante.nome_arquivo}"
+    assert resposta.headers["Content-Type"] == "application/pdf"
+    assert revalidacao.status_code == 304
+    assert "X-Accel-Redirect" not in revalidacao.headers
@@ -0,0 +1,69 @@
+import threading
+import time
+import pytest
+from src.controler import analise_ia_controller
+from src.model import db
+from src.model.comprovante_model import Comprovante
+from src.model.reembolso_model import Reembolso
+from src.utils import fila_analise_ia
+
+
+@pytest.fixture
+def num_prestacao(app, tmp_path, monkeypatch):
+    monkeypatch.setattr(analise_ia_controller, "analisar_comprovante_gemini_vision", lambda *args, **kwargs: {
+        "dados_extraidos": {"valor_total": 50.0},
+        "validacoes": {"valor_corresponde": True, "comprovante_legivel": True},
+        "sinais_fraude": {}
+    })
+    reembolso = Reembolso(colaborador="Ana", empresa="Sispar", tipo_reembolso="Alimentação",
+                          centro_custo="TI", valor_faturado=50, despesa=50)
+    db.session.add(reembolso)
+    db.session.flush()
+    (tmp_path / "a.png").write_bytes(b"imagem")
+    db.session.add(Comprovante(nome_arquivo="a.png", texto_extraido="", reembolso_id=reembolso.num_prestacao,
+                               hash_arquivo="ab" * 32))
+    db.session.commit()
+    return reembolso.num_prestacao
+
+
+def test_fila_limita_pendentes_e_libera_ao_terminar():
+    liberar = threading.Event()
+    concluidas = []
+
+    def analise(numero):
+        liberar.wait(5)
+        concluidas.append(numero)
+
+    assert fila_analise_ia.enfileirar_analise(analise, 1, max_workers=1, fila_maxima=2)
+    assert fila_analise_ia.enfileirar_analise(analise, 2, max_workers=1, fila_maxima=2)
+    assert not fila_analise_ia.enfileirar_analise(analise, 3, max_workers=1, fila_maxima=2)
+    assert fila_analise_ia.estado_fila()['pendentes'] == 2
+
+    liberar.set()
+    fila_analise_ia._executor.shutdown(wait=True)
+    fila_analise_ia._executor = None
+
+    assert concluidas == [1, 2]
+    assert fila_analise_ia.estado_fila() == {'pendentes': 0, 'em_execucao': 0, 'aguardando': 0}
+
+
+def test_analise_sem_modo_continua_sincrona(app, num_prestacao):
+    resposta = app.test_client().post(f"/reembolsos/{num_prestacao}/analisar-ia")
+
+    assert resposta.status_code == 200
+    assert resposta.get_json()["score_confiabilidade"] == 100
+
+
+def test_modo_assincrono_responde_202_e_conclui_a_tarefa(app, num_prestacao):
+    cliente = app.test_client()
+    resposta = cliente.post(f"/reembolsos/{num_prestacao}/analisar-ia?modo=assincrono")
+    assert resposta.status_code == 202
+
+    for _ in range(50):
+        status = cliente.get(resposta.get_json()["status_url"]).get_json()
+        if status["status"] in ("Concluída", "Erro"):
+            break
+        time.sleep(0.1)
+
+    assert status["status"] == "Concluída"
+    assert status["resultado"]["score_confiabilidade"] == 100
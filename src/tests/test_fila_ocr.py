@@ -0,0 +1,72 @@
+import io
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+from PIL import Image
+from src.model import db
+from src.model.tarefa_model import Tarefa
+from src.utils import fila_ocr
+
+
+def _ocr_lento(caminho_arquivo, conteudo=None):
+    time.sleep(0.5)
+    return {"texto": "TOTAL R$ 10,00", "valor_extraido": Decimal("10.00"), "valores_encontrados": [Decimal("10.00")]}
+
+
+def _ocr_com_falha(caminho_arquivo, conteudo=None):
+    raise RuntimeError("tesseract falhou")
+
+
+def _enviar_e_acompanhar(app, reembolso):
+    imagem = io.BytesIO()
+    Image.new("RGB", (200, 100), "white").save(imagem, "PNG")
+    imagem.seek(0)
+
+    cliente = app.test_client()
+    resposta = cliente.post("/ocr/", data={"file": (imagem, "cupom.png"), "reembolso_id": reembolso.num_prestacao,
+                                           "modo": "assincrono"})
+    assert resposta.status_code == 202
+
+    vistos = []
+    for _ in range(100):
+        tarefa = cliente.get(resposta.get_json()["status_url"]).get_json()
+        if not vistos or vistos[-1] != tarefa["status"]:
+            vistos.append(tarefa["status"])
+        if tarefa["status"] in ("Concluída", "Erro"):
+            break
+        time.sleep(0.05)
+    return tarefa, vistos
+
+
+def test_tarefa_passa_por_processando_e_conclui(app, reembolso, monkeypatch):
+    monkeypatch.setattr(fila_ocr, "processar_arquivo", _ocr_lento)
+
+    tarefa, vistos = _enviar_e_acompanhar(app, reembolso)
+
+    assert vistos[-2:] == ["Processando", "Concluída"]
+    assert tarefa["comprovante_id"] is not None and tarefa["data_inicio"] is not None
+
+
+def test_falha_no_ocr_marca_a_tarefa_com_erro(app, reembolso, monkeypatch):
+    monkeypatch.setattr(fila_ocr, "processar_arquivo", _ocr_com_falha)
+
+    tarefa, _ = _enviar_e_acompanhar(app, reembolso)
+
+    assert tarefa["status"] == "Erro"
+    assert "tesseract falhou" in tarefa["erro"]
+
+
+def test_tarefa_perdida_expira_com_erro_e_libera_o_arquivo(app, reembolso, tmp_path):
+    (tmp_path / "perdido.png").write_bytes(b"cupom")
+    tarefa = Tarefa(reembolso_id=reembolso.num_prestacao, nome_arquivo="perdido.png")
+    tarefa.status = "Processando"
+    tarefa.data_criacao = datetime.utcnow() - timedelta(seconds=app.config["OCR_TAREFA_EXPIRACAO"] + 1)
+    recente = Tarefa(reembolso_id=reembolso.num_prestacao, nome_arquivo="recente.png")
+    db.session.add_all([tarefa, recente])
+    db.session.commit()
+
+    resposta = app.test_client().get(f"/ocr/tarefas/{tarefa.id}").get_json()
+
+    assert resposta["status"] == "Erro" and "expirada" in resposta["erro"]
+    assert db.session.get(Tarefa, recente.id).status == "Na fila"
+    assert not (tmp_path / "perdido.png").exists()
@@ -0,0 +1,115 @@
+"""Proteções de memória na abertura das imagens (pico de RSS medido em subprocesso)"""
+import json
+import os
+import struct
+import subprocess
+import sys
+import zlib
+import pytest
+from PIL import Image
+from src.utils.ocr_reader import verificar_imagem, ImagemMuitoGrande
+
+pytest.importorskip("resource")
+if not os.path.exists("/proc/self/status"):
+    pytest.skip("Pico de RSS lido de /proc (Linux)", allow_module_level=True)
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Padrão do Pillow (PIL/Image.py)
+PILLOW_MAX_IMAGE_PIXELS = int(1024 * 1024 * 1024 // 4 // 3)
+
+# Pico de RSS (VmHWM) antes e depois do trecho, num processo novo: o ru_maxrss
+# do filho começa com o RSS do pytest (herdado no fork), o VmHWM não
+MEDIR = """
+import json, sys
+sys.path.insert(0, {raiz!r})
+from src.utils import ocr_reader
+
+def pico_kb():
+    with open('/proc/self/status') as status:
+        return next(int(l.split()[1]) for l in status if l.startswith('VmHWM'))
+
+antes = pico_kb()
+saida = {{}}
+try:
+{trecho}
+except Exception as e:
+    saida['erro'] = type(e).__name__
+saida['pico_mb'] = (pico_kb() - antes) / 1024
+print(json.dumps(saida))
+"""
+
+
+def _medir(trecho):
+    codigo = MEDIR.format(raiz=RAIZ, trecho="\n".join("    " + linha for linha in trecho.strip().splitlines()))
+    resultado = subprocess.run([sys.executable, "-c", codigo], capture_output=True, text=True, timeout=120)
+    assert resultado.returncode == 0, resultado.stderr
+    return json.loads(resultado.stdout.strip().splitlines()[-1])
+
+
+@pytest.fixture(scope="module")
+def foto_grande(tmp_path_factory):
+    """JPEG de 24 MP (72 MB decodificado em RGB)"""
+    caminho = tmp_path_factory.mktemp("imagens") / "foto.jpg"
+    Image.new("RGB", (4000, 6000), (200, 200, 200)).save(caminho, quality=80)
+    return str(caminho)
+
+
+def test_jpeg_grande_decodificado_reduzido(foto_grande):
+    inteira = _medir(f"""
+with ocr_reader.Image.open({foto_grande!r}) as imagem:
+    imagem.load()
+""")
+    protegida = _medir(f"""
+with ocr_reader.abrir_imagem({foto_grande!r}, altura_maxima=1200, modo='L') as imagem:
+    saida['tamanho'] = imagem.size
+""")
+
+    assert inteira["pico_mb"] > 50
+    assert protegida["pico_mb"] < 15
+    assert protegida["tamanho"] == [1000, 1500]
+
+
+def _cabecalho_png(caminho, largura, altura):
+    """PNG só com o cabeçalho (sem pixels): a imagem "declara" o tamanho"""
+    ihdr = struct.pack(">IIBBBBB", largura, altura, 8, 2, 0, 0, 0)
+    png = b"\x89PNG\r\n\x1a\n" + struct.pack(">I", len(ihdr)) + b"IHDR" + ihdr
+    png += struct.pack(">I", zlib.crc32(b"IHDR" + ihdr))
+    png += struct.pack(">I", 0) + b"IEND" + struct.pack(">I", zlib.crc32(b"IEND"))
+    caminho.write_bytes(png)
+    return str(caminho)
+
+
+@pytest.mark.filterwarnings("ignore::PIL.Image.DecompressionBombWarning")
+def test_imagem_gigante_recusada_pelo_cabecalho(tmp_path):
+    # 900 MP: o Pillow já recusa (bomba de descompressão)
+    bomba = _cabecalho_png(tmp_path / "bomba.png", 30000, 30000)
+    resultado = _medir(f"""
+ocr_reader.abrir_imagem({bomba!r})
+""")
+    assert resultado["erro"] == "ImagemMuitoGrande"
+    assert resultado["pico_mb"] < 5
+
+    # 70 MP: abaixo do limite do Pillow, acima do OCR_IMAGEM_MAX_PIXELS
+    with pytest.raises(ImagemMuitoGrande):
+        verificar_imagem(_cabecalho_png(tmp_path / "grande.png", 10000, 7000))
+    assert verificar_imagem(_cabecalho_png(tmp_path / "normal.png", 3000, 4000)) == (3000, 4000)
+
+
+def test_limite_de_pixels_nao_altera_o_pillow_global(tmp_path):
+    # 20 MP passa pelo Pillow, mas não por um limite local menor
+    caminho = _cabecalho_png(tmp_path / "media.png", 5000, 4000)
+
+    with pytest.raises(ImagemMuitoGrande):
+        verificar_imagem(caminho, max_pixels=10_000_000)
+    assert Image.MAX_IMAGE_PIXELS == PILLOW_MAX_IMAGE_PIXELS
+
+
+def test_orcamento_de_memoria_do_processo():
+    resultado = _medir("""
+saida['limite'] = ocr_reader.limitar_memoria_processo(64)
+bloco = bytearray(256 * 1024 * 1024)
+""")
+    assert resultado["limite"]
+    assert resultado["erro"] == "MemoryError"
+    assert resultado["pico_mb"] < 64
@@ -0,0 +1,41 @@
+import pytest
+from PIL import Image
+from src.utils import armazenamento, miniaturas
+
+
+@pytest.fixture
+def backend_local(tmp_path, monkeypatch):
+    armazenamento.definir_backend(armazenamento.ArmazenamentoLocal(str(tmp_path / "arquivos")))
+    monkeypatch.setattr(miniaturas, "DIRETORIO_MINIATURAS", str(tmp_path / "miniaturas"))
+    yield tmp_path
+    armazenamento.definir_backend(None)
+
+
+def test_miniatura_webp_no_tamanho_pedido_e_reaproveitada(backend_local):
+    origem = backend_local / "arquivos" / "ab" / "cd" / "abcd.png"
+    origem.parent.mkdir(parents=True)
+    Image.new("RGBA", (1200, 800), (255, 0, 0, 255)).save(origem)
+
+    caminho = miniaturas.gerar_miniatura("ab/cd/abcd.png", "p")
+    with Image.open(caminho) as imagem:
+        assert imagem.format == "WEBP"
+        assert imagem.size == (160, 107)
+
+    assert miniaturas.gerar_miniatura("ab/cd/abcd.png", "p") == caminho
+    miniaturas.remover_miniaturas("ab/cd/abcd.png")
+    assert not (backend_local / "miniaturas" / "ab" / "cd" / "abcd.png_160.webp").exists()
+
+
+def test_miniatura_de_arquivo_inexistente(backend_local):
+    assert miniaturas.gerar_miniatura("ab/cd/nada.png", "m") is None
+
+
+def test_miniatura_respeita_a_orientacao_do_exif(backend_local):
+    origem = backend_local / "arquivos" / "ef" / "01" / "ef01.jpg"
+    origem.parent.mkdir(parents=True)
+    exif = Image.Exif()
+    exif[0x0112] = 6  # Foto de celular em pé: girar 90°
+    Image.new("RGB", (1200, 800), "white").save(origem, exif=exif)
+
+    with Image.open(miniaturas.gerar_miniatura("ef/01/ef01.jpg", "p")) as imagem:
+        assert imagem.size == (107, 160)
@@ -0,0 +1,103 @@
+import hashlib
+import io
+from datetime import datetime
+from decimal import Decimal
+from PIL import Image
+from src.controler import ocr_controller
+from src.model import db
+from src.model.comprovante_model import Comprovante
+from src.utils import armazenamento, fila_ocr
+
+RESULTADO_OCR = {"texto": "TOTAL R$ 10,00", "valor_extraido": Decimal("10.00"), "valores_encontrados": [Decimal("10.00")]}
+
+
+def _ocr_falha_na_imagem_preta(caminho_arquivo, conteudo=None):
+    with Image.open(caminho_arquivo) as imagem:
+        if imagem.getpixel((0, 0)) == (0, 0, 0):
+            raise RuntimeError("tesseract falhou")
+    return RESULTADO_OCR
+
+
+def _imagem(cor="white"):
+    imagem = io.BytesIO()
+    Image.new("RGB", (200, 100), cor).save(imagem, "PNG")
+    imagem.seek(0)
+    return imagem
+
+
+def _criar_comprovantes(reembolso, datas):
+    for indice, data in enumerate(datas):
+        comprovante = Comprovante(nome_arquivo=f"{indice}.png", texto_extraido="TOTAL 10,00", reembolso_id=reembolso.num_prestacao)
+        comprovante.data_criacao = data
+        db.session.add(comprovante)
+    db.session.commit()
+
+
+def test_listagem_responde_array_e_cursor_no_cabecalho(app, reembolso):
+    _criar_comprovantes(reembolso, [datetime(2025, 1, dia) for dia in range(1, 4)])
+    cliente = app.test_client()
+
+    primeira = cliente.get("/ocr/?limit=2")
+    segunda = cliente.get(f"/ocr/?limit=2&cursor={primeira.headers['X-Proximo-Cursor']}")
+
+    assert isinstance(primeira.get_json(), list)
+    assert [c["nome_arquivo"] for c in primeira.get_json()] == ["2.png", "1.png"]
+    assert 'rel="next"' in primeira.headers["Link"]
+    assert [c["nome_arquivo"] for c in segunda.get_json()] == ["0.png"]
+    assert "X-Proximo-Cursor" not in segunda.headers
+
+
+def test_cursor_estavel_com_data_criacao_empatada(app, reembolso):
+    mesmo_instante = datetime(2025, 3, 1, 12, 0, 0)
+    _criar_comprovantes(reembolso, [mesmo_instante] * 5 + [datetime(2025, 2, 1)])
+    cliente = app.test_client()
+
+    ids, cursor = [], ""
+    while True:
+        resposta = cliente.get(f"/ocr/?limit=2{cursor}")
+        ids += [c["id"] for c in resposta.get_json()]
+        if "X-Proximo-Cursor" not in resposta.headers:
+            break
+        cursor = f"&cursor={resposta.headers['X-Proximo-Cursor']}"
+
+    # Empates desfeitos pelo id: nenhum comprovante repetido ou pulado entre as páginas
+    empatados = [c.id for c in Comprovante.query.filter_by(data_criacao=mesmo_instante)]
+    assert ids == sorted(empatados, reverse=True) + [c.id for c in Comprovante.query.filter(Comprovante.data_criacao < mesmo_instante)]
+
+
+def test_mesmo_arquivo_reaproveita_o_ocr_e_cria_outro_comprovante(app, reembolso, monkeypatch):
+    chamadas = []
+    monkeypatch.setattr(ocr_controller, "processar_arquivo", lambda caminho, conteudo=None: chamadas.append(caminho) or RESULTADO_OCR)
+    cliente = app.test_client()
+    conteudo = _imagem().getvalue()
+
+    primeira = cliente.post("/ocr/", data={"file": (io.BytesIO(conteudo), "cupom.png"), "reembolso_id": reembolso.num_prestacao})
+    segunda = cliente.post("/ocr/", data={"file": (io.BytesIO(conteudo), "copia.png"), "reembolso_id": reembolso.num_prestacao})
+
+    assert primeira.status_code == segunda.status_code == 201
+    assert len(chamadas) == 1
+    assert primeira.get_json()["cache_ocr"] is False and segunda.get_json()["cache_ocr"] is True
+    comprovantes = Comprovante.query.order_by(Comprovante.id).all()
+    assert len(comprovantes) == 2
+    assert comprovantes[1].id == segunda.get_json()["comprovante"]["id"]
+    assert comprovantes[1].nome_arquivo == comprovantes[0].nome_arquivo
+    assert comprovantes[1].valor_extraido == Decimal("10.00") and comprovantes[1].nivel_ocr == "cache"
+
+
+def test_lote_grava_os_arquivos_que_passaram_quando_um_falha(app, reembolso, tmp_path, monkeypatch):
+    monkeypatch.setattr(fila_ocr, "processar_arquivo", _ocr_falha_na_imagem_preta)
+
+    resposta = app.test_client().post("/ocr/lote", data={
+        "files": [(_imagem(), "a.png"), (_imagem("black"), "falha.png"), (_imagem("red"), "b.png")],
+        "reembolso_id": reembolso.num_prestacao
+    })
+
+    corpo = resposta.get_json()
+    assert resposta.status_code == 201
+    assert corpo["mensagem"] == "2 de 3 comprovantes processados."
+    assert [("comprovante" in r, "erro" in r) for r in corpo["resultados"]] == [(True, False), (False, True), (True, False)]
+    assert "tesseract falhou" in corpo["resultados"][1]["erro"]
+    assert Comprovante.query.count() == 2
+    # O arquivo que falhou não fica no armazenamento sem comprovante
+    chave_falha = armazenamento.chave_arquivo(hashlib.sha256(_imagem("black").getvalue()).hexdigest(), ".png")
+    assert not (tmp_path / chave_falha).exists()
@@ -0,0 +1,241 @@
+import io
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from decimal import Decimal
+import pytest
+from PIL import Image, ImageDraw
+from src.utils.ocr_reader import analisar_valores_monetarios, extrair_valores_monetarios, encontrar_maior_valor, _agrupar_janelas
+from src.utils import ocr_reader
+
+
+def test_valores_em_ordem_sem_duplicar_trecho():
+    texto = "CAFE R$ 5,50\nPAO 1.234,56\nTOTAL R$ 1.240,06"
+    assert extrair_valores_monetarios(texto) == [Decimal("5.50"), Decimal("1234.56"), Decimal("1240.06")]
+
+
+def test_total_tem_prioridade_sobre_valor_maior():
+    texto = "TOTAL R$ 45,90\nDINHEIRO 100,00\nTROCO R$ 54,10"
+    analise = analisar_valores_monetarios(texto)
+    assert analise['valor_total'] == Decimal("45.90")
+    assert analise['candidatos'][0]['palavra_chave'] == 'total'
+    assert analise['candidatos'][0]['linha'] == 1
+
+
+def test_palavra_mais_proxima_define_o_papel():
+    texto = "VALOR TOTAL 80,00\nVALOR APROXIMADO DOS TRIBUTOS R$ 120,00"
+    analise = analisar_valores_monetarios(texto)
+    assert analise['valor_total'] == Decimal("80.00")
+    tributos = [c for c in analise['candidatos'] if c['valor'] == Decimal("120.00")][0]
+    assert tributos['palavra_chave'] == 'tributos'
+    assert tributos['linha'] == 2
+
+
+def test_sem_palavra_chave_escolhe_o_maior():
+    texto = "ITEM A 10,00\nITEM B 32,50\n"
+    assert analisar_valores_monetarios(texto)['valor_total'] == Decimal("32.50")
+    assert encontrar_maior_valor(texto) == Decimal("32.50")
+
+
+def test_ignora_numeros_colados_em_texto():
+    texto = "ALIQ 12,00% COD123,45 R$ 9,90"
+    assert extrair_valores_monetarios(texto) == [Decimal("9.90")]
+
+
+def test_texto_vazio():
+    analise = analisar_valores_monetarios("")
+    assert analise == {'valores': [], 'candidatos': [], 'valor_total': None}
+
+
+def test_limite_de_candidatos_mantem_o_ranking():
+    texto = "\n".join(f"ITEM {i} {i},00" for i in range(1, 30)) + "\nTOTAL 5,00"
+    analise = analisar_valores_monetarios(texto, limite_candidatos=3)
+    assert len(analise['valores']) == 30
+    assert [c['valor'] for c in analise['candidatos']] == [Decimal("5.00"), Decimal("29.00"), Decimal("28.00")]
+
+
+def test_paginas_sem_texto_agrupadas_em_janelas_consecutivas():
+    assert _agrupar_janelas([1, 2, 3, 5], 2) == [(1, 2), (3, 3), (5, 5)]
+    assert _agrupar_janelas([2, 3, 4, 7, 8], 3) == [(2, 4), (7, 8)]
+    assert _agrupar_janelas([], 4) == []
+
+
+def test_nivel_completo_so_quando_o_rapido_nao_acha_valor(monkeypatch):
+    textos = {'rapido': "CUPOM ILEGIVEL", 'completo': "TOTAL R$ 12,34"}
+    chamados = []
+
+    def extrair(caminho, nivel, opcoes, backend, tempos, paginas, conteudo=None, palavras=None):
+        chamados.append(nivel)
+        return textos[nivel]
+
+    monkeypatch.setattr(ocr_reader, '_extrair_texto', extrair)
+    resultado = ocr_reader.processar_arquivo("recibo.jpg", escalonar=True)
+    assert chamados == ['rapido', 'completo']
+    assert resultado['nivel_ocr'] == 'completo'
+    assert resultado['valor_extraido'] == Decimal("12.34")
+    assert set(resultado['tempos_ms']['niveis']) == {'rapido', 'completo'}
+
+    textos['rapido'] = "TOTAL R$ 12,34"
+    chamados.clear()
+    assert ocr_reader.processar_arquivo("recibo.jpg", escalonar=True)['nivel_ocr'] == 'rapido'
+    assert chamados == ['rapido']
+
+
+def test_texto_igual_com_e_sem_palavras(monkeypatch):
+    texto_tesseract = "CUPOM FISCAL\n\nTOTAL    R$ 12,34\n"
+    dados = {
+        'text': ['TOTAL', 'R$', '12,34'], 'conf': [95, 90, 88],
+        'left': [10, 80, 120], 'top': [50, 50, 50], 'width': [60, 30, 50], 'height': [20, 20, 20],
+        'page_num': [1, 1, 1], 'block_num': [1, 1, 1], 'par_num': [1, 1, 1], 'line_num': [1, 1, 1]
+    }
+    monkeypatch.setattr(ocr_reader.pytesseract, 'image_to_string', lambda imagem, lang=None, config='': texto_tesseract)
+    monkeypatch.setattr(ocr_reader.pytesseract, 'image_to_data', lambda imagem, lang=None, config='', output_type=None: dados)
+
+    palavras = []
+    assert ocr_reader.reconhecer_texto("recibo.png", 'pytesseract') == texto_tesseract
+    assert ocr_reader.reconhecer_texto("recibo.png", 'pytesseract', palavras=palavras) == texto_tesseract
+    assert [p[0] for p in palavras] == ['TOTAL', 'R$', '12,34']
+
+
+def test_pdf_so_faz_ocr_das_paginas_sem_texto_ate_o_limite(monkeypatch):
+    renderizadas = []
+
+    def ocr_janela(caminho, primeira, ultima, dpi, backend, com_palavras):
+        renderizadas.append((primeira, ultima))
+        return [(f"OCR {n}", None) for n in range(primeira, ultima + 1)]
+
+    monkeypatch.setattr(ocr_reader, 'pdfinfo_from_path', lambda caminho, first_page, last_page: {'Pages': 6})
+    camada = ["", "", "TEXTO EMBUTIDO DA NOTA FISCAL 0001", "", "", ""]
+    monkeypatch.setattr(ocr_reader, 'extrair_camada_texto_pdf', lambda caminho, max_paginas: camada[:max_paginas])
+    monkeypatch.setattr(ocr_reader, '_ocr_paginas_pdf', ocr_janela)
+
+    paginas = []
+    texto = ocr_reader.extrair_texto_pdf("nota.pdf", workers=1, max_paginas=4, janela=2, paginas=paginas)
+
+    # Página 3 vem da camada de texto; 5 e 6 passam do limite e não são renderizadas
+    assert renderizadas == [(1, 2), (4, 4)]
+    assert [p['origem'] for p in paginas] == ['ocr', 'ocr', 'texto', 'ocr']
+    assert texto.index("OCR 2") < texto.index("TEXTO EMBUTIDO") < texto.index("OCR 4")
+    assert "Páginas 5 a 6 não processadas" in texto
+
+
+def _ocr_janela_fora_de_ordem(caminho, primeira, ultima, dpi, backend, com_palavras):
+    """Roda nos processos do pool: as primeiras janelas terminam por último"""
+    time.sleep((6 - primeira) * 0.05)
+    return [(f"OCR {n} pid {os.getpid()}", None) for n in range(primeira, ultima + 1)]
+
+
+def _pdf_em_paralelo():
+    return ocr_reader.extrair_texto_pdf("nota.pdf", workers=2, janela=1, usar_camada_texto=False)
+
+
+@pytest.fixture
+def pdf_de_cinco_paginas(monkeypatch):
+    monkeypatch.setattr(ocr_reader, 'pdfinfo_from_path', lambda caminho, first_page, last_page: {'Pages': 5})
+    monkeypatch.setattr(ocr_reader, '_dpi_limitado', lambda info, dpi, max_pixels: dpi)
+    monkeypatch.setattr(ocr_reader, '_ocr_paginas_pdf', _ocr_janela_fora_de_ordem)
+
+
+def _paginas_em_ordem(texto):
+    numeros = [int(trecho.split()[0]) for trecho in texto.split("OCR ")[1:]]
+    pids = {int(trecho.split("pid ")[1].split()[0]) for trecho in texto.split("OCR ")[1:]}
+    return numeros, pids
+
+
+def test_pdf_em_paralelo_remonta_o_texto_na_ordem_das_paginas(pdf_de_cinco_paginas):
+    numeros, pids = _paginas_em_ordem(_pdf_em_paralelo())
+
+    assert numeros == [1, 2, 3, 4, 5]
+    assert os.getpid() not in pids
+
+
+def test_pdf_em_paralelo_dentro_de_um_processo_da_fila_de_ocr(pdf_de_cinco_paginas):
+    # Cada processo da fila de OCR abre o seu próprio pool de páginas
+    with ProcessPoolExecutor(max_workers=1) as fila:
+        texto = fila.submit(_pdf_em_paralelo).result(timeout=30)
+
+    numeros, _ = _paginas_em_ordem(texto)
+    assert numeros == [1, 2, 3, 4, 5]
+
+
+# Pré-processamento: só a etapa testada ligada
+DESLIGADO = {"ativo": True, "rotacao_exif": False, "escala_cinza": False, "dpi_alvo": 0, "altura_maxima": 0,
+             "binarizar": False}
+
+
+def _foto_em_pe(tamanho=(300, 100)):
+    """JPEG gravado deitado com EXIF Orientation=6 (celular em pé)"""
+    exif = Image.Exif()
+    exif[0x0112] = 6
+    arquivo = io.BytesIO()
+    Image.new("RGB", tamanho, "white").save(arquivo, "JPEG", exif=exif)
+    arquivo.seek(0)
+    return Image.open(arquivo)
+
+
+def _cupom():
+    """Texto escuro sobre um fundo em degradê (sombra da foto)"""
+    imagem = Image.new("L", (200, 100))
+    imagem.putdata([120 + x // 4 for _ in range(100) for x in range(200)])
+    ImageDraw.Draw(imagem).rectangle((40, 40, 160, 60), fill=20)
+    return imagem
+
+
+def test_preprocessamento_aplica_a_orientacao_exif():
+    with _foto_em_pe() as foto:
+        processada, tempos = ocr_reader.preprocessar_imagem(foto, {**DESLIGADO, "rotacao_exif": True})
+
+    assert processada.size == (100, 300)
+    assert "rotacao_exif" in tempos
+
+
+@pytest.mark.parametrize("altura_maxima, tamanho", [
+    (2400, (500, 1500)),  # 300/600 dpi = 0,5 é menor que 2400/3000 = 0,8
+    (1200, (400, 1200)),  # 1200/3000 = 0,4 é menor que 0,5
+])
+def test_redimensiona_pelo_menor_fator_entre_dpi_e_altura(altura_maxima, tamanho):
+    imagem = Image.new("L", (1000, 3000), 255)
+    imagem.info["dpi"] = (600, 600)
+
+    processada, _ = ocr_reader.preprocessar_imagem(imagem, {**DESLIGADO, "dpi_alvo": 300, "altura_maxima": altura_maxima})
+
+    assert processada.size == tamanho
+
+
+def test_preprocessamento_desligado_devolve_a_mesma_imagem():
+    with _foto_em_pe() as foto:
+        assert ocr_reader.preprocessar_imagem(foto, {"ativo": False}) == (foto, {})
+        processada, tempos = ocr_reader.preprocessar_imagem(foto, DESLIGADO)
+        assert processada is foto and tempos == {}
+
+
+@pytest.mark.parametrize("etapa, desligar", [
+    ("rotacao_exif", {"rotacao_exif": False}),
+    ("escala_cinza", {"escala_cinza": False, "binarizar": False}),
+    ("redimensionar", {"dpi_alvo": 0, "altura_maxima": 0}),
+    ("binarizar", {"binarizar": False}),
+])
+def test_cada_etapa_desligada_nao_altera_a_imagem(etapa, desligar):
+    tudo_ligado = {"ativo": True, "rotacao_exif": True, "escala_cinza": True, "dpi_alvo": 300, "altura_maxima": 150,
+                   "binarizar": True}
+    with _foto_em_pe((400, 200)) as foto:
+        processada, tempos = ocr_reader.preprocessar_imagem(foto, {**tudo_ligado, **desligar})
+
+    assert etapa not in tempos
+    if etapa == "rotacao_exif":
+        assert processada.width > processada.height
+    elif etapa == "escala_cinza":
+        assert processada.mode == "RGB"
+    elif etapa == "redimensionar":
+        assert processada.size == (200, 400)
+    else:
+        assert processada.mode == "L" and set(processada.getdata()) != {0, 255}
+
+
+def test_binarizacao_devolve_so_preto_e_branco():
+    processada, _ = ocr_reader.preprocessar_imagem(_cupom(), {**DESLIGADO, "binarizar": True})
+
+    assert processada.mode == "L"
+    assert set(processada.getdata()) == {0, 255}
+    # O texto fica preto e o degradê do fundo, branco
+    assert processada.getpixel((100, 50)) == 0 and processada.getpixel((10, 10)) == 255
@@ -0,0 +1,142 @@
+import threading
+from types import SimpleNamespace
+import pytest
+from PIL import Image, ImageDraw, ImageFont
+from src.utils import ocr_reader
+from src.utils.palavras_ocr import palavras_de_image_to_data
+
+# (texto, bloco, parágrafo, linha, x, y, largura, altura, confiança); a linha 2 só tem uma palavra vazia
+PALAVRAS = [
+    ("MERCADO", 1, 1, 1, 10, 5, 90, 20, 96.4),
+    ("SOL", 1, 1, 1, 110, 5, 40, 20, 91.0),
+    ("", 1, 1, 2, 10, 30, 5, 20, -1),
+    ("TOTAL", 2, 1, 1, 10, 80, 60, 20, 88.26),
+    ("10,00", 2, 1, 1, 80, 80, 50, 20, 35.0),
+    ("OBRIGADO", 2, 2, 1, 10, 120, 100, 20, 72.5),
+]
+
+
+class _Palavra:
+    def __init__(self, texto, inicio_linha, x, y, largura, altura, confianca):
+        self.texto, self.inicio_linha = texto, inicio_linha
+        self.caixa = (x, y, x + largura, y + altura)
+        self.confianca = confianca
+
+    def GetUTF8Text(self, nivel):
+        return self.texto
+
+    def IsAtBeginningOf(self, nivel):
+        return nivel == "TEXTLINE" and self.inicio_linha
+
+    def BoundingBox(self, nivel):
+        return self.caixa
+
+    def Confidence(self, nivel):
+        return self.confianca
+
+
+class _ApiFalsa:
+    criadas = []
+
+    def __init__(self, lang):
+        self.modos = []
+        self.limpezas = 0
+        self.falhar = False
+        _ApiFalsa.criadas.append(self)
+
+    def SetPageSegMode(self, psm):
+        self.modos.append(psm)
+
+    def SetImage(self, imagem):
+        pass
+
+    def SetImageFile(self, caminho):
+        pass
+
+    def GetUTF8Text(self):
+        if self.falhar:
+            raise RuntimeError("tesseract falhou")
+        return "MERCADO SOL\n\nTOTAL 10,00\n\nOBRIGADO\n"
+
+    def GetIterator(self):
+        anterior = None
+        palavras = []
+        for texto, bloco, paragrafo, linha, x, y, largura, altura, confianca in PALAVRAS:
+            palavras.append(_Palavra(texto, (bloco, paragrafo, linha) != anterior, x, y, largura, altura, confianca))
+            anterior = (bloco, paragrafo, linha)
+        return palavras
+
+    def Clear(self):
+        self.limpezas += 1
+
+
+@pytest.fixture
+def tesserocr_falso(monkeypatch):
+    _ApiFalsa.criadas = []
+    modulo = SimpleNamespace(
+        PyTessBaseAPI=_ApiFalsa,
+        RIL=SimpleNamespace(WORD="WORD", TEXTLINE="TEXTLINE"),
+        PSM=SimpleNamespace(AUTO=3),
+        iterate_level=lambda iterador, nivel: iter(iterador)
+    )
+    monkeypatch.setattr(ocr_reader, "tesserocr", modulo)
+    monkeypatch.setattr(ocr_reader, "_motores", threading.local())
+    return modulo
+
+
+def _reconhecer(**kwargs):
+    return ocr_reader.reconhecer_texto(Image.new("L", (200, 150), 255), backend="tesserocr", **kwargs)
+
+
+def test_api_reaproveitada_no_processo_e_recriada_apos_o_fork(tesserocr_falso, monkeypatch):
+    _reconhecer()
+    _reconhecer()
+    assert len(_ApiFalsa.criadas) == 1
+
+    # Processo do pool herdou a API do pai: outro pid cria a sua
+    monkeypatch.setattr(ocr_reader.os, "getpid", lambda: -1)
+    _reconhecer()
+    assert len(_ApiFalsa.criadas) == 2
+
+
+def test_modo_de_pagina_redefinido_a_cada_chamada(tesserocr_falso):
+    _reconhecer(psm=6)
+    _reconhecer()
+
+    assert _ApiFalsa.criadas[0].modos == [6, 3]
+
+
+def test_clear_roda_mesmo_quando_o_ocr_falha(tesserocr_falso):
+    _reconhecer()
+    api = _ApiFalsa.criadas[0]
+    api.falhar = True
+
+    with pytest.raises(RuntimeError):
+        _reconhecer()
+    assert api.limpezas == 2
+
+
+def test_palavras_numeradas_como_no_image_to_data(tesserocr_falso):
+    dados = {"text": [], "page_num": [], "block_num": [], "par_num": [], "line_num": [],
+             "left": [], "top": [], "width": [], "height": [], "conf": []}
+    for texto, bloco, paragrafo, linha, x, y, largura, altura, confianca in PALAVRAS:
+        for chave, valor in zip(dados, (texto, 1, bloco, paragrafo, linha, x, y, largura, altura, confianca)):
+            dados[chave].append(valor)
+
+    palavras = []
+    _reconhecer(palavras=palavras)
+
+    assert palavras == palavras_de_image_to_data(dados)
+    assert [p[-1] for p in palavras] == [0, 0, 1, 1, 2]
+
+
+def test_backend_tesserocr_real():
+    pytest.importorskip("tesserocr")
+    imagem = Image.new("L", (600, 120), 255)
+    ImageDraw.Draw(imagem).text((20, 30), "TOTAL 10,00", fill=0, font=ImageFont.load_default(size=48))
+
+    palavras = []
+    texto = ocr_reader.reconhecer_texto(imagem, backend="tesserocr", palavras=palavras)
+
+    assert "TOTAL" in texto
+    assert "TOTAL" in [p[0] for p in palavras]
@@ -0,0 +1,44 @@
+from src.utils import palavras_ocr
+
+
+def _image_to_data(linhas):
+    """Saída de image_to_data (Output.DICT) para [(bloco, par, linha, texto, conf), ...]"""
+    dados = {chave: [] for chave in ('page_num', 'block_num', 'par_num', 'line_num', 'left', 'top', 'width',
+                                       'height', 'conf', 'text')}
+    for i, (bloco, par, linha, texto, conf) in enumerate(linhas):
+        for chave, valor in zip(dados, (1, bloco, par, linha, 10 * i, 20 * linha, 50, 18, conf, texto)):
+            dados[chave].append(valor)
+    return dados
+
+
+DADOS = _image_to_data([
+    (1, 1, 1, '', -1),
+    (1, 1, 1, 'CUPOM', 96), (1, 1, 1, 'FISCAL', 91),
+    (1, 1, 2, 'ALMOCO', 88), (1, 1, 2, '45,90', 90),
+    (2, 1, 1, 'TOTAL', 93), (2, 1, 1, 'R$', 40), (2, 1, 1, '45,90', 87),
+])
+
+
+def test_palavras_com_caixa_confianca_e_linha():
+    palavras = palavras_ocr.palavras_de_image_to_data(DADOS)
+
+    # A entrada vazia (nível de bloco) fica de fora; confiança -1 vira 0
+    assert [p[palavras_ocr.TEXTO] for p in palavras] == ['CUPOM', 'FISCAL', 'ALMOCO', '45,90', 'TOTAL', 'R$', '45,90']
+    assert [p[palavras_ocr.LINHA] for p in palavras] == [0, 0, 1, 1, 2, 2, 2]
+    assert palavras[0] == ['CUPOM', 10, 20, 50, 18, 96.0, 0]
+
+
+def test_estrutura_compacta_com_valor_e_legibilidade():
+    palavras = palavras_ocr.palavras_de_image_to_data(DADOS)
+    estrutura = palavras_ocr.carregar(palavras_ocr.serializar(
+        palavras_ocr.montar_estrutura([{'pagina': 1, 'largura': 800, 'altura': 1200, 'palavras': palavras}])
+    ))
+
+    local = palavras_ocr.localizar_valor(estrutura, 45.9)
+    assert local['linha'] == "TOTAL R$ 45,90"
+    assert local['caixa'] == [70, 20, 50, 18]
+
+    resumo = palavras_ocr.resumo_legibilidade(estrutura)
+    assert resumo['palavras'] == 7 and resumo['legivel'] is True
+    assert resumo['percentual_baixa_confianca'] == 14.3
+    assert palavras_ocr.localizar_valor(estrutura, 99.99) is None
@@ -0,0 +1,71 @@
+import io
+from types import SimpleNamespace
+from PIL import Image
+from src.controler import analise_ia_controller
+from src.utils import ia_utils
+
+
+def _foto(caminho, tamanho=(4000, 3000)):
+    # Ruído para o JPEG não comprimir como uma cor sólida
+    Image.effect_noise(tamanho, 60).convert("RGB").save(caminho, quality=92)
+    return str(caminho)
+
+
+def test_imagem_reduzida_e_recomprimida_em_jpeg(tmp_path):
+    caminho = _foto(tmp_path / "foto.jpg")
+
+    payload = ia_utils.preparar_imagem_vision(caminho, lado_maximo=1600)
+
+    assert payload["mime_type"] == "image/jpeg"
+    assert (payload["largura"], payload["altura"]) == (1600, 1200)
+    assert payload["bytes_enviados"] < payload["bytes_original"] / 3
+    with Image.open(io.BytesIO(payload["dados"])) as imagem:
+        assert imagem.format == "JPEG" and imagem.size == (1600, 1200)
+
+
+def test_png_com_paleta_convertido_e_foto_girada_pelo_exif(tmp_path):
+    paleta = str(tmp_path / "print.png")
+    Image.effect_noise((900, 600), 60).convert("P").save(paleta)
+    exif = Image.Exif()
+    exif[0x0112] = 6
+    em_pe = str(tmp_path / "em_pe.jpg")
+    Image.effect_noise((900, 600), 60).convert("RGB").save(em_pe, exif=exif)
+
+    convertido = ia_utils.preparar_imagem_vision(paleta, lado_maximo=300)
+    girado = ia_utils.preparar_imagem_vision(em_pe, lado_maximo=300)
+
+    assert (convertido["largura"], convertido["altura"]) == (300, 200)
+    assert convertido["mime_type"] in ("image/jpeg", "image/png")
+    assert (girado["largura"], girado["altura"]) == (200, 300)
+
+
+def test_acima_do_limite_de_bytes_vai_por_upload(tmp_path, monkeypatch):
+    caminho = _foto(tmp_path / "foto.jpg", (800, 600))
+    monkeypatch.setattr(ia_utils, "VISION_INLINE_MAX_BYTES", 1000)
+    assert ia_utils.preparar_imagem_vision(caminho) is None
+
+
+def test_vision_envia_a_imagem_na_requisicao_sem_upload(tmp_path, monkeypatch):
+    caminho = _foto(tmp_path / "foto.jpg")
+    enviados = []
+
+    class Modelo:
+        def __init__(self, nome):
+            pass
+
+        def generate_content(self, partes):
+            enviados.append(partes[1])
+            return SimpleNamespace(text='{"dados_extraidos": {}, "validacoes": {}, "sinais_fraude": {}}')
+
+    def upload(caminho_arquivo):
+        raise AssertionError("upload_file não deveria ser chamado")
+
+    monkeypatch.setattr(analise_ia_controller.genai, "upload_file", upload)
+    monkeypatch.setattr(analise_ia_controller.genai, "GenerativeModel", Modelo)
+    reembolso = SimpleNamespace(despesa="45.90", data=None, tipo_reembolso="Alimentação", descricao=None)
+
+    dados = analise_ia_controller.analisar_comprovante_gemini_vision(caminho, reembolso)
+
+    assert enviados[0]["mime_type"] == "image/jpeg"
+    assert dados["envio_vision"]["modo"] == "inline"
+    assert dados["envio_vision"]["bytes_enviados"] == len(enviados[0]["data"])
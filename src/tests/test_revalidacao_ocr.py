@@ -0,0 +1,64 @@
+from decimal import Decimal
+from src.model import db
+from src.model.comprovante_model import Comprovante
+from src.model.reembolso_model import Reembolso
+from src.controler.analise_ia_controller import analisar_sem_vision_api
+from src.utils import revalidacao_ocr, validacao_ocr
+from src.utils.revalidacao_ocr import revalidar_comprovantes
+
+
+def _criar(valor_faturado, valores_extraidos):
+    reembolso = Reembolso(colaborador="Ana", empresa="Sispar", tipo_reembolso="Alimentação",
+                          centro_custo="TI", valor_faturado=valor_faturado)
+    db.session.add(reembolso)
+    db.session.flush()
+    for valor in valores_extraidos:
+        db.session.add(Comprovante(nome_arquivo="a.png", texto_extraido="", reembolso_id=reembolso.num_prestacao,
+                                   valor_extraido=valor, status_validacao="Pendente"))
+    db.session.commit()
+    return reembolso
+
+
+def test_revalida_em_lotes_e_grava_so_o_que_mudou(app):
+    reembolso = _criar(100, [100, 104, 120, None])
+    outro = _criar(50, [50])
+
+    resultado = revalidar_comprovantes(reembolso_ids=[reembolso.num_prestacao], tamanho_lote=2)
+
+    assert resultado["processados"] == 4 and resultado["lotes"] == 2
+    assert resultado["alterados"] == 3
+    assert resultado["transicoes"] == {"Pendente -> Aprovado": 2, "Pendente -> Divergente": 1}
+    status = [c.status_validacao for c in Comprovante.query.order_by(Comprovante.id)]
+    assert status == ["Aprovado", "Aprovado", "Divergente", "Pendente", "Pendente"]
+    assert Comprovante.query.filter_by(reembolso_id=outro.num_prestacao).one().status_validacao == "Pendente"
+
+    # Nada mudou desde a última execução
+    assert revalidar_comprovantes(reembolso_ids=[reembolso.num_prestacao])["alterados"] == 0
+
+
+def test_simulacao_com_outra_tolerancia_nao_grava(app):
+    _criar(100, [104])
+    revalidar_comprovantes()
+
+    resultado = revalidar_comprovantes(tolerancia=3.0, simular=True)
+
+    assert resultado["transicoes"] == {"Aprovado -> Divergente": 1}
+    comprovante = Comprovante.query.one()
+    assert comprovante.status_validacao == "Aprovado"
+    assert comprovante.discrepancia_percentual == Decimal("4.00")
+
+
+def test_analise_sem_vision_usa_a_mesma_tolerancia_da_revalidacao(app, monkeypatch):
+    monkeypatch.setattr(validacao_ocr, "TOLERANCIA_PERCENTUAL", 3.0)
+    monkeypatch.setattr(revalidacao_ocr, "TOLERANCIA_PERCENTUAL", 3.0)
+    reembolso = _criar(100, [104])
+    reembolso.despesa = 100
+    db.session.commit()
+
+    revalidar_comprovantes()
+    comprovante = Comprovante.query.one()
+    validacoes = analisar_sem_vision_api(comprovante, reembolso)["validacoes"]
+
+    assert comprovante.status_validacao == "Divergente"
+    assert validacoes["valor_corresponde"] is False
+    assert validacoes["divergencia_percentual"] == 4.0
@@ -0,0 +1,66 @@
+import pytest
+from src.utils import roteamento_vision
+from src.utils.roteamento_vision import MODELO_VISION_COMPLETO, MODELO_VISION_RAPIDO
+
+LEGIVEL = {"dados_extraidos": {"valor_total": 45.9}, "validacoes": {"comprovante_legivel": True}, "sinais_fraude": {}}
+
+
+@pytest.fixture(autouse=True)
+def latencias_limpas(monkeypatch):
+    monkeypatch.setattr(roteamento_vision, "_latencias", {})
+    monkeypatch.setattr(roteamento_vision, "VISION_ROTEAMENTO", True)
+
+
+def _analisar(respostas, chamadas):
+    def analisar(modelo):
+        chamadas.append(modelo)
+        return respostas[modelo]
+    return analisar
+
+
+def test_score_alto_fica_no_modelo_rapido():
+    chamadas = []
+    dados, roteamento = roteamento_vision.analisar_com_roteamento(_analisar({MODELO_VISION_RAPIDO: LEGIVEL}, chamadas), lambda d: 95)
+
+    assert chamadas == [MODELO_VISION_RAPIDO]
+    assert dados is LEGIVEL
+    assert roteamento["rota"] == "rapido" and roteamento["modelo"] == MODELO_VISION_RAPIDO
+    assert roteamento["motivo_escalonamento"] is None
+
+
+@pytest.mark.parametrize("rapido, score, motivo", [
+    (LEGIVEL, 70, "score_limitrofe"),
+    ({"validacoes": {"comprovante_legivel": False}}, 95, "ilegivel"),
+    ({"erro": "Resposta da IA não está em formato JSON válido"}, 95, "resposta_invalida"),
+])
+def test_escalona_para_o_modelo_completo(rapido, score, motivo):
+    chamadas = []
+    completo = dict(LEGIVEL, observacoes="completo")
+    respostas = {MODELO_VISION_RAPIDO: rapido, MODELO_VISION_COMPLETO: completo}
+
+    dados, roteamento = roteamento_vision.analisar_com_roteamento(_analisar(respostas, chamadas), lambda d: score)
+
+    assert chamadas == [MODELO_VISION_RAPIDO, MODELO_VISION_COMPLETO]
+    assert dados is completo
+    assert roteamento["rota"] == "escalonado" and roteamento["modelo"] == MODELO_VISION_COMPLETO
+    assert roteamento["motivo_escalonamento"] == motivo
+
+
+def test_falha_do_completo_mantem_resposta_rapida_valida():
+    respostas = {MODELO_VISION_RAPIDO: LEGIVEL, MODELO_VISION_COMPLETO: {"erro": "quota"}}
+
+    dados, roteamento = roteamento_vision.analisar_com_roteamento(_analisar(respostas, []), lambda d: 70)
+
+    assert dados is LEGIVEL and roteamento["modelo"] == MODELO_VISION_RAPIDO
+
+
+def test_percentis_por_rota():
+    for ms in range(1, 101):
+        roteamento_vision.registrar_latencia("rapido", float(ms))
+    roteamento_vision.registrar_latencia("cache", 2.0)
+
+    estatisticas = roteamento_vision.estatisticas_latencia()
+
+    assert estatisticas["rapido"]["p50_ms"] == 50.0
+    assert estatisticas["rapido"]["p95_ms"] == 95.0
+    assert estatisticas["cache"]["analises"] == 1 and estatisticas["cache"]["p95_ms"] == 2.0
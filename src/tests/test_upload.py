@@ -0,0 +1,45 @@
+import hashlib
+import io
+import os
+import pytest
+from werkzeug.datastructures import FileStorage
+from src.utils.upload import salvar_upload, ArquivoMuitoGrande
+
+
+def test_hash_e_tamanho_calculados_na_escrita(tmp_path):
+    dados = os.urandom(3 * 1024 * 1024 + 7)
+    destino = tmp_path / "recibo.jpg"
+    upload = salvar_upload(FileStorage(io.BytesIO(dados), "recibo.jpg"), str(destino), limite_memoria=1024)
+
+    assert upload["hash_arquivo"] == hashlib.sha256(dados).hexdigest()
+    assert upload["tamanho"] == len(dados)
+    assert upload["conteudo"] is None
+    assert destino.read_bytes() == dados
+
+
+def test_arquivo_pequeno_fica_em_memoria(tmp_path):
+    upload = salvar_upload(FileStorage(io.BytesIO(b"cupom"), "a.png"), str(tmp_path / "a.png"))
+    assert upload["conteudo"] == b"cupom"
+
+
+def test_arquivo_acima_do_limite_e_removido(tmp_path):
+    destino = tmp_path / "grande.pdf"
+    with pytest.raises(ArquivoMuitoGrande):
+        salvar_upload(FileStorage(io.BytesIO(b"x" * 2048), "grande.pdf"), str(destino), tamanho_maximo=1024)
+    assert not destino.exists()
+
+
+@pytest.fixture
+def cliente(monkeypatch):
+    monkeypatch.setenv("FLASK_ENV", "testing")
+    from src.app import create_app
+    app = create_app()
+    app.config["MAX_CONTENT_LENGTH"] = 4096
+    return app.test_client()
+
+
+def test_requisicao_acima_do_max_content_length_responde_413(cliente):
+    resposta = cliente.post("/ocr/", data={"file": (io.BytesIO(b"x" * 8192), "grande.png"), "reembolso_id": "1"})
+
+    assert resposta.status_code == 413
+    assert "limite" in resposta.get_json()["erro"]
@@ -0,0 +1,255 @@
+"""
+Armazenamento dos arquivos de comprovantes endereçado pelo conteúdo
+
+Cada arquivo é gravado uma única vez, com o SHA-256 como nome, em dois
+níveis de prefixo (ab/cd/abcd...ef.jpg) para nenhuma pasta acumular
+centenas de milhares de entradas. O nome_arquivo gravado no banco é essa
+chave relativa; nomes antigos (uuid na raiz de temp/) continuam sendo
+resolvidos pela mesma camada.
+
+Backends (ARMAZENAMENTO_BACKEND):
+- local: pasta temp/ do container (padrão)
+- s3: bucket S3 ou compatível (MinIO), para rodar várias réplicas da API.
+  Os arquivos são enviados e baixados em streaming; o OCR e a IA, que
+  precisam de um arquivo em disco, usam uma cópia local em
+  temp/.cache_s3 (o conteúdo de uma chave nunca muda, então a cópia
+  nunca fica desatualizada)
+
+O mesmo arquivo pode ser referenciado por vários comprovantes, então só
+é apagado quando nenhuma linha aponta mais para ele
+"""
+import os
+import uuid
+from src.model.comprovante_model import Comprovante
+from src.model.tarefa_model import Tarefa
+
+# Backend opcional (pip install boto3)
+try:
+    import boto3
+    from botocore.exceptions import ClientError
+except ImportError:
+    boto3 = None
+    ClientError = Exception
+
+# Raiz local: arquivos do backend local, uploads em andamento e cache do S3 (Docker: /app/temp)
+DIRETORIO_ARQUIVOS = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'temp')
+
+
+def chave_arquivo(hash_arquivo, extensao):
+    """SHA-256 + extensão -> 'ab/cd/abcd...ef.jpg'"""
+    extensao = extensao.lower()
+    return f"{hash_arquivo[:2]}/{hash_arquivo[2:4]}/{hash_arquivo}{extensao}"
+
+
+def _caminho_seguro(raiz, nome_arquivo):
+    """Junta raiz + nome recusando nomes que sairiam da raiz"""
+    raiz = os.path.abspath(raiz)
+    caminho = os.path.abspath(os.path.join(raiz, nome_arquivo))
+    if os.path.commonpath([raiz, caminho]) != raiz:
+        raise ValueError(f"Nome de arquivo inválido: {nome_arquivo}")
+    return caminho
+
+
+class ArmazenamentoLocal:
+    """Arquivos numa pasta do disco local"""
+
+    nome = 'local'
+
+    def __init__(self, raiz):
+        self.raiz = raiz
+
+    def existe(self, chave):
+        return os.path.exists(_caminho_seguro(self.raiz, chave))
+
+    def salvar(self, caminho_origem, chave):
+        """Move o arquivo para a chave (mesmo disco: troca atômica)"""
+        destino = _caminho_seguro(self.raiz, chave)
+        os.makedirs(os.path.dirname(destino), exist_ok=True)
+        os.replace(caminho_origem, destino)
+
+    def abrir(self, chave):
+        return open(_caminho_seguro(self.raiz, chave), 'rb')
+
+    def caminho_local(self, chave):
+        return _caminho_seguro(self.raiz, chave)
+
+    def remover(self, chave):
+        caminho = _caminho_seguro(self.raiz, chave)
+        if not os.path.exists(caminho):
+            return False
+        os.remove(caminho)
+        return True
+
+
+class ArmazenamentoS3:
+    """
+    Arquivos num bucket S3 ou compatível (MinIO, etc)
+    upload_file/download_fileobj transferem em partes, sem carregar o
+    arquivo inteiro na memória
+    """
+
+    nome = 's3'
+
+    def __init__(self, bucket, endpoint_url=None, regiao=None, prefixo='', diretorio_cache=None, cliente=None):
+        if cliente is None:
+            if boto3 is None:
+                raise RuntimeError("ARMAZENAMENTO_BACKEND=s3, mas o pacote boto3 não está instalado")
+            cliente = boto3.client('s3', endpoint_url=endpoint_url or None, region_name=regiao or None)
+        self.cliente = cliente
+        self.bucket = bucket
+        self.prefixo = prefixo.strip('/') + '/' if prefixo.strip('/') else ''
+        self.diretorio_cache = diretorio_cache or os.path.join(DIRETORIO_ARQUIVOS, '.cache_s3')
+
+    def _objeto(self, chave):
+        _caminho_seguro(self.diretorio_cache, chave)  # mesma validação de nome do backend local
+        return f"{self.prefixo}{chave}"
+
+    def existe(self, chave):
+        try:
+            self.cliente.head_object(Bucket=self.bucket, Key=self._objeto(chave))
+            return True
+        except ClientError:
+            return False
+
+    def salvar(self, caminho_origem, chave):
+        """Envia o arquivo (multipart para arquivos grandes) e apaga o original"""
+        self.cliente.upload_file(caminho_origem, self.bucket, self._objeto(chave))
+        # O conteúdo da chave é imutável: o arquivo enviado já serve de cópia local
+        destino = _caminho_seguro(self.diretorio_cache, chave)
+        os.makedirs(os.path.dirname(destino), exist_ok=True)
+        os.replace(caminho_origem, destino)
+
+    def abrir(self, chave):
+        """Corpo do objeto em streaming (lido em blocos por quem consome)"""
+        try:
+            return self.cliente.get_object(Bucket=self.bucket, Key=self._objeto(chave))['Body']
+        except ClientError as e:
+            raise FileNotFoundError(chave) from e
+
+    def caminho_local(self, chave):
+        """
+        Cópia local do objeto, baixada na primeira vez
+        Se o objeto não existe, o caminho devolvido também não existe
+        """
+        destino = _caminho_seguro(self.diretorio_cache, chave)
+        if os.path.exists(destino):
+            return destino
+
+        os.makedirs(os.path.dirname(destino), exist_ok=True)
+        parcial = f"{destino}.{uuid.uuid4().hex}.parcial"
+        try:
+            with open(parcial, 'wb') as arquivo:
+                self.cliente.download_fileobj(self.bucket, self._objeto(chave), arquivo)
+            os.replace(parcial, destino)
+        except ClientError:
+            pass
+        finally:
+            if os.path.exists(parcial):
+                os.remove(parcial)
+        return destino
+
+    def remover(self, chave):
+        self.cliente.delete_object(Bucket=self.bucket, Key=self._objeto(chave))
+        cache = _caminho_seguro(self.diretorio_cache, chave)
+        if os.path.exists(cache):
+            os.remove(cache)
+        return True
+
+
+_backend = None
+
+
+def obter_backend():
+    """Backend configurado por ARMAZENAMENTO_BACKEND (criado uma vez por processo)"""
+    global _backend
+    if _backend is None:
+        if os.environ.get('ARMAZENAMENTO_BACKEND', 'local') == 's3':
+            _backend = ArmazenamentoS3(
+                bucket=os.environ.get('S3_BUCKET', 'sispar-comprovantes'),
+                endpoint_url=os.environ.get('S3_ENDPOINT_URL'),
+                regiao=os.environ.get('S3_REGIAO'),
+                prefixo=os.environ.get('S3_PREFIXO', '')
+            )
+        else:
+            _backend = ArmazenamentoLocal(DIRETORIO_ARQUIVOS)
+    return _backend
+
+
+def definir_backend(backend):
+    """Troca o backend do processo (testes e scripts)"""
+    global _backend
+    _backend = backend
+
+
+def caminho_upload(extensao):
+    """Path local para gravar um upload em andamento (antes de ter o hash)"""
+    os.makedirs(DIRETORIO_ARQUIVOS, exist_ok=True)
+    return os.path.join(DIRETORIO_ARQUIVOS, f"{uuid.uuid4().hex}{extensao}")
+
+
+def armazenar_arquivo(caminho_temporario, hash_arquivo, extensao):
+    """
+    Move um arquivo recém-gravado para a sua chave de conteúdo
+
+    Se o conteúdo já existe, o temporário é descartado (deduplicação)
+
+    Returns:
+        Chave relativa a gravar em nome_arquivo
+    """
+    backend = obter_backend()
+    chave = chave_arquivo(hash_arquivo, extensao)
+
+    if backend.existe(chave):
+        os.remove(caminho_temporario)
+        print(f"DEBUG ARMAZENAMENTO - {chave} já existe, upload deduplicado")
+    else:
+        backend.salvar(caminho_temporario, chave)
+
+    return chave
+
+
+def caminho_local(nome_arquivo):
+    """Path em disco do arquivo (baixado para o cache local no backend S3)"""
+    return obter_backend().caminho_local(nome_arquivo)
+
+
+def abrir_arquivo(nome_arquivo):
+    """Arquivo binário para leitura em blocos (FileNotFoundError se não existir)"""
+    return obter_backend().abrir(nome_arquivo)
+
+
+def contar_referencias(nome_arquivo):
+    """
+    Comprovantes e tarefas de OCR pendentes que usam o arquivo
+
+    Tarefas 'Processando' também contam: o Tesseract ainda está lendo o arquivo
+    """
+    comprovantes = Comprovante.query.filter_by(nome_arquivo=nome_arquivo).count()
+    tarefas = Tarefa.query.filter(
+        Tarefa.nome_arquivo == nome_arquivo,
+        Tarefa.status.in_(['Na fila', 'Processando'])
+    ).count()
+    return comprovantes + tarefas
+
+
+def remover_se_orfao(nome_arquivo):
+    """
+    Apaga o arquivo se nenhuma linha do banco o referencia mais
+    Chamar depois do commit/rollback que removeu a última referência
+
+    Returns:
+        True se o arquivo foi apagado
+    """
+    if not nome_arquivo or contar_referencias(nome_arquivo) > 0:
+        return False
+
+    from src.utils.miniaturas import remover_miniaturas
+    try:
+        removido = obter_backend().remover(nome_arquivo)
+        remover_miniaturas(nome_arquivo)
+        if removido:
+            print(f"DEBUG ARMAZENAMENTO - Arquivo {nome_arquivo} removido")
+        return removido
+    except (OSError, ClientError) as e:
+        print(f"AVISO - Erro ao remover arquivo {nome_arquivo}: {e}")
+        return False
@@ -0,0 +1,66 @@
+"""
+Cache de OCR por conteúdo do arquivo
+
+Comprovantes reenviados (mesmo SHA-256) reaproveitam o texto e o valor
+já extraídos em vez de passar pelo Tesseract de novo
+"""
+import threading
+from src.model.comprovante_model import Comprovante
+from src.utils.ocr_reader import extrair_valores_monetarios
+from src.utils import palavras_ocr
+
+_lock = threading.Lock()
+_contadores = {'acertos': 0, 'falhas': 0}
+
+
+def _contar(chave):
+    with _lock:
+        _contadores[chave] += 1
+
+
+def buscar_ocr_em_cache(hash_arquivo):
+    """
+    Procura um comprovante anterior com o mesmo hash e OCR bem-sucedido
+
+    Args:
+        hash_arquivo: SHA-256 do arquivo enviado
+
+    Returns:
+        Dict no formato de processar_arquivo, ou None se não houver
+    """
+    if not hash_arquivo:
+        _contar('falhas')
+        return None
+
+    anterior = Comprovante.query.filter(
+        Comprovante.hash_arquivo == hash_arquivo,
+        ~Comprovante.texto_extraido.startswith('Erro ao processar')
+    ).order_by(Comprovante.id.desc()).first()
+
+    if not anterior:
+        _contar('falhas')
+        return None
+
+    _contar('acertos')
+    return {
+        'texto': anterior.texto_extraido,
+        'valor_extraido': anterior.valor_extraido,
+        'valores_encontrados': extrair_valores_monetarios(anterior.texto_extraido),
+        'comprovante_origem': anterior.id,
+        'nivel_ocr': 'cache',
+        'palavras': palavras_ocr.carregar(anterior.palavras_ocr)
+    }
+
+
+def estatisticas_cache_ocr():
+    """Contadores de acerto/falha deste processo"""
+    with _lock:
+        acertos = _contadores['acertos']
+        falhas = _contadores['falhas']
+
+    total = acertos + falhas
+    return {
+        'acertos': acertos,
+        'falhas': falhas,
+        'taxa_acerto': round(acertos / total * 100, 2) if total else 0.0
+    }
@@ -0,0 +1,133 @@
+"""
+Cache das respostas do Gemini Vision
+
+Reabrir um caso e clicar em "Analisar" de novo não paga outra chamada ao
+modelo: a resposta fica gravada no banco (tabela cache_vision) com chave
+em (SHA-256 do comprovante, campos declarados usados no prompt, versão
+do prompt, modelo). Mudar qualquer um deles gera outra chave.
+
+Entradas expiram depois de VISION_CACHE_TTL_HORAS e, passando de
+VISION_CACHE_MAX_ENTRADAS, as menos acessadas recentemente são removidas
+a cada gravação.
+"""
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+from src.model import db
+from src.model.cache_vision_model import CacheVision
+
+VISION_CACHE_ATIVO = os.environ.get('VISION_CACHE_ATIVO', 'true').lower() in ('1', 'true', 'sim', 'yes')
+VISION_CACHE_TTL_HORAS = float(os.environ.get('VISION_CACHE_TTL_HORAS', '720'))
+VISION_CACHE_MAX_ENTRADAS = int(os.environ.get('VISION_CACHE_MAX_ENTRADAS', '10000'))
+
+_lock = threading.Lock()
+_contadores = {'acertos': 0, 'falhas': 0, 'expirados': 0, 'gravados': 0, 'removidos': 0}
+
+
+def _contar(chave, quantidade=1):
+    with _lock:
+        _contadores[chave] += quantidade
+
+
+def chave_cache(hash_arquivo, campos_declarados, modelo, versao_prompt):
+    """SHA-256 dos componentes (None se o arquivo não tem hash)"""
+    if not hash_arquivo:
+        return None
+    componentes = json.dumps(
+        [hash_arquivo, campos_declarados, modelo, str(versao_prompt)],
+        sort_keys=True, ensure_ascii=False, default=str
+    )
+    return hashlib.sha256(componentes.encode('utf-8')).hexdigest()
+
+
+def buscar_resposta(chave):
+    """
+    Resposta gravada para a chave, se existir e não tiver expirado
+
+    Returns:
+        Dict da resposta do modelo, ou None
+    """
+    if not VISION_CACHE_ATIVO or not chave:
+        return None
+
+    entrada = db.session.get(CacheVision, chave)
+    if not entrada:
+        _contar('falhas')
+        return None
+
+    agora = datetime.utcnow()
+    if entrada.data_criacao < agora - timedelta(hours=VISION_CACHE_TTL_HORAS):
+        db.session.delete(entrada)
+        db.session.commit()
+        _contar('expirados')
+        _contar('falhas')
+        return None
+
+    entrada.acertos += 1
+    entrada.ultimo_acesso = agora
+    resposta = json.loads(entrada.resposta)
+    db.session.commit()
+    _contar('acertos')
+    return resposta
+
+
+def gravar_resposta(chave, hash_arquivo, modelo, versao_prompt, resposta):
+    """
+    Grava a resposta (só respostas válidas: quem chama não grava erros)
+    e aplica a expiração e o limite de entradas
+
+    Faz commit (e rollback se falhar): chame com a sessão sem pendências
+    """
+    if not VISION_CACHE_ATIVO or not chave:
+        return
+
+    conteudo = json.dumps(resposta, ensure_ascii=False, separators=(',', ':'))
+    try:
+        entrada = db.session.get(CacheVision, chave)
+        if entrada:
+            # Expirada (ou gravada por outra requisição ao mesmo tempo): renova
+            entrada.resposta = conteudo
+            entrada.tamanho = len(conteudo.encode('utf-8'))
+            entrada.data_criacao = entrada.ultimo_acesso = datetime.utcnow()
+        else:
+            db.session.add(CacheVision(chave, hash_arquivo, modelo, versao_prompt, conteudo))
+        db.session.commit()
+        _contar('gravados')
+        _remover_excedentes()
+    except Exception as e:
+        # Cache é opcional: falha ao gravar não derruba a análise
+        print(f"AVISO CACHE VISION - Falha ao gravar: {type(e).__name__}: {e}")
+        db.session.rollback()
+
+
+def _remover_excedentes():
+    """Remove expirados e, acima do limite, os acessados há mais tempo"""
+    limite_data = datetime.utcnow() - timedelta(hours=VISION_CACHE_TTL_HORAS)
+    removidos = CacheVision.query.filter(CacheVision.data_criacao < limite_data).delete(synchronize_session=False)
+
+    excedente = CacheVision.query.count() - VISION_CACHE_MAX_ENTRADAS
+    if excedente > 0:
+        antigas = [c for (c,) in db.session.query(CacheVision.chave).order_by(CacheVision.ultimo_acesso).limit(excedente)]
+        removidos += CacheVision.query.filter(CacheVision.chave.in_(antigas)).delete(synchronize_session=False)
+
+    db.session.commit()
+    if removidos:
+        _contar('removidos', removidos)
+        print(f"DEBUG CACHE VISION - {removidos} entradas removidas (expiradas ou acima do limite)")
+
+
+def estatisticas_cache_vision():
+    """Contadores deste processo e tamanho atual do cache no banco"""
+    with _lock:
+        contadores = dict(_contadores)
+
+    consultas = contadores['acertos'] + contadores['falhas']
+    contadores['taxa_acerto'] = round(contadores['acertos'] / consultas * 100, 2) if consultas else 0.0
+    contadores['entradas'] = CacheVision.query.count()
+    contadores['bytes'] = db.session.query(db.func.coalesce(db.func.sum(CacheVision.tamanho), 0)).scalar()
+    contadores['ttl_horas'] = VISION_CACHE_TTL_HORAS
+    contadores['max_entradas'] = VISION_CACHE_MAX_ENTRADAS
+    contadores['ativo'] = VISION_CACHE_ATIVO
+    return contadores
@@ -0,0 +1,126 @@
+"""
+Envio dos arquivos de comprovantes ao navegador
+
+- ETag forte a partir do SHA-256 do conteúdo: a revisão que reabre o mesmo
+  comprovante recebe 304 (send_file trata o If-None-Match)
+- Cache-Control privado (comprovantes têm dados pessoais)
+- Range (206) para baixar PDFs grandes em partes
+- Opcionalmente, o proxy reverso envia os bytes em vez do worker Python:
+  COMPROVANTE_X_ACCEL_PREFIXO (nginx X-Accel-Redirect) ou USE_X_SENDFILE
+  (Apache/lighttpd X-Sendfile, suportado pelo próprio Flask)
+"""
+import mimetypes
+import os
+from urllib.parse import quote
+from flask import current_app, request, send_file, jsonify, make_response
+from src.utils import armazenamento
+
+
+def tipo_mime(nome_arquivo):
+    """MIME pela extensão (.png -> image/png); desconhecido vira octet-stream"""
+    mimetype, _ = mimetypes.guess_type(nome_arquivo)
+    return mimetype or 'application/octet-stream'
+
+
+def _aplicar_cache(resposta, max_age, imutavel=False):
+    resposta.cache_control.no_cache = None
+    resposta.cache_control.public = False
+    resposta.cache_control.private = True
+    resposta.cache_control.max_age = max_age
+    resposta.cache_control.immutable = imutavel
+    return resposta
+
+
+def enviar_arquivo(nome_arquivo, hash_arquivo=None, download_name=None, mimetype=None, max_age=None,
+                   caminho=None, imutavel=False):
+    """
+    Resposta HTTP com o arquivo do armazenamento
+
+    Args:
+        nome_arquivo: Chave no armazenamento (ou nome antigo)
+        hash_arquivo: SHA-256 do conteúdo, usado como ETag
+        download_name: Nome sugerido ao navegador
+        mimetype: Content-Type (padrão: pela extensão do nome_arquivo)
+        max_age: Segundos de cache no navegador (padrão COMPROVANTE_CACHE_MAX_AGE)
+        caminho: Path já resolvido (ex: miniatura em cache); padrão: pelo armazenamento
+        imutavel: Conteúdo da URL nunca muda (Cache-Control: immutable)
+    """
+    if max_age is None:
+        max_age = current_app.config.get("COMPROVANTE_CACHE_MAX_AGE", 300)
+    mimetype = mimetype or tipo_mime(nome_arquivo)
+
+    caminho = caminho or armazenamento.caminho_local(nome_arquivo)
+    if not os.path.exists(caminho):
+        print(f"DEBUG - Arquivo {nome_arquivo} não encontrado no armazenamento")
+        return jsonify({
+            'erro': 'Arquivo do comprovante não encontrado no servidor',
+            'arquivo_esperado': nome_arquivo
+        }), 404
+
+    prefixo_x_accel = current_app.config.get("COMPROVANTE_X_ACCEL_PREFIXO")
+    if prefixo_x_accel:
+        # O nginx serve o arquivo (e trata Range) a partir de uma location "internal"
+        relativo = os.path.relpath(caminho, armazenamento.DIRETORIO_ARQUIVOS).replace(os.sep, '/')
+        resposta = make_response('')
+        resposta.headers['X-Accel-Redirect'] = f"{prefixo_x_accel.rstrip('/')}/{quote(relativo)}"
+        resposta.headers['Content-Type'] = mimetype
+        if download_name:
+            resposta.headers['Content-Disposition'] = f'inline; filename="{download_name}"'
+        if hash_arquivo:
+            resposta.set_etag(hash_arquivo)
+            # If-None-Match pelo ETag do conteúdo: no 304 o nginx não precisa abrir o arquivo
+            resposta.make_conditional(request)
+            if resposta.status_code == 304:
+                del resposta.headers['X-Accel-Redirect']
+        return _aplicar_cache(resposta, max_age, imutavel)
+
+    # send_file trata If-None-Match, If-Range e Range (206). Com USE_X_SENDFILE
+    # o Flask responde só o cabeçalho X-Sendfile e o Range fica com o servidor
+    x_sendfile = current_app.config.get("USE_X_SENDFILE")
+    resposta = send_file(
+        caminho,
+        mimetype=mimetype,
+        as_attachment=False,
+        download_name=download_name,
+        etag=hash_arquivo or True,
+        conditional=not x_sendfile
+    )
+    if x_sendfile:
+        resposta.make_conditional(request)
+        if resposta.status_code == 304:
+            resposta.headers.pop('X-Sendfile', None)
+    resposta.headers.setdefault('Accept-Ranges', 'bytes')
+    return _aplicar_cache(resposta, max_age, imutavel)
+
+
+def enviar_miniatura(nome_arquivo, hash_arquivo=None, tamanho='m', imutavel=False):
+    """
+    Resposta com a miniatura WebP do arquivo, gerada na primeira vez
+
+    Com imutavel=True (URL presa a um comprovante), usa MINIATURA_CACHE_MAX_AGE
+    """
+    from src.utils.miniaturas import TAMANHOS_MINIATURA, gerar_miniatura
+
+    if tamanho not in TAMANHOS_MINIATURA:
+        return jsonify({'erro': f"Tamanho inválido. Use: {', '.join(TAMANHOS_MINIATURA)}"}), 400
+
+    max_age = current_app.config.get("MINIATURA_CACHE_MAX_AGE", 31536000) if imutavel else None
+    etag = f"{hash_arquivo or os.path.basename(nome_arquivo)}-{tamanho}"
+
+    try:
+        caminho = gerar_miniatura(nome_arquivo, tamanho)
+    except Exception as e:
+        print(f"Erro ao gerar miniatura de {nome_arquivo}: {type(e).__name__}: {e}")
+        return jsonify({'erro': 'Não foi possível gerar a miniatura do comprovante'}), 422
+
+    if not caminho:
+        return jsonify({
+            'erro': 'Arquivo do comprovante não encontrado no servidor',
+            'arquivo_esperado': nome_arquivo
+        }), 404
+
+    base = os.path.splitext(os.path.basename(nome_arquivo))[0]
+    return enviar_arquivo(
+        nome_arquivo, hash_arquivo=etag, download_name=f"{base}_{tamanho}.webp", mimetype='image/webp',
+        max_age=max_age, caminho=caminho, imutavel=imutavel
+    )
@@ -0,0 +1,106 @@
+"""
+Fila da análise com IA em segundo plano
+
+A chamada ao Gemini passa a maior parte do tempo esperando a rede
+(10-40s), então roda num pool de threads limitado, fora das threads do
+gunicorn: alguns cliques em "Analisar" não seguram mais a API inteira.
+Cada worker da API tem o seu pool; o estado das tarefas fica no banco
+(tabela tarefas, tipo 'analise_ia').
+
+Também executa as chamadas de um lote (POST /reembolsos/analisar-lote)
+em paralelo, com concorrência limitada por requisição.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+_executor = None
+_lock = threading.Lock()
+_pendentes = 0
+_em_execucao = 0
+
+
+def _obter_executor(max_workers):
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='analise-ia')
+    return _executor
+
+
+def tarefas_pendentes():
+    """Quantidade de análises na fila ou em execução neste worker"""
+    return _pendentes
+
+
+def estado_fila():
+    """Profundidade da fila deste worker: aguardando e em execução"""
+    with _lock:
+        return {
+            'pendentes': _pendentes,
+            'em_execucao': _em_execucao,
+            'aguardando': _pendentes - _em_execucao
+        }
+
+
+def enfileirar_analise(funcao, *args, max_workers=4, fila_maxima=20):
+    """
+    Agenda uma análise no pool de threads
+
+    Args:
+        funcao: Executada numa thread do pool com *args (abre o próprio app context)
+        max_workers: Análises simultâneas
+        fila_maxima: Limite de análises pendentes
+
+    Returns:
+        True se a tarefa foi aceita, False se a fila está cheia
+    """
+    global _pendentes
+
+    with _lock:
+        if _pendentes >= fila_maxima:
+            return False
+        _pendentes += 1
+        executor = _obter_executor(max_workers)
+
+    def _executar():
+        global _pendentes, _em_execucao
+        with _lock:
+            _em_execucao += 1
+        try:
+            funcao(*args)
+        finally:
+            with _lock:
+                _em_execucao -= 1
+                _pendentes -= 1
+
+    try:
+        executor.submit(_executar)
+    except RuntimeError:
+        with _lock:
+            _pendentes -= 1
+        raise
+
+    return True
+
+
+def executar_em_paralelo(funcao, itens, concorrencia=4):
+    """
+    Executa funcao(item) em até `concorrencia` threads, devolvendo cada
+    resultado assim que fica pronto (ordem de término, não de envio)
+
+    Se quem consome parar no meio (ex: cliente desconectou do streaming),
+    os itens que ainda não começaram são cancelados
+
+    Yields:
+        Tuple (item, resultado, exceção) - resultado None se houve exceção
+    """
+    if not itens:
+        return
+
+    executor = ThreadPoolExecutor(max_workers=max(1, min(concorrencia, len(itens))), thread_name_prefix='analise-lote')
+    try:
+        futures = {executor.submit(funcao, item): item for item in itens}
+        for future in as_completed(futures):
+            excecao = future.exception()
+            yield futures[future], (future.result() if excecao is None else None), excecao
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,206 @@
+"""
+Fila de OCR em segundo plano
+
+O Tesseract é CPU-bound, então roda num pool de processos limitado
+(fora das threads do gunicorn). Cada worker da API tem o seu pool;
+o estado das tarefas fica no banco (tabela tarefas).
+
+Início e fim de cada tarefa passam por uma fila de eventos consumida por
+uma thread dedicada deste worker: é ela que chama ao_iniciar/ao_concluir
+(e usa o banco), não a thread interna do pool de processos.
+"""
+import multiprocessing
+import os
+import threading
+import uuid
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from src.utils.ocr_reader import processar_arquivo, limitar_memoria_processo
+
+_executor = None
+_lock = threading.Lock()
+_pendentes = 0
+
+# Eventos ('inicio' | 'fim', identificador, dado); 'inicio' vem dos processos do pool
+_eventos = None
+_tarefas = {}  # identificador -> (ao_iniciar, ao_concluir, future)
+
+# Nos processos do pool: fila para avisar o início (recebida no initializer)
+_eventos_worker = None
+
+
+def _executar_ocr(caminho_arquivo, identificador=None):
+    """
+    Roda dentro do processo do pool
+
+    Args:
+        identificador: Tarefa da fila; o início é avisado ao worker da API
+
+    Returns:
+        Tuple (resultado_ocr, inicio, fim)
+    """
+    inicio = datetime.utcnow()
+    if identificador and _eventos_worker is not None:
+        _eventos_worker.put(('inicio', identificador, inicio))
+    resultado = processar_arquivo(caminho_arquivo)
+    fim = datetime.utcnow()
+    return resultado, inicio, fim
+
+
+def _iniciar_worker_ocr(eventos=None):
+    """Cada processo do pool tem um orçamento de memória (OCR_MEMORIA_MAXIMA_MB)"""
+    global _eventos_worker
+    _eventos_worker = eventos
+    limite = limitar_memoria_processo()
+    if limite:
+        print(f"DEBUG FILA OCR - Processo {os.getpid()} limitado a {limite // (1024 * 1024)} MB de memória virtual")
+
+
+def _obter_executor(max_workers):
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=max_workers, initializer=_iniciar_worker_ocr, initargs=(_obter_eventos(),)
+        )
+    return _executor
+
+
+def _obter_eventos():
+    """Fila de eventos e a thread que a consome (criadas no primeiro uso, chamar com _lock)"""
+    global _eventos
+    if _eventos is None:
+        _eventos = multiprocessing.Queue()
+        threading.Thread(target=_consumir_eventos, args=(_eventos,), name='fila-ocr-eventos', daemon=True).start()
+    return _eventos
+
+
+def _consumir_eventos(eventos):
+    """Thread dedicada: chama ao_iniciar/ao_concluir de cada tarefa, uma por vez"""
+    while True:
+        try:
+            tipo, identificador, dado = eventos.get()
+        except (EOFError, OSError):
+            return  # fila fechada no encerramento do processo
+        with _lock:
+            registro = _tarefas.pop(identificador, None) if tipo == 'fim' else _tarefas.get(identificador)
+        if not registro:
+            continue
+
+        ao_iniciar, ao_concluir, future = registro
+        try:
+            if tipo == 'inicio':
+                if ao_iniciar:
+                    ao_iniciar(dado)
+            else:
+                ao_concluir(future)
+        except Exception as e:
+            # ao_concluir já marca a tarefa com erro; aqui só não deixa a thread morrer
+            print(f"ERROR FILA OCR - Falha ao tratar '{tipo}' da tarefa {identificador}: {type(e).__name__}: {e}")
+
+
+def tarefas_pendentes():
+    """Quantidade de tarefas na fila ou em execução neste worker"""
+    return _pendentes
+
+
+def enfileirar_ocr(caminho_arquivo, ao_concluir, max_workers=2, fila_maxima=50, ao_iniciar=None):
+    """
+    Agenda o OCR de um arquivo no pool de processos
+
+    Args:
+        caminho_arquivo: Path do arquivo salvo
+        ao_concluir: Função chamada com o Future quando o OCR terminar
+                     (roda na thread de eventos da fila, fora da requisição)
+        max_workers: Tamanho do pool de processos
+        fila_maxima: Limite de tarefas pendentes
+        ao_iniciar: Função chamada com o datetime em que um processo começou o OCR
+
+    Returns:
+        True se a tarefa foi aceita, False se a fila está cheia
+    """
+    global _pendentes, _executor
+
+    with _lock:
+        if _pendentes >= fila_maxima:
+            return False
+        _pendentes += 1
+        executor = _obter_executor(max_workers)
+        eventos = _eventos
+        # Registrada antes do submit: o aviso de início pode chegar antes do submit retornar
+        identificador = uuid.uuid4().hex
+        _tarefas[identificador] = (ao_iniciar, ao_concluir, None)
+
+    def _callback(future):
+        # Roda na thread interna do pool: só atualiza a contagem e repassa
+        global _pendentes, _executor
+        with _lock:
+            _pendentes -= 1
+            # Um processo morto (ex: OOM) inutiliza o pool inteiro; recria no próximo envio
+            if isinstance(future.exception(), BrokenProcessPool) and _executor is executor:
+                _executor = None
+        eventos.put(('fim', identificador, None))
+
+    try:
+        future = executor.submit(_executar_ocr, caminho_arquivo, identificador)
+    except BrokenProcessPool:
+        with _lock:
+            _pendentes -= 1
+            _executor = None
+            _tarefas.pop(identificador, None)
+        raise
+
+    with _lock:
+        _tarefas[identificador] = (ao_iniciar, ao_concluir, future)
+    future.add_done_callback(_callback)
+    return True
+
+
+def processar_lote_ocr(caminhos_arquivos, max_workers=2, fila_maxima=50):
+    """
+    OCR de vários arquivos no mesmo pool da fila, aguardando todos
+
+    Os arquivos entram na contagem de pendentes: um lote maior que a
+    folga da fila é recusado inteiro em vez de atrasar as outras tarefas
+
+    Returns:
+        Lista na ordem dos caminhos com (resultado_ocr, inicio, fim) ou a
+        exceção do arquivo; None se a fila não comporta o lote
+    """
+    global _pendentes, _executor
+
+    quantidade = len(caminhos_arquivos)
+    with _lock:
+        if _pendentes + quantidade > fila_maxima:
+            return None
+        _pendentes += quantidade
+        executor = _obter_executor(max_workers)
+
+    futures = []
+    try:
+        for caminho in caminhos_arquivos:
+            futures.append(executor.submit(_executar_ocr, caminho))
+    except BrokenProcessPool as e:
+        futures += [e] * (quantidade - len(futures))
+
+    wait([f for f in futures if not isinstance(f, Exception)])
+
+    resultados = []
+    quebrado = False
+    for future in futures:
+        if isinstance(future, Exception):
+            resultados.append(future)
+            quebrado = True
+        elif future.exception() is not None:
+            resultados.append(future.exception())
+            quebrado = quebrado or isinstance(future.exception(), BrokenProcessPool)
+        else:
+            resultados.append(future.result())
+
+    with _lock:
+        _pendentes -= quantidade
+        # Mesmo tratamento da fila: pool quebrado é recriado no próximo envio
+        if quebrado and _executor is executor:
+            _executor = None
+
+    return resultados
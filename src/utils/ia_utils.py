@@ -7,12 +7,13 @@ import os
 import json
 from datetime import datetime, timedelta
 from decimal import Decimal
-from PIL import Image
-from pdf2image import convert_from_path
+from PIL import Image, ImageOps
+from pdf2image import convert_from_path, pdfinfo_from_path
 import io
 import statistics
 from src.model.reembolso_model import Reembolso
 from src.model.comprovante_model import Comprovante
+from src.utils.ocr_reader import abrir_imagem
 
 
 def calcular_hash_imagem(caminho_arquivo):
@@ -30,7 +31,7 @@ def calcular_hash_imagem(caminho_arquivo):
         
         with open(caminho_arquivo, "rb") as f:
             # Ler arquivo em chunks para arquivos grandes
-            for byte_block in iter(lambda: f.read(4096), b""):
+            for byte_block in iter(lambda: f.read(1024 * 1024), b""):
                 sha256_hash.update(byte_block)
         
         return sha256_hash.hexdigest()
@@ -39,34 +40,132 @@ def calcular_hash_imagem(caminho_arquivo):
         return None
 
 
+# Imagem enviada ao Vision dentro da própria requisição (sem genai.upload_file)
+# - VISION_INLINE: desligado, todo arquivo vai por upload_file (comportamento antigo)
+# - VISION_LADO_MAXIMO: maior lado em pixels; o modelo reduz imagens maiores de
+#   qualquer forma, então mandar o original só custa upload
+# - VISION_QUALIDADE_JPEG: qualidade da recompressão
+# - VISION_INLINE_MAX_BYTES: acima disso (ou em PDFs com mais de
+#   VISION_PDF_INLINE_MAX_PAGINAS páginas) o arquivo vai por upload_file
+VISION_INLINE = os.environ.get('VISION_INLINE', 'true').lower() in ('1', 'true', 'sim', 'yes')
+VISION_LADO_MAXIMO = int(os.environ.get('VISION_LADO_MAXIMO', '1600'))
+VISION_QUALIDADE_JPEG = int(os.environ.get('VISION_QUALIDADE_JPEG', '85'))
+VISION_INLINE_MAX_BYTES = int(os.environ.get('VISION_INLINE_MAX_KB', '4096')) * 1024
+VISION_PDF_INLINE_MAX_PAGINAS = int(os.environ.get('VISION_PDF_INLINE_MAX_PAGINAS', '1'))
+
+# Formatos que o Gemini aceita direto (o original pode ir sem recompressão)
+FORMATOS_VISION = {'JPEG': 'image/jpeg', 'PNG': 'image/png', 'WEBP': 'image/webp'}
+
+
+def preparar_imagem_vision(caminho_arquivo, lado_maximo=None, qualidade=None):
+    """
+    Reduz o comprovante ao tamanho útil para o modelo e recomprime
+    (JPEG, ou PNG se ficar menor; o original se já for menor e no tamanho)
+    PDFs: só a 1ª página, renderizada direto no tamanho final
+
+    Args:
+        caminho_arquivo: Path do arquivo (imagem ou PDF)
+        lado_maximo: Maior lado em pixels (padrão VISION_LADO_MAXIMO)
+        qualidade: Qualidade JPEG (padrão VISION_QUALIDADE_JPEG)
+
+    Returns:
+        Dict com mime_type, dados (bytes), largura, altura, bytes_original
+        e bytes_enviados; None quando o arquivo deve ir por upload
+        (PDF com várias páginas ou resultado acima de VISION_INLINE_MAX_BYTES)
+    """
+    lado_maximo = lado_maximo or VISION_LADO_MAXIMO
+    qualidade = qualidade or VISION_QUALIDADE_JPEG
+
+    bytes_original = os.path.getsize(caminho_arquivo)
+    formato_original = None
+
+    if caminho_arquivo.lower().endswith('.pdf'):
+        paginas = pdfinfo_from_path(caminho_arquivo).get('Pages', 1)
+        if paginas > VISION_PDF_INLINE_MAX_PAGINAS:
+            return None
+        renderizadas = convert_from_path(caminho_arquivo, first_page=1, last_page=1, size=lado_maximo)
+        if not renderizadas:
+            return None
+        imagem = renderizadas[0]
+    else:
+        # Recusa imagens gigantes pelo cabeçalho e decodifica já perto do tamanho final
+        imagem = abrir_imagem(caminho_arquivo, lado_maximo=lado_maximo, modo='RGB')
+        # Dimensões e orientação do arquivo (a imagem aberta pode já estar reduzida)
+        with Image.open(caminho_arquivo) as cabecalho:
+            formato_original = cabecalho.format
+            tamanho_original = cabecalho.size
+            orientacao = cabecalho.getexif().get(0x0112, 1)
+
+    # Cada cópia (girada pelo EXIF, convertida) é fechada no seu próprio with
+    with imagem as original, (ImageOps.exif_transpose(original) or original) as girada:
+        girada.thumbnail((lado_maximo, lado_maximo), Image.LANCZOS)
+        if girada.mode in ('RGB', 'L'):
+            candidatos = _recomprimir(girada, qualidade, formato_original)
+        else:
+            with girada.convert('RGB') as convertida:
+                candidatos = _recomprimir(convertida, qualidade, formato_original)
+
+    # Original menor que a recompressão (ex: digitalização limpa em PNG) e sem
+    # rotação EXIF pendente: vai como está, o modelo reduz do lado de lá
+    if formato_original in FORMATOS_VISION and orientacao == 1 and bytes_original <= VISION_INLINE_MAX_BYTES:
+        with open(caminho_arquivo, 'rb') as arquivo:
+            candidatos.append((FORMATOS_VISION[formato_original], arquivo.read(), tamanho_original))
+
+    mime_type, dados, (largura, altura) = min(candidatos, key=lambda candidato: len(candidato[1]))
+    if len(dados) > VISION_INLINE_MAX_BYTES:
+        return None
+
+    return {
+        'mime_type': mime_type,
+        'dados': dados,
+        'largura': largura,
+        'altura': altura,
+        'bytes_original': bytes_original,
+        'bytes_enviados': len(dados)
+    }
+
+
+def _recomprimir(imagem, qualidade, formato_original):
+    """
+    Foto: JPEG. Digitalização/print (PNG, poucas cores): o PNG costuma
+    sair menor que o JPEG; devolve os dois para ficar o menor
+    """
+    candidatos = []
+    saida = io.BytesIO()
+    imagem.save(saida, format='JPEG', quality=qualidade, optimize=True)
+    candidatos.append(('image/jpeg', saida.getvalue(), imagem.size))
+    if formato_original and formato_original != 'JPEG':
+        saida = io.BytesIO()
+        imagem.save(saida, format='PNG')
+        candidatos.append(('image/png', saida.getvalue(), imagem.size))
+    return candidatos
+
+
 def converter_para_base64(caminho_arquivo):
     """
-    Converte imagem ou PDF para base64 para envio ao Grok Vision
-    Se for PDF, converte a primeira página para imagem
+    Converte imagem ou PDF para base64 (APIs que recebem a imagem no JSON)
+    Mesma imagem reduzida de preparar_imagem_vision; se for PDF, só a primeira página
     
     Args:
         caminho_arquivo: Path do arquivo (imagem ou PDF)
         
     Returns:
-        String base64 da imagem
+        String base64 da imagem JPEG
     """
     try:
-        extensao = os.path.splitext(caminho_arquivo)[1].lower()
-        
-        # Se for PDF, converter primeira página para imagem
-        if extensao == '.pdf':
-            images = convert_from_path(caminho_arquivo, first_page=1, last_page=1, dpi=200)
-            if images:
-                # Converter PIL Image para bytes
-                img_byte_arr = io.BytesIO()
-                images[0].save(img_byte_arr, format='JPEG', quality=90)
-                img_byte_arr = img_byte_arr.getvalue()
-                return base64.b64encode(img_byte_arr).decode('utf-8')
-        
-        # Se for imagem (PNG, JPEG, etc)
-        else:
-            with open(caminho_arquivo, 'rb') as f:
-                return base64.b64encode(f.read()).decode('utf-8')
+        payload = preparar_imagem_vision(caminho_arquivo)
+        if payload:
+            return base64.b64encode(payload['dados']).decode('utf-8')
+
+        # PDF com várias páginas: primeira página, como antes
+        images = None
+        if caminho_arquivo.lower().endswith('.pdf'):
+            images = convert_from_path(caminho_arquivo, first_page=1, last_page=1, size=VISION_LADO_MAXIMO)
+        if images:
+            img_byte_arr = io.BytesIO()
+            with images[0] as pagina, pagina.convert('RGB') as convertida:
+                convertida.save(img_byte_arr, format='JPEG', quality=VISION_QUALIDADE_JPEG)
+            return base64.b64encode(img_byte_arr.getvalue()).decode('utf-8')
     
     except Exception as e:
         print(f"Erro ao converter para base64: {e}")
@@ -0,0 +1,88 @@
+"""
+Miniaturas WebP dos comprovantes (e prévia da 1ª página de PDFs)
+
+Geradas na primeira requisição de /miniatura (fora do OCR) e guardadas
+em disco em temp/.miniaturas, no mesmo layout das chaves do
+armazenamento. O arquivo original nunca muda para uma chave, então a
+miniatura também não: pode ser servida com cache longo
+"""
+import os
+import uuid
+from PIL import Image, ImageOps
+from pdf2image import convert_from_path
+from src.utils import armazenamento
+from src.utils.ocr_reader import abrir_imagem
+
+# Maior lado, em pixels, de cada tamanho disponível
+TAMANHOS_MINIATURA = {'p': 160, 'm': 480, 'g': 1024}
+
+QUALIDADE_WEBP = int(os.environ.get('MINIATURA_QUALIDADE_WEBP', '80'))
+
+DIRETORIO_MINIATURAS = os.path.join(armazenamento.DIRETORIO_ARQUIVOS, '.miniaturas')
+
+
+def caminho_miniatura(nome_arquivo, tamanho):
+    """'ab/cd/abcd.pdf' + 'm' -> temp/.miniaturas/ab/cd/abcd.pdf_480.webp"""
+    return armazenamento._caminho_seguro(DIRETORIO_MINIATURAS, f"{nome_arquivo}_{TAMANHOS_MINIATURA[tamanho]}.webp")
+
+
+def _abrir_origem(caminho_origem, lado):
+    """Imagem PIL da origem já perto do tamanho final"""
+    if caminho_origem.lower().endswith('.pdf'):
+        # Só a 1ª página, renderizada direto no tamanho da miniatura
+        paginas = convert_from_path(caminho_origem, first_page=1, last_page=1, size=lado)
+        if not paginas:
+            raise ValueError("PDF sem páginas")
+        return paginas[0]
+
+    # Recusa imagens gigantes pelo cabeçalho e decodifica já perto do tamanho final
+    return abrir_imagem(caminho_origem, lado_maximo=lado, modo='RGB')
+
+
+def gerar_miniatura(nome_arquivo, tamanho='m'):
+    """
+    Cria (se ainda não existe) a miniatura WebP do arquivo
+
+    Returns:
+        Path da miniatura, ou None se o arquivo original não existe
+    """
+    destino = caminho_miniatura(nome_arquivo, tamanho)
+    if os.path.exists(destino):
+        return destino
+
+    origem = armazenamento.caminho_local(nome_arquivo)
+    if not os.path.exists(origem):
+        return None
+
+    lado = TAMANHOS_MINIATURA[tamanho]
+    # Cada cópia (girada pelo EXIF, convertida) é fechada no seu próprio with
+    with _abrir_origem(origem, lado) as original, \
+            (ImageOps.exif_transpose(original) or original) as imagem:
+        imagem.thumbnail((lado, lado), Image.LANCZOS)
+        if imagem.mode in ('RGB', 'L'):
+            _salvar_webp(imagem, destino)
+        else:
+            with imagem.convert('RGB') as convertida:
+                _salvar_webp(convertida, destino)
+
+    return destino
+
+
+def _salvar_webp(imagem, destino):
+    os.makedirs(os.path.dirname(destino), exist_ok=True)
+    # Escreve num nome temporário: requisições simultâneas não leem arquivo pela metade
+    parcial = f"{destino}.{uuid.uuid4().hex}.parcial"
+    try:
+        imagem.save(parcial, 'WEBP', quality=QUALIDADE_WEBP, method=4)
+        os.replace(parcial, destino)
+    finally:
+        if os.path.exists(parcial):
+            os.remove(parcial)
+
+
+def remover_miniaturas(nome_arquivo):
+    """Apaga as miniaturas de um arquivo removido do armazenamento"""
+    for tamanho in TAMANHOS_MINIATURA:
+        caminho = caminho_miniatura(nome_arquivo, tamanho)
+        if os.path.exists(caminho):
+            os.remove(caminho)
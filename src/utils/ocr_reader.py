@@ -1,9 +1,29 @@
 import pytesseract
+import io
 import os
 import re
-from PIL import Image
-from pdf2image import convert_from_path
+import heapq
+import time
+import tempfile
+import threading
+import subprocess
+from PIL import Image, ImageOps, ImageFilter, ImageChops
+from pdf2image import convert_from_path, pdfinfo_from_path
 from decimal import Decimal
+from concurrent.futures import ProcessPoolExecutor
+from src.utils.palavras_ocr import palavras_de_image_to_data, montar_estrutura
+
+# Backend opcional: API do Tesseract dentro do processo (pip install tesserocr)
+try:
+    import tesserocr
+except ImportError:
+    tesserocr = None
+
+# Limite de memória dos processos de OCR (só Unix)
+try:
+    import resource
+except ImportError:
+    resource = None
 
 # Configuração do Tesseract
 # Em ambiente Docker/Linux, o tesseract está no PATH
@@ -11,40 +31,758 @@ from decimal import Decimal
 # pytesseract.pytesseract.tesseract_cmd = r'C:\Arquivos de Programas\Tesseract-OCR\tesseract.exe'
 # os.environ['TESSDATA_PREFIX'] = r'C:\Arquivos de Programas\Tesseract-OCR'
 
-def extrair_texto_imagem(caminho_imagem):
+# Backend do OCR
+# - pytesseract: abre um processo tesseract (e arquivos temporários) por imagem
+# - tesserocr: mantém uma API do Tesseract por thread/processo com o idioma
+#   "por" já carregado; elimina o custo fixo de ~100-300 ms por página
+OCR_BACKEND = os.environ.get('OCR_BACKEND', 'pytesseract')
+OCR_IDIOMA = 'por'
+
+# Resolução usada para rasterizar páginas de PDF
+OCR_PDF_DPI = 300
+
+# Processos usados para o OCR das páginas de um PDF (1 = sequencial)
+# Cada processo da fila de OCR (OCR_MAX_WORKERS) abre o seu pool de páginas:
+# o padrão divide os CPUs entre eles em vez de abrir cpu_count em cada um
+OCR_PDF_WORKERS = int(os.environ.get(
+    'OCR_PDF_WORKERS', max(1, (os.cpu_count() or 1) // max(1, int(os.environ.get('OCR_MAX_WORKERS', '2'))))
+))
+
+# Limites de memória da rasterização
+# - OCR_PDF_MAX_PAGINAS: páginas além deste limite não passam pelo OCR
+# - OCR_PDF_MAX_PIXELS: pixels por página; o DPI é reduzido para caber
+# - OCR_PDF_JANELA_PAGINAS: páginas renderizadas por chamada ao poppler
+OCR_PDF_MAX_PAGINAS = int(os.environ.get('OCR_PDF_MAX_PAGINAS', '50'))
+OCR_PDF_MAX_PIXELS = int(os.environ.get('OCR_PDF_MAX_PIXELS', '25000000'))
+OCR_PDF_JANELA_PAGINAS = int(os.environ.get('OCR_PDF_JANELA_PAGINAS', '1'))
+
+
+def _env_bool(nome, padrao):
+    return os.environ.get(nome, padrao).strip().lower() in ('1', 'true', 'sim', 'yes')
+
+
+# Camada de texto de PDFs digitais (pdftotext) antes de rasterizar
+# - OCR_PDF_TEXTO_MINIMO: caracteres alfanuméricos para considerar a página legível
+OCR_PDF_CAMADA_TEXTO = _env_bool('OCR_PDF_CAMADA_TEXTO', 'true')
+OCR_PDF_TEXTO_MINIMO = int(os.environ.get('OCR_PDF_TEXTO_MINIMO', '20'))
+
+# OCR em níveis: primeiro uma passada barata; a passada completa só
+# roda se nenhum valor for encontrado
+# - OCR_RAPIDO_ALTURA_MAXIMA: altura da imagem reduzida no nível rápido
+# - OCR_RAPIDO_PSM: segmentação do Tesseract (6 = bloco único de texto,
+#   o layout de cupom térmico)
+# - OCR_RAPIDO_PDF_DPI: resolução das páginas de PDF no nível rápido
+OCR_NIVEIS = _env_bool('OCR_NIVEIS', 'true')
+OCR_RAPIDO_ALTURA_MAXIMA = int(os.environ.get('OCR_RAPIDO_ALTURA_MAXIMA', '1200'))
+OCR_RAPIDO_PSM = int(os.environ.get('OCR_RAPIDO_PSM', '6'))
+OCR_RAPIDO_PDF_DPI = int(os.environ.get('OCR_RAPIDO_PDF_DPI', '150'))
+
+# Proteção de memória na entrada das imagens
+# - OCR_IMAGEM_MAX_PIXELS: imagens maiores são recusadas pelo cabeçalho, antes
+#   de decodificar, em verificar_imagem/abrir_imagem (o Image.MAX_IMAGE_PIXELS
+#   global do Pillow, usado pelo resto do processo, não é alterado)
+# - OCR_MEMORIA_MAXIMA_MB: memória que cada processo de OCR pode alocar além
+#   do que já usa ao iniciar (RLIMIT_AS; 0 desliga)
+OCR_IMAGEM_MAX_PIXELS = int(os.environ.get('OCR_IMAGEM_MAX_PIXELS', '60000000'))
+OCR_MEMORIA_MAXIMA_MB = int(os.environ.get('OCR_MEMORIA_MAXIMA_MB', '1024'))
+
+
+class ImagemMuitoGrande(ValueError):
+    """Imagem com mais pixels que OCR_IMAGEM_MAX_PIXELS"""
+
+    def __init__(self, largura, altura, max_pixels=None):
+        self.largura = largura
+        self.altura = altura
+        max_pixels = max_pixels or OCR_IMAGEM_MAX_PIXELS
+        super().__init__(
+            f"Imagem de {largura}x{altura} ({largura * altura / 1e6:.1f} MP) acima do limite de "
+            f"{max_pixels / 1e6:.0f} MP"
+        )
+
+
+def verificar_imagem(origem, max_pixels=None):
+    """
+    Confere as dimensões lendo só o cabeçalho (nada é decodificado)
+
+    Returns:
+        Tuple (largura, altura), ou None se não for uma imagem reconhecida
+
+    Raises:
+        ImagemMuitoGrande
+    """
+    max_pixels = max_pixels or OCR_IMAGEM_MAX_PIXELS
+    try:
+        with Image.open(origem) as imagem:
+            largura, altura = imagem.size
+    except Image.DecompressionBombError:
+        raise ImagemMuitoGrande(0, 0, max_pixels) from None
+    except (OSError, ValueError):
+        return None
+    if largura * altura > max_pixels:
+        raise ImagemMuitoGrande(largura, altura, max_pixels)
+    return largura, altura
+
+
+def abrir_imagem(origem, altura_maxima=None, lado_maximo=None, modo=None, rotacao_exif=True, max_pixels=None):
+    """
+    Abre e decodifica uma imagem enviada sem estourar a memória
+
+    - recusa pelo cabeçalho imagens acima de max_pixels
+    - JPEG: decodifica direto em 1/2, 1/4 ou 1/8 do tamanho (draft), e só
+      a luminância quando modo='L'
+    - outros formatos: reduz por um fator inteiro logo após decodificar
+      (reduce), antes de qualquer outra cópia
+
+    A imagem nunca fica menor que o pedido (o ajuste fino continua com
+    quem chama) e o DPI em info é corrigido na mesma proporção.
+    Quem chama fecha a imagem (with)
+
+    Args:
+        origem: Path ou arquivo aberto
+        altura_maxima: Altura necessária depois da rotação EXIF (como no pré-processamento)
+        lado_maximo: Maior lado necessário (ex: miniaturas)
+        modo: Modo desejado no draft do JPEG ('L' ou 'RGB')
+        rotacao_exif: A orientação EXIF será aplicada depois (troca largura/altura)
+        max_pixels: Limite de pixels (padrão OCR_IMAGEM_MAX_PIXELS)
+    """
+    max_pixels = max_pixels or OCR_IMAGEM_MAX_PIXELS
+    try:
+        imagem = Image.open(origem)
+    except Image.DecompressionBombError:
+        raise ImagemMuitoGrande(0, 0, max_pixels) from None
+
+    try:
+        largura, altura = imagem.size
+        if largura * altura > max_pixels:
+            raise ImagemMuitoGrande(largura, altura, max_pixels)
+
+        escalas = []
+        if altura_maxima:
+            # Orientações 5 a 8 giram 90°: a altura final é a largura armazenada
+            girada = rotacao_exif and imagem.getexif().get(0x0112, 1) in (5, 6, 7, 8)
+            escalas.append(altura_maxima / (largura if girada else altura))
+        if lado_maximo:
+            escalas.append(lado_maximo / max(largura, altura))
+        escala = min(escalas) if escalas else 1
+
+        if escala < 1:
+            alvo = (max(1, round(largura * escala)), max(1, round(altura * escala)))
+            if imagem.format == 'JPEG':
+                imagem.draft(modo if modo and imagem.mode in ('RGB', 'L') else imagem.mode, alvo)
+
+            imagem.load()
+            fator = int(min(imagem.width / alvo[0], imagem.height / alvo[1]))
+            # reduce tira a média dos pixels: não serve para paleta (P) nem 1 bit
+            if fator >= 2 and imagem.mode in ('L', 'LA', 'RGB', 'RGBA', 'I', 'F'):
+                reduzida = imagem.reduce(fator)
+                reduzida.info = imagem.info
+                imagem.close()
+                imagem = reduzida
+        else:
+            imagem.load()
+
+        if imagem.width != largura and 'dpi' in imagem.info:
+            proporcao = imagem.width / largura
+            imagem.info['dpi'] = tuple(d * proporcao for d in imagem.info['dpi'])
+        return imagem
+    except BaseException:
+        imagem.close()
+        raise
+
+
+def _memoria_virtual_atual():
+    """Bytes de memória virtual do processo (Linux; 0 se não der para ler)"""
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[0]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def limitar_memoria_processo(orcamento_mb=None):
+    """
+    Limita a memória que este processo (e o tesseract que ele abrir) pode
+    alocar: RLIMIT_AS = memória virtual atual + orçamento. Uma imagem
+    maliciosa vira MemoryError no worker em vez de derrubar o container
+
+    Returns:
+        Limite aplicado em bytes, ou None se desligado/indisponível
+    """
+    orcamento_mb = OCR_MEMORIA_MAXIMA_MB if orcamento_mb is None else orcamento_mb
+    if not orcamento_mb or resource is None:
+        return None
+
+    limite = _memoria_virtual_atual() + orcamento_mb * 1024 * 1024
+    _, maximo = resource.getrlimit(resource.RLIMIT_AS)
+    if maximo != resource.RLIM_INFINITY:
+        limite = min(limite, maximo)
+    resource.setrlimit(resource.RLIMIT_AS, (limite, maximo))
+    return limite
+
+
+# Guarda também as palavras com caixa e confiança (image_to_data); ver
+# src/utils/palavras_ocr.py. No pytesseract é uma execução a mais do
+# Tesseract por página, por isso vem desligado; o texto não muda
+OCR_PALAVRAS = _env_bool('OCR_PALAVRAS', 'false')
+
+
+_motores = threading.local()
+
+
+def _obter_motor_tesserocr():
+    """
+    API do Tesseract persistente desta thread
+    Recriada se o processo foi "forkado" (o pool herda o objeto do pai)
+    """
+    if tesserocr is None:
+        raise RuntimeError("OCR_BACKEND=tesserocr, mas o pacote tesserocr não está instalado")
+
+    api = getattr(_motores, 'api', None)
+    if api is None or _motores.pid != os.getpid():
+        api = tesserocr.PyTessBaseAPI(lang=OCR_IDIOMA)
+        _motores.api = api
+        _motores.pid = os.getpid()
+    return api
+
+
+def _palavras_tesserocr(api, palavras):
+    """Percorre as palavras do último reconhecimento da API (formato de palavras_ocr)"""
+    nivel = tesserocr.RIL.WORD
+    linha = -1
+    nova_linha = True
+    for resultado in tesserocr.iterate_level(api.GetIterator(), nivel):
+        texto = (resultado.GetUTF8Text(nivel) or '').strip()
+        if resultado.IsAtBeginningOf(tesserocr.RIL.TEXTLINE):
+            nova_linha = True
+        if not texto:
+            continue
+        # Como no image_to_data: linhas sem nenhuma palavra não contam
+        if nova_linha:
+            linha += 1
+            nova_linha = False
+        x1, y1, x2, y2 = resultado.BoundingBox(nivel)
+        palavras.append([texto, x1, y1, x2 - x1, y2 - y1, round(max(resultado.Confidence(nivel), 0.0), 1), linha])
+
+
+def reconhecer_texto(imagem, backend=None, psm=None, palavras=None):
+    """
+    Executa o Tesseract no backend configurado
+
+    Args:
+        imagem: PIL Image ou path de um arquivo de imagem
+        backend: "pytesseract" ou "tesserocr" (padrão OCR_BACKEND)
+        psm: Modo de segmentação de página (padrão do Tesseract: 3, automático)
+        palavras: Lista opcional preenchida com as palavras reconhecidas
+                  ([texto, x, y, largura, altura, confianca, linha])
+
+    Returns:
+        Texto reconhecido
+    """
+    backend = backend or OCR_BACKEND
+
+    if backend == 'tesserocr':
+        api = _obter_motor_tesserocr()
+        try:
+            # A API é reaproveitada: sempre define o modo desta chamada
+            api.SetPageSegMode(psm if psm is not None else tesserocr.PSM.AUTO)
+            if isinstance(imagem, str):
+                api.SetImageFile(imagem)
+            else:
+                api.SetImage(imagem)
+            texto = api.GetUTF8Text()
+            if palavras is not None:
+                _palavras_tesserocr(api, palavras)
+            return texto
+        finally:
+            api.Clear()
+
+    config = f'--psm {psm}' if psm is not None else ''
+    # O texto vem sempre do image_to_string (mesmas quebras de linha e
+    # espaços de antes para analisar_valores_monetarios); as caixas à parte
+    texto = pytesseract.image_to_string(imagem, lang=OCR_IDIOMA, config=config)
+    if palavras is not None:
+        dados = pytesseract.image_to_data(imagem, lang=OCR_IDIOMA, config=config, output_type=pytesseract.Output.DICT)
+        palavras.extend(palavras_de_image_to_data(dados))
+    return texto
+
+
+# Pré-processamento das imagens antes do Tesseract (cada etapa pode ser desligada)
+# - rotacao_exif: aplica a orientação gravada pela câmera do celular
+# - escala_cinza: descarta a cor (o Tesseract trabalha em tons de cinza)
+# - dpi_alvo / altura_maxima: reduz fotos grandes (0 desliga o limite)
+# - binarizar: limiar adaptativo pela média local (raio e limiar em níveis de cinza)
+PREPROCESSAMENTO_PADRAO = {
+    'ativo': _env_bool('OCR_PREPROCESSAR', 'true'),
+    'rotacao_exif': _env_bool('OCR_PRE_ROTACAO_EXIF', 'true'),
+    'escala_cinza': _env_bool('OCR_PRE_ESCALA_CINZA', 'true'),
+    'dpi_alvo': int(os.environ.get('OCR_PRE_DPI_ALVO', '300')),
+    'altura_maxima': int(os.environ.get('OCR_PRE_ALTURA_MAXIMA', '2400')),
+    'binarizar': _env_bool('OCR_PRE_BINARIZAR', 'true'),
+    'raio_binarizacao': int(os.environ.get('OCR_PRE_RAIO_BINARIZACAO', '15')),
+    'limiar_binarizacao': int(os.environ.get('OCR_PRE_LIMIAR_BINARIZACAO', '10')),
+}
+
+
+def _binarizar_adaptativo(imagem, raio, limiar):
+    """
+    Preto onde o pixel é mais escuro que a média da vizinhança por mais
+    de `limiar` níveis; branco no resto. Lida com sombras e fundo
+    irregular de fotos, ao contrário de um limiar global
+    """
+    media = imagem.filter(ImageFilter.BoxBlur(raio))
+    diferenca = ImageChops.subtract(media, imagem)  # média - pixel (saturado em 0)
+    return diferenca.point(lambda p: 0 if p > limiar else 255)
+
+
+def preprocessar_imagem(imagem, opcoes=None):
+    """
+    Prepara uma imagem para o OCR: rotação EXIF, tons de cinza,
+    redução de tamanho e binarização adaptativa
+
+    Args:
+        imagem: PIL Image
+        opcoes: Dict sobrescrevendo chaves de PREPROCESSAMENTO_PADRAO
+
+    Returns:
+        Tuple (imagem processada, tempos em ms por etapa)
+    """
+    opcoes = {**PREPROCESSAMENTO_PADRAO, **(opcoes or {})}
+    tempos = {}
+
+    if not opcoes['ativo']:
+        return imagem, tempos
+
+    def medir(nome, inicio):
+        tempos[nome] = round((time.perf_counter() - inicio) * 1000, 2)
+
+    if opcoes['rotacao_exif']:
+        inicio = time.perf_counter()
+        # 0x0112 = Orientation; sem rotação registrada evita copiar a imagem
+        if imagem.getexif().get(0x0112, 1) != 1:
+            imagem = ImageOps.exif_transpose(imagem)
+        medir('rotacao_exif', inicio)
+
+    if opcoes['escala_cinza'] or opcoes['binarizar']:
+        inicio = time.perf_counter()
+        if imagem.mode != 'L':
+            imagem = imagem.convert('L')
+        medir('escala_cinza', inicio)
+
+    fatores = []
+    dpi_origem = imagem.info.get('dpi', (0, 0))[1]
+    if opcoes['dpi_alvo'] and dpi_origem and dpi_origem > opcoes['dpi_alvo']:
+        fatores.append(opcoes['dpi_alvo'] / dpi_origem)
+    if opcoes['altura_maxima'] and imagem.height > opcoes['altura_maxima']:
+        fatores.append(opcoes['altura_maxima'] / imagem.height)
+    if fatores:
+        inicio = time.perf_counter()
+        fator = min(fatores)
+        tamanho = (max(1, round(imagem.width * fator)), max(1, round(imagem.height * fator)))
+        # reducing_gap reduz primeiro por um fator inteiro (rápido) e depois refina
+        imagem = imagem.resize(tamanho, Image.LANCZOS, reducing_gap=3.0)
+        medir('redimensionar', inicio)
+
+    if opcoes['binarizar']:
+        inicio = time.perf_counter()
+        imagem = _binarizar_adaptativo(imagem, opcoes['raio_binarizacao'], opcoes['limiar_binarizacao'])
+        medir('binarizar', inicio)
+
+    return imagem, tempos
+
+
+def extrair_texto_imagem(caminho_imagem, opcoes_preprocessamento=None, tempos=None, backend=None, psm=None,
+                         palavras=None):
     """
     Extrai texto de uma imagem usando OCR
+
+    Args:
+        caminho_imagem: Path da imagem (ou arquivo já aberto, ex: BytesIO)
+        opcoes_preprocessamento: Dict com opções de preprocessar_imagem
+        tempos: Dict opcional preenchido com o tempo (ms) de cada etapa
+        backend: Backend do OCR (padrão OCR_BACKEND)
+        psm: Modo de segmentação do Tesseract (padrão automático)
+        palavras: Lista opcional; recebe a página com as palavras reconhecidas
+                  ({'pagina', 'largura', 'altura', 'palavras'})
     """
     try:
-        imagem = Image.open(caminho_imagem)
-        texto = pytesseract.image_to_string(imagem, lang='por')
+        opcoes = {**PREPROCESSAMENTO_PADRAO, **(opcoes_preprocessamento or {})}
+        altura_maxima = None
+        modo = None
+        if opcoes['ativo']:
+            # Só decodifica a resolução que o pré-processamento vai usar
+            altura_maxima = opcoes['altura_maxima'] or None
+            modo = 'L' if opcoes['escala_cinza'] or opcoes['binarizar'] else None
+
+        inicio = time.perf_counter()
+        with abrir_imagem(caminho_imagem, altura_maxima, modo=modo, rotacao_exif=opcoes['rotacao_exif']) as imagem:
+            tempo_abrir = round((time.perf_counter() - inicio) * 1000, 2)
+            processada, tempos_etapas = preprocessar_imagem(imagem, opcoes)
+            tempos_etapas['abrir'] = tempo_abrir
+
+            inicio = time.perf_counter()
+            reconhecidas = [] if palavras is not None else None
+            texto = reconhecer_texto(processada, backend, psm, reconhecidas)
+            tempos_etapas['ocr'] = round((time.perf_counter() - inicio) * 1000, 2)
+            if palavras is not None:
+                palavras.append({
+                    'pagina': 1, 'largura': processada.width, 'altura': processada.height, 'palavras': reconhecidas
+                })
+
+            if processada is not imagem:
+                processada.close()
+
+        if tempos is not None:
+            tempos.update(tempos_etapas)
         return texto
     except Exception as e:
         return f"Erro ao processar OCR: {e}"
 
 
-def extrair_texto_pdf(caminho_pdf):
+def _iniciar_worker_pagina():
+    """
+    Limita o Tesseract a uma thread por processo: o paralelismo vem
+    das páginas, e o OpenMP do Tesseract só disputaria os mesmos cores
+    """
+    os.environ['OMP_THREAD_LIMIT'] = '1'
+    limitar_memoria_processo()
+
+
+def _dpi_limitado(info_pdf, dpi=OCR_PDF_DPI, max_pixels=OCR_PDF_MAX_PIXELS):
     """
-    Converte PDF para imagens e extrai texto de cada página
+    Reduz o DPI para que a maior página do PDF não passe de max_pixels
+
+    Args:
+        info_pdf: Dict retornado por pdfinfo_from_path (com first/last_page
+                  o pdfinfo lista o tamanho de cada página)
+    """
+    maior_area = 0.0
+    for chave, valor in info_pdf.items():
+        if not re.match(r'Page\s*\d*\s*size', chave):
+            continue
+        medidas = re.match(r'([\d.]+)\s*x\s*([\d.]+)\s*pts', str(valor))
+        if medidas:
+            # pts -> polegadas (72 pts por polegada)
+            area = (float(medidas.group(1)) / 72) * (float(medidas.group(2)) / 72)
+            maior_area = max(maior_area, area)
+
+    if not maior_area:
+        return dpi
+
+    dpi_maximo = int((max_pixels / maior_area) ** 0.5)
+    return max(1, min(dpi, dpi_maximo))
+
+
+def _ocr_paginas_pdf(caminho_pdf, primeira, ultima, dpi=OCR_PDF_DPI, backend=None, com_palavras=False):
+    """
+    Rasteriza uma janela de páginas do PDF e faz OCR de cada uma
+
+    As páginas vão para arquivos temporários (o poppler escreve direto em
+    disco) e o Tesseract lê cada arquivo; nenhuma página é decodificada
+    na memória do Python, então o pico não cresce com o tamanho do PDF
+
+    Returns:
+        Lista de (texto, palavras) de cada página, na ordem; palavras é
+        None sem com_palavras
+    """
+    resultados = []
+    with tempfile.TemporaryDirectory() as pasta:
+        caminhos = convert_from_path(
+            caminho_pdf, dpi=dpi, first_page=primeira, last_page=ultima,
+            output_folder=pasta, paths_only=True
+        )
+        for caminho_pagina in caminhos:
+            if com_palavras:
+                reconhecidas = []
+                texto = reconhecer_texto(caminho_pagina, backend, palavras=reconhecidas)
+                # Só o cabeçalho é lido para saber o tamanho da página
+                with Image.open(caminho_pagina) as pagina:
+                    largura, altura = pagina.size
+                resultados.append((texto, {'largura': largura, 'altura': altura, 'palavras': reconhecidas}))
+            else:
+                resultados.append((reconhecer_texto(caminho_pagina, backend), None))
+            os.remove(caminho_pagina)
+    return resultados
+
+
+def extrair_camada_texto_pdf(caminho_pdf, max_paginas=None):
     """
+    Lê a camada de texto embutida no PDF com o pdftotext (poppler)
+    PDFs gerados por sistema (NF-e, DANFE) já trazem o texto pronto
+
+    Returns:
+        Lista com o texto de cada página (na ordem), ou None se o
+        pdftotext falhar ou não estiver instalado
+    """
+    comando = ['pdftotext', '-layout', '-enc', 'UTF-8', '-f', '1']
+    if max_paginas:
+        comando += ['-l', str(max_paginas)]
+    comando += [caminho_pdf, '-']
+
     try:
-        # Converte todas as páginas do PDF em imagens
-        imagens = convert_from_path(caminho_pdf, dpi=300)
+        resultado = subprocess.run(comando, capture_output=True, timeout=60)
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    if resultado.returncode != 0:
+        return None
+
+    # Cada página termina com um form feed (\f)
+    paginas = resultado.stdout.decode('utf-8', 'ignore').split('\f')
+    return paginas[:-1] if len(paginas) > 1 else paginas
+
+
+def _texto_utilizavel(texto, minimo=None):
+    """Página com caracteres alfanuméricos suficientes para dispensar o OCR"""
+    minimo = OCR_PDF_TEXTO_MINIMO if minimo is None else minimo
+    return sum(1 for c in texto if c.isalnum()) >= minimo
+
+
+def _agrupar_janelas(paginas, janela):
+    """
+    Agrupa páginas em faixas consecutivas de até `janela` páginas
+    Ex: [1, 2, 3, 5], janela=2 -> [(1, 2), (3, 3), (5, 5)]
+    """
+    janelas = []
+    for numero in paginas:
+        if janelas and numero == janelas[-1][1] + 1 and numero - janelas[-1][0] < janela:
+            janelas[-1] = (janelas[-1][0], numero)
+        else:
+            janelas.append((numero, numero))
+    return janelas
+
+
+def extrair_texto_pdf(caminho_pdf, workers=None, max_paginas=None, max_pixels=None, janela=None, backend=None,
+                      usar_camada_texto=None, paginas=None, dpi=None, palavras=None):
+    """
+    Extrai o texto de cada página do PDF
+
+    Páginas com camada de texto embutida usam esse texto direto; só as
+    demais são rasterizadas e passam pelo OCR. A rasterização é feita em
+    janelas pequenas (streaming); com mais de uma janela, o OCR roda em
+    paralelo num pool de processos e o texto é remontado na ordem original
+
+    Args:
+        caminho_pdf: Path do arquivo PDF
+        workers: Processos do pool (padrão OCR_PDF_WORKERS)
+        max_paginas: Páginas processadas (padrão OCR_PDF_MAX_PAGINAS)
+        max_pixels: Pixels por página (padrão OCR_PDF_MAX_PIXELS)
+        janela: Páginas por renderização (padrão OCR_PDF_JANELA_PAGINAS)
+        backend: Backend do OCR (padrão OCR_BACKEND)
+        usar_camada_texto: Tenta o texto embutido antes do OCR (padrão OCR_PDF_CAMADA_TEXTO)
+        paginas: Lista opcional preenchida com {'pagina', 'origem'} de cada
+                 página ('texto' = camada embutida, 'ocr' = Tesseract)
+        dpi: Resolução da rasterização (padrão OCR_PDF_DPI)
+        palavras: Lista opcional preenchida com as palavras de cada página
+                  que passou pelo OCR (páginas da camada de texto não têm caixas)
+    """
+    try:
+        max_paginas = max_paginas or OCR_PDF_MAX_PAGINAS
+        janela = max(1, janela or OCR_PDF_JANELA_PAGINAS)
+        if usar_camada_texto is None:
+            usar_camada_texto = OCR_PDF_CAMADA_TEXTO
+
+        info = pdfinfo_from_path(caminho_pdf, first_page=1, last_page=max_paginas)
+        total_paginas = int(info['Pages'])
+        paginas_ocr = min(total_paginas, max_paginas)
+
+        textos = {}
+        if usar_camada_texto:
+            camada = extrair_camada_texto_pdf(caminho_pdf, paginas_ocr) or []
+            for numero, texto_pagina in enumerate(camada[:paginas_ocr], start=1):
+                if _texto_utilizavel(texto_pagina):
+                    textos[numero] = texto_pagina
+
+        sem_texto = [n for n in range(1, paginas_ocr + 1) if n not in textos]
+        janelas = _agrupar_janelas(sem_texto, janela)
+
+        if janelas:
+            dpi = _dpi_limitado(info, dpi or OCR_PDF_DPI, max_pixels or OCR_PDF_MAX_PIXELS)
+            workers = min(workers or OCR_PDF_WORKERS, len(janelas))
+
+            com_palavras = palavras is not None
+            if workers <= 1:
+                textos_janelas = [
+                    _ocr_paginas_pdf(caminho_pdf, primeira, ultima, dpi, backend, com_palavras)
+                    for primeira, ultima in janelas
+                ]
+            else:
+                with ProcessPoolExecutor(max_workers=workers, initializer=_iniciar_worker_pagina) as pool:
+                    # map preserva a ordem das janelas
+                    textos_janelas = list(pool.map(
+                        _ocr_paginas_pdf,
+                        [caminho_pdf] * len(janelas),
+                        [primeira for primeira, _ in janelas],
+                        [ultima for _, ultima in janelas],
+                        [dpi] * len(janelas),
+                        [backend] * len(janelas),
+                        [com_palavras] * len(janelas)
+                    ))
+
+            for (primeira, _), textos_janela in zip(janelas, textos_janelas):
+                for deslocamento, (texto_pagina, palavras_pagina) in enumerate(textos_janela):
+                    textos[primeira + deslocamento] = texto_pagina
+                    if palavras_pagina is not None:
+                        palavras.append({'pagina': primeira + deslocamento, **palavras_pagina})
+
         texto_completo = ""
-        
-        for i, imagem in enumerate(imagens):
-            texto_pagina = pytesseract.image_to_string(imagem, lang='por')
-            texto_completo += f"\n--- Página {i+1} ---\n{texto_pagina}"
-        
+        for numero in range(1, paginas_ocr + 1):
+            texto_completo += f"\n--- Página {numero} ---\n{textos.get(numero, '')}"
+            if paginas is not None:
+                paginas.append({'pagina': numero, 'origem': 'ocr' if numero in sem_texto else 'texto'})
+
+        if total_paginas > paginas_ocr:
+            texto_completo += (
+                f"\n--- Páginas {paginas_ocr+1} a {total_paginas} não processadas "
+                f"(limite de {max_paginas} páginas) ---\n"
+            )
+
         return texto_completo
     except Exception as e:
         return f"Erro ao processar PDF: {e}"
 
 
+# Valor monetário brasileiro, com ou sem "R$": 1.234,56 | 123,45
+# A varredura procura só os centavos (",99"), que começam com um literal
+# e por isso são localizados rápido pelo motor de regex; a parte inteira
+# e o "R$" são conferidos logo antes de cada vírgula. Cada trecho do
+# texto vira no máximo um candidato (dedupe por posição)
+_PADRAO_CENTAVOS = re.compile(r',\d{2}(?![\d,])')
+_PADRAO_INTEIRO = re.compile(r'(?<![\d.,])(?:\d{1,3}(?:\.\d{3})+|\d+)\Z')
+_PADRAO_MOEDA = re.compile(r'R\$\s*\Z', re.IGNORECASE)
+
+# Maior parte inteira considerada (999.999.999.999 tem 15 caracteres)
+_MAX_DIGITOS_INTEIRO = 20
+
+# Palavras que indicam o papel do valor na linha (a mais próxima vale)
+# Aplicada sobre o texto em minúsculas: sem IGNORECASE a busca é bem mais rápida
+_PALAVRAS_CHAVE = r'subtotal|total|valor|importo|troco|desconto|tributos?|impostos?'
+_PADRAO_PALAVRA_CHAVE = re.compile(_PALAVRAS_CHAVE)
+_PADRAO_PALAVRA_CHAVE_IGNORECASE = re.compile(_PALAVRAS_CHAVE, re.IGNORECASE)
+
+# Peso de cada palavra-chave no ranking do valor total
+PESO_PALAVRA_CHAVE = {
+    'total': 3,
+    'valor': 2,
+    'importo': 2,
+    'subtotal': 1,
+    'troco': -1,
+    'desconto': -1,
+    'tributo': -1,
+    'tributos': -1,
+    'imposto': -1,
+    'impostos': -1,
+}
+
+
+def analisar_valores_monetarios(texto, limite_candidatos=None):
+    """
+    Extrai os valores monetários do texto numa única passada e ranqueia
+    os candidatos a valor total
+
+    Para cada valor registra a linha, se tinha "R$" e a palavra-chave
+    mais próxima antes dele na mesma linha (total, subtotal, troco...)
+
+    Args:
+        texto: Texto extraído pelo OCR
+        limite_candidatos: Quantos candidatos ranqueados devolver (None = todos)
+
+    Returns:
+        Dict com:
+        - valores: Decimals na ordem em que aparecem no texto
+        - candidatos: dicts ranqueados (mais provável total primeiro)
+        - valor_total: valor escolhido (Decimal) ou None
+    """
+    texto = texto or ''
+    tamanho = len(texto)
+    encontrados = []
+    linha = 1
+    posicao_linha = 0
+    inicio_linha = 0
+
+    # As palavras-chave são percorridas junto com os valores (merge de
+    # dois iteradores em ordem), sem reler cada linha
+    minusculo = texto.lower()
+    if len(minusculo) == tamanho:
+        palavras = _PADRAO_PALAVRA_CHAVE.finditer(minusculo)
+    else:
+        # Alguns caracteres Unicode mudam de tamanho no lower(); as posições não batem
+        palavras = _PADRAO_PALAVRA_CHAVE_IGNORECASE.finditer(texto)
+    proxima_palavra = next(palavras, None)
+    ultima_palavra = None
+
+    for centavos in _PADRAO_CENTAVOS.finditer(texto):
+        virgula, fim = centavos.span()
+        inteiro = _PADRAO_INTEIRO.search(texto, max(0, virgula - _MAX_DIGITOS_INTEIRO), virgula)
+        if not inteiro:
+            continue
+        inicio = inteiro.start()
+
+        moeda = _PADRAO_MOEDA.search(texto, max(0, inicio - 8), inicio)
+        if moeda:
+            inicio_contexto = moeda.start()
+        else:
+            # Sem "R$", o número precisa estar separado do resto do texto
+            anterior = texto[inicio - 1] if inicio else ' '
+            seguinte = texto[fim] if fim < tamanho else ' '
+            if not (anterior.isspace() or anterior in ':$') or seguinte.isalnum() or seguinte == '%':
+                continue
+            inicio_contexto = inicio
+
+        # Atualiza a linha atual de forma incremental
+        quebras = texto.count('\n', posicao_linha, inicio)
+        if quebras:
+            linha += quebras
+            inicio_linha = texto.rfind('\n', posicao_linha, inicio) + 1
+        posicao_linha = inicio
+
+        while proxima_palavra is not None and proxima_palavra.end() <= inicio_contexto:
+            ultima_palavra = proxima_palavra
+            proxima_palavra = next(palavras, None)
+
+        if ultima_palavra is not None and ultima_palavra.start() >= inicio_linha:
+            palavra_chave = ultima_palavra.group(0).lower()
+            distancia = inicio_contexto - ultima_palavra.end()
+        else:
+            palavra_chave = None
+            distancia = None
+
+        valor = Decimal(f"{texto[inicio:virgula].replace('.', '')}.{texto[virgula + 1:fim]}")
+        peso = PESO_PALAVRA_CHAVE.get(palavra_chave, 0)
+        encontrados.append((valor, inicio, fim, linha, moeda is not None, palavra_chave, distancia, peso))
+
+    # Mais provável total: maior peso da palavra-chave, depois maior valor
+    def ordem(candidato):
+        return (-candidato[7], -candidato[0], candidato[1])
+
+    if limite_candidatos is None:
+        ranqueados = sorted(encontrados, key=ordem)
+    else:
+        ranqueados = heapq.nsmallest(limite_candidatos, encontrados, key=ordem)
+
+    candidatos = [
+        {
+            'valor': valor,
+            'inicio': inicio,
+            'fim': fim,
+            'linha': linha,
+            'moeda': moeda,
+            'palavra_chave': palavra_chave,
+            'distancia_palavra_chave': distancia,
+            'peso': peso
+        }
+        for valor, inicio, fim, linha, moeda, palavra_chave, distancia, peso in ranqueados
+    ]
+
+    return {
+        'valores': [c[0] for c in encontrados],
+        'candidatos': candidatos,
+        'valor_total': candidatos[0]['valor'] if candidatos else None
+    }
+
+
 def extrair_valores_monetarios(texto):
     """
     Extrai todos os valores monetários do texto usando regex
-    Retorna uma lista de valores encontrados
+    Retorna uma lista de valores encontrados (sem repetir o mesmo trecho)
     
     Padrões suportados:
     - R$ 123,45
@@ -52,29 +790,7 @@ def extrair_valores_monetarios(texto):
     - R$123.45
     - 1.234,56
     """
-    # Padrões de valores monetários em português brasileiro
-    padroes = [
-        r'R\$\s*(\d{1,3}(?:\.\d{3})*(?:,\d{2}))',  # R$ 1.234,56
-        r'R\$\s*(\d+,\d{2})',                        # R$ 123,45
-        r'(?:^|\s)(\d{1,3}(?:\.\d{3})*,\d{2})(?:\s|$)',  # 1.234,56 (isolado)
-        r'(?:total|valor|subtotal|importo)[\s:]+R?\$?\s*(\d{1,3}(?:\.\d{3})*,\d{2})',  # Após palavras-chave
-    ]
-    
-    valores_encontrados = []
-    
-    for padrao in padroes:
-        matches = re.finditer(padrao, texto, re.IGNORECASE)
-        for match in matches:
-            valor_str = match.group(1)
-            # Converte o formato brasileiro para decimal
-            valor_str = valor_str.replace('.', '').replace(',', '.')
-            try:
-                valor = Decimal(valor_str)
-                valores_encontrados.append(valor)
-            except:
-                continue
-    
-    return valores_encontrados
+    return analisar_valores_monetarios(texto)['valores']
 
 
 def encontrar_maior_valor(texto):
@@ -88,24 +804,93 @@ def encontrar_maior_valor(texto):
     return None
 
 
-def processar_arquivo(caminho_arquivo):
+def _extrair_texto(caminho_arquivo, nivel, opcoes_preprocessamento, backend, tempos, paginas, conteudo=None,
+                   palavras=None):
     """
-    Processa arquivo (imagem ou PDF) e extrai texto e valores
+    Uma passada de OCR no nível indicado ('rapido' ou 'completo')
     """
     extensao = os.path.splitext(caminho_arquivo)[1].lower()
-    
+    rapido = nivel == 'rapido'
+
     # Verifica se é PDF
     if extensao == '.pdf':
-        texto = extrair_texto_pdf(caminho_arquivo)
-    else:
-        # Assume que é imagem (jpg, png, etc)
-        texto = extrair_texto_imagem(caminho_arquivo)
-    
-    # Extrai o maior valor (provável valor total)
-    valor_extraido = encontrar_maior_valor(texto)
-    
+        inicio = time.perf_counter()
+        texto = extrair_texto_pdf(
+            caminho_arquivo, backend=backend, paginas=paginas,
+            dpi=OCR_RAPIDO_PDF_DPI if rapido else None, palavras=palavras
+        )
+        tempos['ocr_pdf'] = round((time.perf_counter() - inicio) * 1000, 2)
+        return texto
+
+    # Assume que é imagem (jpg, png, etc)
+    opcoes = dict(opcoes_preprocessamento or {})
+    psm = None
+    if rapido:
+        altura = opcoes.get('altura_maxima', PREPROCESSAMENTO_PADRAO['altura_maxima'])
+        opcoes['altura_maxima'] = min(altura, OCR_RAPIDO_ALTURA_MAXIMA) if altura else OCR_RAPIDO_ALTURA_MAXIMA
+        psm = OCR_RAPIDO_PSM
+
+    origem = io.BytesIO(conteudo) if conteudo is not None else caminho_arquivo
+    texto = extrair_texto_imagem(origem, opcoes, tempos, backend, psm, palavras)
+    paginas.append({'pagina': 1, 'origem': 'ocr'})
+    return texto
+
+
+def processar_arquivo(caminho_arquivo, opcoes_preprocessamento=None, backend=None, escalonar=None, conteudo=None,
+                      com_palavras=None):
+    """
+    Processa arquivo (imagem ou PDF) e extrai texto e valores
+
+    Com escalonamento, roda primeiro o nível rápido (imagem reduzida,
+    segmentação de bloco único, PDF em DPI baixo) e só repete no nível
+    completo se nenhum valor for encontrado
+
+    Args:
+        caminho_arquivo: Path do arquivo
+        opcoes_preprocessamento: Opções de preprocessar_imagem (só imagens)
+        backend: Backend do OCR (padrão OCR_BACKEND)
+        escalonar: Usa os níveis rápido/completo (padrão OCR_NIVEIS)
+        conteudo: Bytes da imagem já em memória (evita reler o arquivo;
+                  ignorado para PDF, que o poppler lê do disco)
+        com_palavras: Devolve também as palavras com caixa e confiança
+                      (padrão OCR_PALAVRAS)
+    """
+    backend = backend or OCR_BACKEND
+    if escalonar is None:
+        escalonar = OCR_NIVEIS
+    if com_palavras is None:
+        com_palavras = OCR_PALAVRAS
+    niveis = ['rapido', 'completo'] if escalonar else ['completo']
+    tempos = {}
+    tempos_niveis = {}
+
+    for nivel in niveis:
+        paginas = []
+        palavras = [] if com_palavras else None
+        inicio_nivel = time.perf_counter()
+        texto = _extrair_texto(
+            caminho_arquivo, nivel, opcoes_preprocessamento, backend, tempos, paginas, conteudo, palavras
+        )
+
+        # Uma passada só: valores, ranking e provável valor total
+        inicio = time.perf_counter()
+        analise = analisar_valores_monetarios(texto, limite_candidatos=10)
+        tempos['extracao_valores'] = round((time.perf_counter() - inicio) * 1000, 2)
+
+        tempos_niveis[nivel] = round((time.perf_counter() - inicio_nivel) * 1000, 2)
+        if analise['valor_total'] is not None:
+            break
+
+    tempos['niveis'] = tempos_niveis
+
     return {
         'texto': texto,
-        'valor_extraido': valor_extraido,
-        'valores_encontrados': extrair_valores_monetarios(texto)
+        'valor_extraido': analise['valor_total'],
+        'valores_encontrados': analise['valores'],
+        'candidatos_valor': analise['candidatos'],
+        'tempos_ms': tempos,
+        'backend_ocr': backend,
+        'paginas': paginas,
+        'nivel_ocr': nivel,
+        'palavras': montar_estrutura(palavras) if palavras else None
     }
@@ -0,0 +1,152 @@
+"""
+Palavras reconhecidas pelo Tesseract: texto, caixa e confiança
+
+O image_to_data devolve a posição e a confiança de cada palavra (o texto
+gravado continua vindo do image_to_string). Essa estrutura é gravada junto do
+Comprovante (palavras_ocr) para que a análise depois (localizar o valor,
+extrair campos, avaliar legibilidade) não precise rodar o OCR de novo.
+
+Formato compacto (JSON), coordenadas em pixels da imagem enviada ao OCR:
+{"v": 1, "confianca_media": 87.4, "paginas": [
+    {"pagina": 1, "largura": 1240, "altura": 2400,
+     "palavras": [["TOTAL", x, y, largura, altura, confianca, linha], ...]}
+]}
+"""
+import json
+import os
+import re
+
+VERSAO = 1
+
+# Confiança média (0-100) a partir da qual o comprovante é considerado legível
+CONFIANCA_LEGIVEL = float(os.environ.get('OCR_CONFIANCA_LEGIVEL', '60'))
+
+# Palavras abaixo desta confiança contam como "ruins" no resumo de legibilidade
+CONFIANCA_BAIXA = 50
+
+# Posições em cada palavra compacta
+TEXTO, X, Y, LARGURA, ALTURA, CONFIANCA, LINHA = range(7)
+
+
+def palavras_de_image_to_data(dados):
+    """
+    Converte a saída de pytesseract.image_to_data (Output.DICT)
+
+    As linhas são numeradas a partir de 0, na ordem em que aparecem
+    (cada bloco/parágrafo/linha com alguma palavra conta uma vez)
+
+    Returns:
+        Lista de palavras compactas
+    """
+    palavras = []
+    linha_atual = None
+    linha = -1
+
+    for i, texto in enumerate(dados['text']):
+        texto = (texto or '').strip()
+        if not texto:
+            continue
+
+        chave_linha = (dados['page_num'][i], dados['block_num'][i], dados['par_num'][i], dados['line_num'][i])
+        if chave_linha != linha_atual:
+            linha += 1
+            linha_atual = chave_linha
+
+        palavras.append([
+            texto, int(dados['left'][i]), int(dados['top'][i]), int(dados['width'][i]), int(dados['height'][i]),
+            round(max(float(dados['conf'][i]), 0.0), 1), linha
+        ])
+
+    return palavras
+
+
+def montar_estrutura(paginas):
+    """Lista de {'pagina', 'largura', 'altura', 'palavras'} -> estrutura gravada"""
+    confiancas = [p[CONFIANCA] for pagina in paginas for p in pagina['palavras']]
+    return {
+        'v': VERSAO,
+        'confianca_media': round(sum(confiancas) / len(confiancas), 1) if confiancas else None,
+        'paginas': paginas
+    }
+
+
+def serializar(estrutura):
+    """Estrutura -> JSON sem espaços (None se não houver)"""
+    if not estrutura:
+        return None
+    return json.dumps(estrutura, ensure_ascii=False, separators=(',', ':'))
+
+
+def carregar(palavras_ocr):
+    """JSON gravado -> estrutura (None se vazio, inválido ou de outra versão)"""
+    if not palavras_ocr:
+        return None
+    try:
+        estrutura = json.loads(palavras_ocr)
+    except ValueError:
+        return None
+    return estrutura if estrutura.get('v') == VERSAO else None
+
+
+def resumo_legibilidade(estrutura):
+    """
+    Legibilidade pelo OCR: confiança média e parcela de palavras ruins
+
+    Returns:
+        Dict com palavras, confianca_media, percentual_baixa_confianca e
+        legivel, ou None sem estrutura
+    """
+    if not estrutura:
+        return None
+
+    palavras = [p for pagina in estrutura['paginas'] for p in pagina['palavras']]
+    if not palavras:
+        return {'palavras': 0, 'confianca_media': None, 'percentual_baixa_confianca': None, 'legivel': False}
+
+    media = estrutura.get('confianca_media') or 0.0
+    baixas = sum(1 for p in palavras if p[CONFIANCA] < CONFIANCA_BAIXA)
+    return {
+        'palavras': len(palavras),
+        'confianca_media': media,
+        'percentual_baixa_confianca': round(baixas / len(palavras) * 100, 1),
+        'legivel': media >= CONFIANCA_LEGIVEL
+    }
+
+
+def _formatos_valor(valor):
+    """150.5 -> {'150,50', '150.50'}; 1234.5 -> também '1.234,50'"""
+    centavos = f'{float(valor):.2f}'
+    inteiro, decimal = centavos.split('.')
+    milhar = f'{int(inteiro):,}'.replace(',', '.')
+    return {f'{inteiro},{decimal}', f'{milhar},{decimal}', centavos}
+
+
+def localizar_valor(estrutura, valor):
+    """
+    Caixa da palavra com o valor (ex: total do cupom)
+    Com várias ocorrências, fica a última: o total vem no fim do cupom
+
+    Returns:
+        Dict com pagina, caixa [x, y, largura, altura], confianca e
+        linha (texto da linha inteira), ou None se não encontrar
+    """
+    if not estrutura or valor is None:
+        return None
+
+    formatos = _formatos_valor(valor)
+    encontrada = None
+    for pagina in estrutura['paginas']:
+        for palavra in pagina['palavras']:
+            if re.sub(r'^R\$', '', palavra[TEXTO]) in formatos:
+                encontrada = (pagina, palavra)
+
+    if not encontrada:
+        return None
+
+    pagina, palavra = encontrada
+    return {
+        'pagina': pagina['pagina'],
+        'caixa': palavra[X:CONFIANCA],
+        'confianca': palavra[CONFIANCA],
+        'linha': ' '.join(p[TEXTO] for p in pagina['palavras'] if p[LINHA] == palavra[LINHA])
+    }
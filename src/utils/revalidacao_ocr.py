@@ -0,0 +1,120 @@
+"""
+Revalidação em lote dos comprovantes
+
+Recalcula status_validacao e discrepancia_percentual de muitos
+comprovantes de uma vez (ex: o financeiro corrigiu o valor_faturado de
+vários reembolsos ou a tolerância mudou). Lê só as colunas necessárias
+em lotes por faixa de id (sem carregar objetos do ORM nem o texto do
+OCR), aplica a mesma regra de validar_valores e grava apenas as linhas
+que mudaram, com um UPDATE executemany e um commit por lote
+"""
+import time
+from datetime import datetime
+from sqlalchemy import select, bindparam
+from src.model import db
+from src.model.comprovante_model import Comprovante
+from src.model.reembolso_model import Reembolso
+from src.utils.validacao_ocr import validar_valores, TOLERANCIA_PERCENTUAL
+
+TAMANHO_LOTE_PADRAO = 1000
+
+
+def revalidar_comprovantes(reembolso_ids=None, status_validacao=None, data_inicio=None, data_fim=None,
+                           tolerancia=None, tamanho_lote=TAMANHO_LOTE_PADRAO, simular=False):
+    """
+    Revalida os comprovantes que passam nos filtros
+
+    Args:
+        reembolso_ids: Lista de num_prestacao (None = todos)
+        status_validacao: Lista de status atuais a revalidar (ex: ['Pendente', 'Divergente'])
+        data_inicio / data_fim: Faixa de data_criacao do comprovante (datetime)
+        tolerancia: Percentual aceito (padrão TOLERANCIA_PERCENTUAL)
+        tamanho_lote: Linhas lidas/gravadas por vez
+        simular: Só conta o que mudaria, sem gravar
+
+    Returns:
+        Dict com processados, alterados, transições de status, lotes,
+        tempo_ms e linhas_por_segundo
+    """
+    if tolerancia is None:
+        tolerancia = TOLERANCIA_PERCENTUAL
+
+    tabela = Comprovante.__table__
+    consulta = select(
+        tabela.c.id, tabela.c.valor_extraido, tabela.c.status_validacao, tabela.c.discrepancia_percentual,
+        Reembolso.__table__.c.valor_faturado
+    ).join(Reembolso.__table__, Reembolso.__table__.c.num_prestacao == tabela.c.reembolso_id)
+
+    if reembolso_ids:
+        consulta = consulta.where(tabela.c.reembolso_id.in_(reembolso_ids))
+    if status_validacao:
+        consulta = consulta.where(tabela.c.status_validacao.in_(status_validacao))
+    if data_inicio:
+        consulta = consulta.where(tabela.c.data_criacao >= data_inicio)
+    if data_fim:
+        consulta = consulta.where(tabela.c.data_criacao < data_fim)
+
+    atualizar = tabela.update().where(tabela.c.id == bindparam('b_id')).values(
+        status_validacao=bindparam('b_status'),
+        discrepancia_percentual=bindparam('b_discrepancia')
+    )
+
+    processados = 0
+    alterados = 0
+    lotes = 0
+    transicoes = {}
+    ultimo_id = 0
+    inicio = time.perf_counter()
+
+    while True:
+        # Faixa de id em vez de OFFSET: cada lote começa onde o anterior parou
+        linhas = db.session.execute(
+            consulta.where(tabela.c.id > ultimo_id).order_by(tabela.c.id).limit(tamanho_lote)
+        ).all()
+        if not linhas:
+            break
+
+        mudancas = []
+        for linha in linhas:
+            validacao = validar_valores(linha.valor_faturado, linha.valor_extraido, tolerancia)
+            if validacao['status'] == linha.status_validacao and validacao['discrepancia'] == linha.discrepancia_percentual:
+                continue
+
+            chave = f"{linha.status_validacao} -> {validacao['status']}"
+            transicoes[chave] = transicoes.get(chave, 0) + 1
+            mudancas.append({
+                'b_id': linha.id,
+                'b_status': validacao['status'],
+                'b_discrepancia': validacao['discrepancia']
+            })
+
+        if mudancas and not simular:
+            db.session.execute(atualizar, mudancas)
+            db.session.commit()
+
+        processados += len(linhas)
+        alterados += len(mudancas)
+        lotes += 1
+        ultimo_id = linhas[-1].id
+
+    decorrido = time.perf_counter() - inicio
+    print(f"DEBUG REVALIDACAO - {processados} comprovantes, {alterados} alterados em {decorrido:.2f}s "
+          f"(tolerância {tolerancia}%{', simulação' if simular else ''})")
+
+    return {
+        'processados': processados,
+        'alterados': alterados,
+        'transicoes': transicoes,
+        'lotes': lotes,
+        'tolerancia': tolerancia,
+        'simulacao': simular,
+        'tempo_ms': round(decorrido * 1000, 2),
+        'linhas_por_segundo': round(processados / decorrido, 1) if decorrido > 0 else None
+    }
+
+
+def interpretar_data(valor):
+    """'2025-01-31' ou ISO completo -> datetime (None se vazio; ValueError se inválido)"""
+    if not valor:
+        return None
+    return datetime.fromisoformat(valor)
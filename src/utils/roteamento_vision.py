@@ -0,0 +1,134 @@
+"""
+Roteamento entre o modelo rápido e o completo do Gemini Vision
+
+A maioria dos comprovantes sai com score alto já no modelo rápido (flash).
+Só vão para o modelo completo (pro), mais lento e caro, os casos em que
+a resposta rápida não serve:
+- resposta inválida (JSON que não abre ou erro da API)
+- comprovante ilegível para o modelo
+- score na faixa de dúvida (VISION_ESCALONAR_SCORE_MIN a _MAX)
+
+Também guarda as latências recentes de cada rota (rápido, escalonado,
+completo, cache) para acompanhar p50/p95
+"""
+import math
+import os
+import threading
+import time
+from collections import deque
+
+MODELO_VISION_RAPIDO = os.environ.get('GEMINI_MODELO_RAPIDO', 'gemini-1.5-flash')
+MODELO_VISION_COMPLETO = os.environ.get('GEMINI_MODELO_COMPLETO', 'gemini-1.5-pro')
+
+# Desligado, tudo vai direto para o modelo completo (rota 'completo')
+VISION_ROTEAMENTO = os.environ.get('VISION_ROTEAMENTO', 'true').lower() in ('1', 'true', 'sim', 'yes')
+VISION_ESCALONAR_SCORE_MIN = int(os.environ.get('VISION_ESCALONAR_SCORE_MIN', '50'))
+VISION_ESCALONAR_SCORE_MAX = int(os.environ.get('VISION_ESCALONAR_SCORE_MAX', '85'))
+
+# Amostras mantidas por rota para os percentis
+AMOSTRAS_LATENCIA = 1000
+
+_lock = threading.Lock()
+_latencias = {}
+
+
+def motivo_escalonamento(dados_ia, calcular_score):
+    """
+    Por que a resposta do modelo rápido precisa do modelo completo
+
+    Args:
+        dados_ia: Resposta do modelo rápido
+        calcular_score: Função dados_ia -> score (0-100)
+
+    Returns:
+        'resposta_invalida', 'ilegivel', 'score_limitrofe' ou None
+    """
+    if not isinstance(dados_ia, dict) or 'erro' in dados_ia:
+        return 'resposta_invalida'
+    if dados_ia.get('validacoes', {}).get('comprovante_legivel') is False:
+        return 'ilegivel'
+    if VISION_ESCALONAR_SCORE_MIN <= calcular_score(dados_ia) <= VISION_ESCALONAR_SCORE_MAX:
+        return 'score_limitrofe'
+    return None
+
+
+def analisar_com_roteamento(analisar, calcular_score):
+    """
+    Modelo rápido primeiro; completo só quando motivo_escalonamento indicar
+
+    Args:
+        analisar: Função modelo -> dados_ia (ex: analisar_comprovante_gemini_vision)
+        calcular_score: Função dados_ia -> score, usada na faixa de dúvida
+
+    Returns:
+        Tuple (dados_ia, roteamento) - roteamento com rota, modelo usado,
+        motivo do escalonamento e latência em ms
+    """
+    inicio = time.perf_counter()
+
+    if not VISION_ROTEAMENTO:
+        dados_ia = analisar(MODELO_VISION_COMPLETO)
+        usadas = [dados_ia]
+        rota, modelo, motivo = 'completo', MODELO_VISION_COMPLETO, None
+    else:
+        dados_ia = analisar(MODELO_VISION_RAPIDO)
+        usadas = [dados_ia]
+        rota, modelo = 'rapido', MODELO_VISION_RAPIDO
+        motivo = motivo_escalonamento(dados_ia, calcular_score)
+
+        if motivo:
+            completo = analisar(MODELO_VISION_COMPLETO)
+            usadas.append(completo)
+            if 'erro' in completo and motivo != 'resposta_invalida':
+                # Completo falhou: a resposta rápida (válida) ainda serve
+                print(f"AVISO ROTEAMENTO - Modelo completo falhou ({completo['erro']}), mantendo o rápido")
+            else:
+                dados_ia = completo
+                rota, modelo = 'escalonado', MODELO_VISION_COMPLETO
+
+    latencia = round((time.perf_counter() - inicio) * 1000, 1)
+    # Respostas só do cache não entram na latência dos modelos
+    if all(isinstance(d, dict) and d.get('cache_vision') for d in usadas):
+        rota_latencia = 'cache'
+    else:
+        rota_latencia = rota
+    registrar_latencia(rota_latencia, latencia)
+
+    print(f"DEBUG ROTEAMENTO - Rota {rota_latencia} ({modelo}) em {latencia} ms"
+          + (f", escalonado por {motivo}" if motivo else ''))
+
+    return dados_ia, {
+        'rota': rota_latencia,
+        'modelo': modelo,
+        'motivo_escalonamento': motivo,
+        'latencia_ms': latencia
+    }
+
+
+def registrar_latencia(rota, ms):
+    with _lock:
+        _latencias.setdefault(rota, deque(maxlen=AMOSTRAS_LATENCIA)).append(ms)
+
+
+def _percentil(ordenadas, percentual):
+    """Percentil pelo método do posto mais próximo"""
+    indice = max(0, min(len(ordenadas) - 1, math.ceil(percentual / 100 * len(ordenadas)) - 1))
+    return ordenadas[indice]
+
+
+def estatisticas_latencia():
+    """p50/p95 (ms) por rota nas últimas AMOSTRAS_LATENCIA análises deste processo"""
+    with _lock:
+        copias = {rota: sorted(amostras) for rota, amostras in _latencias.items()}
+
+    total = sum(len(amostras) for amostras in copias.values())
+    return {
+        rota: {
+            'analises': len(amostras),
+            'percentual': round(len(amostras) / total * 100, 1),
+            'p50_ms': _percentil(amostras, 50),
+            'p95_ms': _percentil(amostras, 95),
+            'media_ms': round(sum(amostras) / len(amostras), 1)
+        }
+        for rota, amostras in copias.items() if amostras
+    }
@@ -0,0 +1,76 @@
+"""
+Gravação de arquivos enviados (comprovantes)
+
+O arquivo é copiado em blocos grandes e o SHA-256 e o tamanho são
+calculados na mesma passada, sem reler o arquivo do disco depois.
+Arquivos pequenos ficam também em memória para o OCR não precisar
+abrir o arquivo de novo
+
+O limite por arquivo (tamanho_maximo) não protege o servidor de uploads
+enormes: quando request.files existe, o Werkzeug já leu o corpo multipart
+inteiro (em memória ou num arquivo temporário). Quem barra a requisição
+antes da leitura é o MAX_CONTENT_LENGTH da configuração (413)
+"""
+import hashlib
+import os
+
+# Tamanho dos blocos lidos do upload
+TAMANHO_BLOCO = 1024 * 1024
+
+# Até este tamanho o conteúdo é mantido em memória para o OCR
+LIMITE_MEMORIA = int(os.environ.get("UPLOAD_LIMITE_MEMORIA_KB", "2048")) * 1024
+
+
+class ArquivoMuitoGrande(Exception):
+    """O arquivo passou do tamanho máximo permitido"""
+
+    def __init__(self, tamanho_maximo):
+        self.tamanho_maximo = tamanho_maximo
+        super().__init__(f"Arquivo maior que o limite de {tamanho_maximo // (1024 * 1024)} MB")
+
+
+def salvar_upload(arquivo, caminho_destino, tamanho_maximo=None, limite_memoria=LIMITE_MEMORIA):
+    """
+    Grava o upload em disco calculando hash e tamanho durante a escrita
+
+    Args:
+        arquivo: FileStorage do Flask (request.files[...])
+        caminho_destino: Path onde o arquivo será gravado
+        tamanho_maximo: Bytes permitidos por arquivo; acima disso o arquivo
+                        parcial é removido e ArquivoMuitoGrande é lançada
+                        (o corpo da requisição já foi lido pelo Werkzeug)
+        limite_memoria: Arquivos até este tamanho também voltam em memória
+
+    Returns:
+        Dict com caminho, hash_arquivo (SHA-256), tamanho (bytes) e
+        conteudo (bytes do arquivo, ou None se passou do limite_memoria)
+    """
+    sha256 = hashlib.sha256()
+    tamanho = 0
+    blocos = []
+
+    try:
+        with open(caminho_destino, "wb") as destino:
+            for bloco in iter(lambda: arquivo.stream.read(TAMANHO_BLOCO), b""):
+                tamanho += len(bloco)
+                if tamanho_maximo and tamanho > tamanho_maximo:
+                    raise ArquivoMuitoGrande(tamanho_maximo)
+
+                sha256.update(bloco)
+                destino.write(bloco)
+
+                if blocos is not None:
+                    blocos.append(bloco)
+                    if tamanho > limite_memoria:
+                        blocos = None
+    except BaseException:
+        if os.path.exists(caminho_destino):
+            os.remove(caminho_destino)
+        raise
+
+    return {
+        "caminho": caminho_destino,
+        "hash_arquivo": sha256.hexdigest(),
+        "tamanho": tamanho,
+        "conteudo": b"".join(blocos) if blocos is not None else None
+    }
@@ -1,5 +1,9 @@
+import os
 from decimal import Decimal
 
+# Diferença (%) aceita entre o valor do reembolso e o valor lido no comprovante
+TOLERANCIA_PERCENTUAL = float(os.environ.get('OCR_TOLERANCIA_PERCENTUAL', '5.0'))
+
 def calcular_discrepancia(valor_solicitado, valor_extraido):
     """
     Calcula a discrepância percentual entre o valor solicitado e o extraído
@@ -27,18 +31,21 @@ def calcular_discrepancia(valor_solicitado, valor_extraido):
     return round(percentual, 2)
 
 
-def validar_valores(valor_solicitado, valor_extraido, tolerancia=5.0):
+def validar_valores(valor_solicitado, valor_extraido, tolerancia=None):
     """
     Valida se o valor extraído está dentro da tolerância aceitável
     
     Args:
         valor_solicitado: Valor informado no reembolso
         valor_extraido: Valor extraído do comprovante via OCR
-        tolerancia: Percentual de tolerância aceito (padrão 5%)
+        tolerancia: Percentual de tolerância aceito (padrão TOLERANCIA_PERCENTUAL, 5%)
     
     Returns:
         dict com status e informações da validação
     """
+    if tolerancia is None:
+        tolerancia = TOLERANCIA_PERCENTUAL
+
     discrepancia = calcular_discrepancia(valor_solicitado, valor_extraido)
     
     if discrepancia is None:
@@ -98,8 +105,7 @@ def verificar_validacao_automatica(reembolso, comprovante):
     
     resultado = validar_valores(
         valor_solicitado=reembolso.valor_faturado,
-        valor_extraido=comprovante.valor_extraido,
-        tolerancia=5.0
+        valor_extraido=comprovante.valor_extraido
     )
     
     return {